@@ -0,0 +1,161 @@
+"""
+Publish/subscribe broker for pushing events to connected clients
+
+Routes publish events to topics (e.g. "user:<id>") and streaming endpoints
+hold a Subscription per connected client. InProcessBroker delivers within a
+single worker process; it is also the stand-in used for local runs and
+tests. Deployments with several workers can plug in a shared implementation
+of Broker through the get_broker dependency.
+
+Each subscription buffers a bounded number of events. A client that falls
+further behind has its buffer dropped and receives a single "resync" event
+telling it to refetch, so one stalled connection never grows memory.
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, NamedTuple, Optional, Set
+
+RESYNC = "resync"
+
+
+class Event(NamedTuple):
+    """An event published to a topic"""
+    type: str
+    data: Any
+
+
+class Subscription:
+    """A client's bounded view of one or more topics"""
+
+    __slots__ = ("topics", "buffer_size", "_events", "_ready", "_lagged", "closed")
+
+    def __init__(self, topics: Iterable[str], buffer_size: int):
+        self.topics = frozenset(topics)
+        self.buffer_size = buffer_size
+        self._events: Deque[Event] = deque()
+        self._ready = asyncio.Event()
+        self._lagged = False
+        self.closed = False
+
+    def deliver(self, event: Event) -> None:
+        """Queue an event without blocking the publisher"""
+        if self.closed:
+            return
+        if len(self._events) >= self.buffer_size:
+            self._events.clear()
+            self._lagged = True
+        else:
+            self._events.append(event)
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Next event, or None if none arrived within timeout"""
+        if not self._events and not self._lagged:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self._lagged:
+            self._lagged = False
+            self._events.clear()
+            return Event(RESYNC, None)
+        return self._events.popleft()
+
+
+class Broker(ABC):
+    """Interface of the pub/sub broker used by the streaming endpoints"""
+
+    @abstractmethod
+    def subscribe(self, topics: Iterable[str], buffer_size: int = 100) -> Subscription:
+        """Start receiving the events of topics"""
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop delivering to a subscription"""
+
+    @abstractmethod
+    async def publish(self, topic: str, event: Event) -> int:
+        """Deliver event to the topic's subscribers, returning how many got it"""
+
+    @abstractmethod
+    async def publish_many(self, topics: Iterable[str], event: Event) -> int:
+        """Deliver event once to every subscriber of any of the topics"""
+
+
+class InProcessBroker(Broker):
+    """Broker delivering to subscribers of the current process"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, topics: Iterable[str], buffer_size: int = 100) -> Subscription:
+        subscription = Subscription(topics, buffer_size)
+        for topic in subscription.topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    async def publish(self, topic: str, event: Event) -> int:
+        subscribers = self._subscribers.get(topic, ())
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return len(subscribers)
+
+    async def publish_many(self, topics: Iterable[str], event: Event) -> int:
+        recipients: Set[Subscription] = set()
+        for topic in topics:
+            recipients.update(self._subscribers.get(topic, ()))
+        for subscription in recipients:
+            subscription.deliver(event)
+        return len(recipients)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        if topic is not None:
+            return len(self._subscribers.get(topic, ()))
+        return len({sub for subs in self._subscribers.values() for sub in subs})
+
+
+broker = InProcessBroker()
+
+
+def format_sse(event: Event) -> bytes:
+    """
+    Encode an event in the text/event-stream format
+    data may be pre-encoded JSON bytes, so an event fanned out to many
+    clients is serialized once by the publisher rather than per client
+    """
+    data = event.data if isinstance(event.data, bytes) else json.dumps(event.data, default=str).encode()
+    return b"event: " + event.type.encode() + b"\ndata: " + data + b"\n\n"
+
+
+async def sse_stream(
+    broker: Broker,
+    topics: Iterable[str],
+    buffer_size: int,
+    keepalive: float,
+) -> AsyncIterator[bytes]:
+    """
+    Relay the events of topics as server-sent events until the client disconnects
+    The subscription is made once the response starts, inside the try whose
+    finally removes it, so a response that never starts cannot leak one.
+    A comment line is sent when idle so proxies keep the connection open.
+    """
+    subscription = broker.subscribe(topics, buffer_size=buffer_size)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            event = await subscription.get(timeout=keepalive)
+            yield format_sse(event) if event is not None else b": keepalive\n\n"
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,47 @@
+"""
+Book catalog
+
+Books are shared metadata, one row per edition, keyed by the canonical
+ISBN-13 (see app.isbn). books.isbn_normalized is unique (see
+docs/schema/SUPABASE_BOOK_CATALOG.sql), so upsert_book() can resolve a
+title/ISBN to its book in one round trip, creating it only when the ISBN
+is new, without duplicating it under concurrent writes.
+"""
+from typing import Optional, Tuple
+from app.isbn import normalize_isbn
+from app.metadata import get_books, prime_book
+from app.repository import repository
+
+
+async def get_book(book_id: str) -> Optional[dict]:
+    """A book by id, usually served from the metadata cache"""
+    books = await get_books([book_id])
+    return books.get(book_id)
+
+
+async def find_book_by_isbn(isbn: str) -> Optional[dict]:
+    """The book with this ISBN in any form (ISBN-10/13, with or without separators)"""
+    key = normalize_isbn(isbn)
+    if not key:
+        return None
+    book = await repository.select_one("books", {"isbn_normalized": key})
+    if book:
+        prime_book(book)
+    return book
+
+
+async def upsert_book(
+    title: str,
+    author: Optional[str] = None,
+    isbn: Optional[str] = None,
+) -> Tuple[dict, bool]:
+    """
+    The book for this ISBN and whether it was created
+    Books without an ISBN cannot be matched and are always created
+    """
+    result = await repository.rpc(
+        "upsert_book", {"p_title": title, "p_author": author, "p_isbn": isbn}
+    )
+    book = result["book"]
+    prime_book(book)
+    return book, result["created"]
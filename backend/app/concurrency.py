@@ -0,0 +1,35 @@
+"""
+Concurrent fan-out of independent lookups under a shared deadline
+"""
+import asyncio
+from typing import Any, Awaitable, Dict, Tuple
+
+
+async def gather_within(timeout: float, **lookups: Awaitable) -> Tuple[Dict[str, Any], bool]:
+    """
+    Run independent lookups concurrently and wait at most timeout seconds
+    Lookups that fail or miss the deadline resolve to None instead of
+    raising, so the caller degrades to null fields rather than an error.
+    Returns the results by name and whether every lookup succeeded.
+    """
+    tasks = {name: asyncio.ensure_future(lookup) for name, lookup in lookups.items()}
+    if not tasks:
+        return {}, True
+    try:
+        done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    for task in pending:
+        task.cancel()
+
+    results: Dict[str, Any] = {}
+    complete = True
+    for name, task in tasks.items():
+        if task in done and task.exception() is None:
+            results[name] = task.result()
+        else:
+            results[name] = None
+            complete = False
+    return results, complete
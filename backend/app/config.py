@@ -2,7 +2,7 @@
 Configuration settings for the application
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -12,6 +12,121 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_ANON_KEY: str
     SUPABASE_SERVICE_ROLE_KEY: str
+    # Project JWT secret for local HS256 token verification (optional;
+    # asymmetric signing keys are fetched from the project JWKS)
+    SUPABASE_JWT_SECRET: Optional[str] = None
+
+    # Local token verification caches
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL_SECONDS: float = 300.0
+    AUTH_JWKS_CACHE_TTL_SECONDS: int = 3600
+    # Logged-out tokens kept until they expire; never evicted, so logout
+    # fails with 503 once this many unexpired tokens are revoked
+    AUTH_REVOKED_TOKENS_MAX_SIZE: int = 100000
+
+    # Upstream call limits for the async data-access layer
+    SUPABASE_TIMEOUT_SECONDS: float = 10.0
+    SUPABASE_MAX_CONCURRENCY: int = 100
+
+    # HTTP transport shared by both Supabase clients: HTTP/2 (needs the h2
+    # package; HTTP/1.1 otherwise), pool size and keep-alive, and the
+    # connect/read/write/pool-wait timeouts of each request. Under HTTP/1.1
+    # keep SUPABASE_HTTP_MAX_CONNECTIONS >= SUPABASE_MAX_CONCURRENCY. Keep
+    # the read timeout at least as long as the longest per-call timeout
+    # (20s for the auth emails): the per-call timeout is the one that applies
+    SUPABASE_HTTP2: bool = True
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = 100
+    SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    SUPABASE_HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    SUPABASE_HTTP_READ_TIMEOUT_SECONDS: float = 20.0
+    SUPABASE_HTTP_WRITE_TIMEOUT_SECONDS: float = 10.0
+    SUPABASE_HTTP_POOL_TIMEOUT_SECONDS: float = 5.0
+
+    # Table access backend: "supabase" goes through PostgREST, "postgres"
+    # connects to DATABASE_URL with an asyncpg pool (pip install asyncpg).
+    # Set DATABASE_STATEMENT_CACHE_SIZE=0 behind the Supabase pooler in
+    # transaction mode (port 6543)
+    DATABASE_BACKEND: str = "supabase"
+    DATABASE_URL: Optional[str] = None
+    DATABASE_POOL_MIN_SIZE: int = 2
+    DATABASE_POOL_MAX_SIZE: int = 20
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100
+
+    # Shared deadline for the concurrent lookups that hydrate a response;
+    # lookups still pending after it leave their fields empty
+    HYDRATION_DEADLINE_SECONDS: float = 3.0
+
+    # Hydrated listing detail cache (per process)
+    LISTING_CACHE_SIZE: int = 2048
+    LISTING_CACHE_TTL_SECONDS: float = 30.0
+
+    # Profile/book metadata cache shared by all routers (per process)
+    METADATA_CACHE_SIZE: int = 20000
+    METADATA_CACHE_TTL_SECONDS: float = 300.0
+    METADATA_NEGATIVE_TTL_SECONDS: float = 30.0
+
+    # Cache-Control for the public read endpoints (listings, requests).
+    # Responses always carry an ETag; max-age=0 makes browsers revalidate
+    # (cheap 304s) while s-maxage/stale-while-revalidate let a CDN serve
+    # repeat reads
+    HTTP_CACHE_MAX_AGE_SECONDS: int = 0
+    HTTP_CACHE_S_MAXAGE_SECONDS: int = 5
+    HTTP_CACHE_STALE_WHILE_REVALIDATE_SECONDS: int = 30
+
+    # Bulk listing import: rows per import_listings() call, and how many
+    # row errors the report lists
+    IMPORT_BATCH_SIZE: int = 500
+    IMPORT_MAX_REPORTED_ERRORS: int = 1000
+
+    # Rows read (and hydrated) per keyset chunk by the NDJSON export endpoints
+    EXPORT_CHUNK_SIZE: int = 200
+
+    # Response compression (brotli when installed and accepted, else gzip);
+    # bodies smaller than the threshold are sent as is
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Messaging: conversation participant cache (per process), events
+    # buffered per stream before a slow client is told to resync, and the
+    # idle interval between SSE keepalive comments
+    CONVERSATION_CACHE_SIZE: int = 10000
+    CONVERSATION_CACHE_TTL_SECONDS: float = 600.0
+    BROKER_BUFFER_SIZE: int = 100
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+
+    # Image uploads. STORAGE_BACKEND "local" writes under MEDIA_ROOT and
+    # serves the files at MEDIA_URL; "supabase" uses the public Storage
+    # bucket STORAGE_BUCKET. Variants are resized to fit the given box.
+    # IMAGE_WORKERS is the size of the resize process pool (0: one per CPU)
+    STORAGE_BACKEND: str = "local"
+    MEDIA_ROOT: str = "media"
+    MEDIA_URL: str = "/media"
+    STORAGE_BUCKET: str = "listing-images"
+    IMAGE_MAX_BYTES: int = 10 * 1024 * 1024
+    IMAGE_MAX_FILES: int = 10
+    IMAGE_THUMBNAIL_SIZE: int = 320
+    IMAGE_DISPLAY_SIZE: int = 1280
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_WORKERS: int = 0
+
+    # Rate limiting of the auth and write endpoints (policies in
+    # app/ratelimit.py). "memory" counts per worker; "redis" shares the
+    # counts between workers through RATE_LIMIT_REDIS_URL
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Prometheus metrics at GET /metrics (see app/metrics.py)
+    METRICS_ENABLED: bool = True
+
+    # Debug header X-Query-Count: Supabase calls made by each request
+    QUERY_COUNT_HEADER: bool = False
+
+    # Search backend: "database" uses search_catalog() from
+    # docs/schema/SUPABASE_SEARCH.sql, "memory" uses an in-process index
+    SEARCH_BACKEND: str = "database"
 
     # Server Configuration
     PORT: int = 8000
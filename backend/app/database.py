@@ -1,37 +1,158 @@
 """
 Supabase client configuration
+
+Both clients send their PostgREST, Storage and Auth requests through one
+shared HTTP transport, so they draw from a single pool of kept-alive
+connections to the project instead of two default pools. With the h2
+package installed (SUPABASE_HTTP2), requests are multiplexed over HTTP/2
+connections. Pool size, keep-alive and the connect/read/write/pool
+timeouts come from Settings. Each client keeps its own httpx.AsyncClient
+(and so its own API key headers); only the connections are shared.
 """
 import httpx
-from supabase import create_client, Client
-from supabase.client import ClientOptions
+from typing import List, Optional
+from supabase import acreate_client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
 from app.config import settings
-
-# Configure HTTP client with timeout to prevent hanging
-http_client = httpx.Client(
-    timeout=httpx.Timeout(30.0, connect=10.0),  # 30s total, 10s to connect
-    limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+from app.metrics import (
+    Gauge,
+    Metric,
+    registry,
+    supabase_http_connections_opened,
+    supabase_http_requests,
+    supabase_http_requests_in_flight,
 )
 
-# Create Supabase client for user operations (uses anon key)
-# Note: Supabase Python client doesn't directly support httpx timeout,
-# but we can configure it through the underlying httpx client
-supabase: Client = create_client(
-    settings.SUPABASE_URL, 
-    settings.SUPABASE_ANON_KEY,
-    options=ClientOptions(
-        auto_refresh_token=False,
-        persist_session=False,
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# Async Supabase clients, created on application startup by connect()
+# supabase uses the anon key for user operations,
+# supabase_admin uses the service role key for server-side operations
+supabase: Optional[AsyncClient] = None
+supabase_admin: Optional[AsyncClient] = None
+
+# Connection pool shared by both clients, and their HTTP clients
+transport: Optional["InstrumentedTransport"] = None
+_http_clients: List[httpx.AsyncClient] = []
+
+
+async def _trace(event_name: str, info: dict) -> None:
+    # httpcore reports each new TCP connection; a reused one has no event
+    if event_name == "connection.connect_tcp.complete":
+        supabase_http_connections_opened.inc()
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """
+    Pooled transport counting requests and newly opened connections
+    opened / requests is the share of requests that could not reuse a
+    kept-alive connection
+    """
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions.setdefault("trace", _trace)
+        supabase_http_requests.inc()
+        supabase_http_requests_in_flight.inc()
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            supabase_http_requests_in_flight.dec()
+
+    def pool_connections(self) -> List:
+        """The pool's open connections (httpcore connection objects)"""
+        pool = getattr(self, "_pool", None)
+        return list(getattr(pool, "connections", ()))
+
+
+def create_transport() -> InstrumentedTransport:
+    """The shared transport, configured from Settings"""
+    return InstrumentedTransport(
+        http2=settings.SUPABASE_HTTP2 and h2 is not None,
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
     )
-)
 
-# Create Supabase admin client for server-side operations (uses service role key)
-admin_options = ClientOptions(
-    auto_refresh_token=False,
-    persist_session=False,
-)
 
-supabase_admin: Client = create_client(
-    settings.SUPABASE_URL,
-    settings.SUPABASE_SERVICE_ROLE_KEY,
-    options=admin_options,
-)
+def http_timeout() -> httpx.Timeout:
+    """Per-phase timeouts of every Supabase HTTP request"""
+    return httpx.Timeout(
+        connect=settings.SUPABASE_HTTP_CONNECT_TIMEOUT_SECONDS,
+        read=settings.SUPABASE_HTTP_READ_TIMEOUT_SECONDS,
+        write=settings.SUPABASE_HTTP_WRITE_TIMEOUT_SECONDS,
+        pool=settings.SUPABASE_HTTP_POOL_TIMEOUT_SECONDS,
+    )
+
+
+def _pool_metrics() -> List[Metric]:
+    """Occupancy of the shared connection pool, read when /metrics is scraped"""
+    connections = Gauge(
+        "supabase_http_pool_connections",
+        "Open connections of the shared Supabase pool by state",
+        ("state",),
+    )
+    limit = Gauge("supabase_http_pool_max_connections", "Connection limit of the shared Supabase pool")
+    open_connections = transport.pool_connections() if transport is not None else []
+    idle = sum(1 for connection in open_connections if connection.is_idle())
+    connections.set(idle, "idle")
+    connections.set(len(open_connections) - idle, "active")
+    limit.set(settings.SUPABASE_HTTP_MAX_CONNECTIONS)
+    return [connections, limit]
+
+
+registry.register_collector(_pool_metrics)
+
+
+async def _create_client(key: str) -> AsyncClient:
+    http_client = httpx.AsyncClient(transport=transport, timeout=http_timeout())
+    _http_clients.append(http_client)
+    return await acreate_client(
+        settings.SUPABASE_URL,
+        key,
+        options=AsyncClientOptions(
+            auto_refresh_token=False,
+            persist_session=False,
+            httpx_client=http_client,
+        ),
+    )
+
+
+async def connect() -> None:
+    """
+    Create the async Supabase clients
+    Called once from the application lifespan before serving requests
+    """
+    global supabase, supabase_admin, transport
+
+    transport = create_transport()
+    supabase = await _create_client(settings.SUPABASE_ANON_KEY)
+    supabase_admin = await _create_client(settings.SUPABASE_SERVICE_ROLE_KEY)
+
+
+async def disconnect() -> None:
+    """Release the async Supabase clients and close their connections on application shutdown"""
+    global supabase, supabase_admin, transport
+    supabase = None
+    supabase_admin = None
+    for http_client in _http_clients:
+        await http_client.aclose()
+    _http_clients.clear()
+    if transport is not None:
+        await transport.aclose()
+        transport = None
+
+
+def get_client(admin: bool = False) -> AsyncClient:
+    """
+    Return the connected async Supabase client
+    Raises RuntimeError if connect() has not run yet
+    """
+    client = supabase_admin if admin else supabase
+    if client is None:
+        raise RuntimeError("Supabase clients are not connected. Call database.connect() on startup.")
+    return client
@@ -1,12 +1,19 @@
 """
 Dependency functions for FastAPI routes
 """
-from fastapi import Depends, HTTPException, status
+import jwt
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import Client
-from app.database import supabase
+from supabase import AsyncClient
+from app import database
+from app.broker import Broker, broker
+from app.storage import Storage, storage
+from app.repository import auth_repository
+from app.tokens import token_verifier
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 async def get_current_user(
@@ -14,12 +21,55 @@ async def get_current_user(
 ) -> dict:
     """
     Dependency to get the current authenticated user from JWT token
+    Tokens are verified locally when possible; Supabase Auth is only
+    consulted for tokens that cannot be verified locally
     """
-    token = credentials.credentials
+    return await authenticate(credentials.credentials)
+
+
+async def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    access_token: Optional[str] = Query(default=None, description="Access token, for clients such as EventSource that cannot send headers"),
+) -> dict:
+    """
+    Dependency for streaming endpoints: like get_current_user, but also
+    accepts the token as an access_token query parameter
+    """
+    token = credentials.credentials if credentials else access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+        )
+    return await authenticate(token)
+
+
+async def authenticate(token: str) -> dict:
+    """Resolve an access token to the user's id and email, or raise 401"""
+    if token_verifier.is_revoked(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+        )
+
+    if token_verifier.can_verify(token):
+        try:
+            claims = await token_verifier.verify(token)
+            return {
+                "id": claims["sub"],
+                "email": claims.get("email"),
+            }
+        except jwt.PyJWKClientError:
+            pass  # Signing keys unavailable, fall back to Supabase Auth
+        except jwt.InvalidTokenError as e:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Authentication failed: {str(e)}",
+            )
 
     try:
         # Verify token with Supabase
-        response = supabase.auth.get_user(token)
+        response = await auth_repository.get_user(token)
         user = response.user
 
         if not user:
@@ -39,8 +89,24 @@ async def get_current_user(
         )
 
 
-async def get_supabase_client() -> Client:
+async def get_supabase_client() -> AsyncClient:
     """
     Dependency to get Supabase client
     """
-    return supabase
+    return database.get_client()
+
+
+def get_broker() -> Broker:
+    """
+    Dependency to get the pub/sub broker
+    Override it (app.dependency_overrides) to use another broker in tests
+    """
+    return broker
+
+
+def get_storage() -> Storage:
+    """
+    Dependency to get the upload storage backend
+    Override it (app.dependency_overrides) to use another backend in tests
+    """
+    return storage
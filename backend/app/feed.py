@@ -0,0 +1,55 @@
+"""
+Live marketplace feed
+
+Listing writes publish "created", "updated" and "deleted" events to topics
+partitioned by (status, type). A feed subscriber only subscribes to the
+partitions its filters select, so a write reaches the interested clients
+without scanning the others, and idle subscribers cost nothing per event.
+The payload is encoded once per event whatever the number of recipients.
+"""
+import json
+from itertools import product
+from typing import Iterable, List, Optional, Tuple
+from app.broker import Broker, Event
+from app.models import ListingResponse, ListingStatus, ListingType
+from app.serialization import listing_summary_adapter
+
+
+def listing_topic(status: str, listing_type: str) -> str:
+    """Broker topic of one (status, type) partition of the feed"""
+    return f"listings:{status}:{listing_type}"
+
+
+def feed_topics(
+    status_filter: Optional[ListingStatus] = None,
+    type_filter: Optional[ListingType] = None,
+) -> List[str]:
+    """Topics a feed client subscribes to for the given filters"""
+    statuses = [status_filter] if status_filter else list(ListingStatus)
+    types = [type_filter] if type_filter else list(ListingType)
+    return [listing_topic(status.value, listing_type.value) for status, listing_type in product(statuses, types)]
+
+
+async def publish_listing(
+    broker: Broker,
+    event_type: str,
+    listing: ListingResponse,
+    previous: Iterable[Tuple[str, str]] = (),
+) -> int:
+    """
+    Publish a created/updated listing to its partition
+    previous holds the (status, type) the listing had before the write, so
+    clients filtering on the old values see it leave their view (e.g. sold).
+    The payload is the feed projection (thumbnails, no display images).
+    """
+    topics = {listing_topic(listing.status, listing.type)}
+    topics.update(listing_topic(status, listing_type) for status, listing_type in previous)
+    return await broker.publish_many(topics, Event(event_type, listing_summary_adapter.dump_json(listing)))
+
+
+async def publish_listing_deleted(broker: Broker, listing_id: str, status: str, listing_type: str) -> int:
+    """Publish the deletion of a listing to the partition it was in"""
+    return await broker.publish(
+        listing_topic(status, listing_type),
+        Event("deleted", json.dumps({"id": listing_id}).encode()),
+    )
@@ -0,0 +1,97 @@
+"""
+Conditional GET support for the read endpoints
+
+A strong ETag is derived from the (id, updated_at) version of every row a
+response is built from, so it can be checked right after the rows are read:
+when the client's If-None-Match still matches, the route answers 304 without
+serializing anything. Values joined in from other tables (book metadata,
+display names) are part of the ETag too, since renaming them does not touch
+the row's updated_at.
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+from fastapi import Response, status
+from app.config import settings
+
+
+# Joined fields of hydrated rows that belong in the version
+JOINED_FIELDS = ("book_title", "book_author", "book_isbn", "user_display_name")
+
+
+def _field(row: Any, name: str) -> Any:
+    return row.get(name) if isinstance(row, dict) else getattr(row, name, None)
+
+
+def _version(value: Any) -> str:
+    """
+    Canonical form of an updated_at value
+    PostgREST returns ISO strings while cached responses hold datetimes
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    return str(value)
+
+
+def compute_etag(
+    rows: Iterable[Any],
+    variant: str = "",
+    fields: Iterable[str] = JOINED_FIELDS,
+) -> str:
+    """
+    Strong ETag over the id, updated_at and joined fields of each row (dicts
+    or models)
+    variant distinguishes representations of the same rows, e.g. media types.
+    fields replaces the joined fields, for tables without updated_at whose
+    version is their content.
+    """
+    fields = tuple(fields)
+    digest = hashlib.sha256(f"{variant}\n".encode())
+    for row in rows:
+        joined = "\x1f".join(str(_field(row, name) or "") for name in fields)
+        digest.update(f"{_field(row, 'id')}@{_version(_field(row, 'updated_at'))}\x1e{joined}\n".encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header value matches etag
+    Uses the weak comparison the header calls for, so W/ prefixes added by
+    proxies that compress the body still match
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def cache_control() -> str:
+    """Cache-Control value for public, revalidated read responses"""
+    return (
+        f"public, max-age={settings.HTTP_CACHE_MAX_AGE_SECONDS}, "
+        f"s-maxage={settings.HTTP_CACHE_S_MAXAGE_SECONDS}, "
+        f"stale-while-revalidate={settings.HTTP_CACHE_STALE_WHILE_REVALIDATE_SECONDS}"
+    )
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    """Validator and caching policy headers for a full response"""
+    return {"ETag": etag, "Cache-Control": cache_control()}
+
+
+def set_cache_headers(response: Response, etag: str) -> None:
+    """Attach the validator and caching policy to a full response"""
+    response.headers.update(cache_headers(etag))
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response carrying the same validator and caching policy"""
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_cache_headers(response, etag)
+    return response
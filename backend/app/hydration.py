@@ -0,0 +1,121 @@
+"""
+Batched hydration of listing and request rows
+
+Resolves the joined data (images, book metadata, display names) for a whole
+page of rows with a constant number of bulk queries instead of one query per
+row and per relation. The lookups are independent, so they run concurrently
+under a shared deadline: latency follows the slowest lookup, and a lookup
+that fails or runs late leaves its fields empty instead of failing the page.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.concurrency import gather_within
+from app.config import settings
+from app.metadata import get_books, get_profiles
+from app.repository import repository
+
+
+def _unique(values: Iterable) -> List:
+    """Collect distinct, non-empty values preserving first-seen order"""
+    return list(dict.fromkeys(v for v in values if v))
+
+
+async def fetch_images(listing_ids: List[str]) -> Dict[str, List[dict]]:
+    """
+    Fetch images for many listings at once, grouped by listing_id
+    Each image is a dict with image_url, thumbnail_url and webp_url (None
+    for images added by URL)
+    """
+    images: Dict[str, List[dict]] = {listing_id: [] for listing_id in listing_ids}
+    if not listing_ids:
+        return images
+    rows = await repository.select_in(
+        "listing_images",
+        "listing_id",
+        listing_ids,
+        columns="listing_id, image_url, thumbnail_url, webp_url",
+        order="created_at",
+    )
+    for img in rows:
+        images.setdefault(img["listing_id"], []).append(img)
+    return images
+
+
+async def _hydrate_listings(
+    listings: List[dict],
+    images: Optional[Dict[str, List[dict]]] = None,
+) -> Tuple[List[dict], bool]:
+    """
+    Hydrate listing rows, returning them and whether every lookup succeeded
+    images may be passed in when the caller already fetched them
+    """
+    lookups = {
+        "books": get_books(_unique(listing.get("book_id") for listing in listings)),
+        "profiles": get_profiles(_unique(listing.get("user_id") for listing in listings)),
+    }
+    if images is None:
+        lookups["images"] = fetch_images(_unique(listing["id"] for listing in listings))
+    results, complete = await gather_within(settings.HYDRATION_DEADLINE_SECONDS, **lookups)
+    images = images if images is not None else results["images"] or {}
+    books = results["books"] or {}
+    profiles = results["profiles"] or {}
+
+    hydrated = []
+    for listing in listings:
+        book = books.get(listing.get("book_id"), {})
+        profile = profiles.get(listing.get("user_id"), {})
+        listing_images = images.get(listing["id"], [])
+        hydrated.append({
+            **listing,
+            "book_title": book.get("title"),
+            "book_author": book.get("author"),
+            "book_isbn": book.get("isbn"),
+            "user_display_name": profile.get("display_name"),
+            "images": [img.get("webp_url") or img["image_url"] for img in listing_images],
+            "thumbnails": [img.get("thumbnail_url") or img["image_url"] for img in listing_images],
+        })
+    return hydrated, complete
+
+
+async def hydrate_listings(listings: List[dict]) -> Tuple[List[dict], bool]:
+    """
+    Attach images, book metadata and seller display name to listing rows
+    Issues at most three concurrent queries regardless of the number of
+    listings; book and profile lookups are usually served by the metadata cache
+    Returns the rows and whether every lookup succeeded
+    """
+    return await _hydrate_listings(listings)
+
+
+async def hydrate_listing(
+    listing: dict,
+    images: Optional[List[dict]] = None,
+) -> Tuple[dict, bool]:
+    """
+    Hydrate a single listing, returning it and whether every lookup succeeded
+    Incomplete results should not be cached
+    """
+    prefetched = {listing["id"]: images} if images is not None else None
+    hydrated, complete = await _hydrate_listings([listing], images=prefetched)
+    return hydrated[0], complete
+
+
+async def hydrate_requests(requests: List[dict]) -> Tuple[List[dict], bool]:
+    """
+    Attach requester display name to request rows
+    Issues at most one query regardless of the number of requests,
+    usually none thanks to the metadata cache
+    Returns the rows and whether the lookup succeeded
+    """
+    results, complete = await gather_within(
+        settings.HYDRATION_DEADLINE_SECONDS,
+        profiles=get_profiles(_unique(req.get("user_id") for req in requests)),
+    )
+    profiles = results["profiles"] or {}
+    hydrated = [
+        {
+            **req,
+            "user_display_name": profiles.get(req.get("user_id"), {}).get("display_name"),
+        }
+        for req in requests
+    ]
+    return hydrated, complete
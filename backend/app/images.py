@@ -0,0 +1,135 @@
+"""
+Listing image uploads
+
+An upload is stored under the SHA-256 of its content together with two
+WebP variants: a thumbnail for the feed and a display-size image for the
+listing page. The same photo uploaded twice (or to two listings) is only
+processed and stored once. Decoding and resizing are CPU-bound, so they
+run in a process pool and never block the event loop; both variants come
+from a single worker call, so each upload is decoded once.
+"""
+import asyncio
+import hashlib
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Optional, Tuple
+from PIL import Image, ImageOps, UnidentifiedImageError
+from app.config import settings
+from app.storage import Storage
+
+# Accepted upload types: (extension, content type) by leading bytes
+_SIGNATURES = (
+    (b"\xff\xd8\xff", ("jpg", "image/jpeg")),
+    (b"\x89PNG\r\n\x1a\n", ("png", "image/png")),
+)
+
+WEBP = "image/webp"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class InvalidImageError(ValueError):
+    """The upload is not an image that can be processed"""
+
+
+class StoredImage(NamedTuple):
+    """URLs of a stored upload and its variants"""
+    content_hash: str
+    image_url: str
+    thumbnail_url: str
+    webp_url: str
+
+
+def sniff_type(data: bytes) -> Tuple[str, str]:
+    """(extension, content type) of a JPEG, PNG or WebP upload"""
+    for signature, kind in _SIGNATURES:
+        if data.startswith(signature):
+            return kind
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp", WEBP
+    raise InvalidImageError("Only JPEG, PNG and WebP images are supported")
+
+
+def _encode_webp(image: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def render_variants(data: bytes, thumbnail_size: int, display_size: int, quality: int) -> Dict[str, bytes]:
+    """
+    Decode an upload and encode its display and thumbnail WebP variants
+    Runs in a pool worker; images keep their aspect ratio within the box
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            # Lets JPEG decode straight at a reduced scale
+            source.draft("RGB", (display_size, display_size))
+            image = ImageOps.exif_transpose(source)
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidImageError(f"Could not read image: {e}")
+
+    image.thumbnail((display_size, display_size), Image.Resampling.LANCZOS)
+    display = _encode_webp(image, quality)
+    image.thumbnail((thumbnail_size, thumbnail_size), Image.Resampling.LANCZOS)
+    return {"display": display, "thumbnail": _encode_webp(image, quality)}
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """The resize process pool, started on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS or None,
+            # Forking a process running an event loop and client threads is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the resize workers (application shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def store_image(data: bytes, storage: Storage) -> StoredImage:
+    """
+    Store an upload and its variants, reusing them if the content was seen before
+    Raises InvalidImageError for unsupported or corrupt images
+    """
+    extension, content_type = sniff_type(data)
+    content_hash = hashlib.sha256(data).hexdigest()
+    prefix = f"images/{content_hash[:2]}/{content_hash}"
+    keys = {
+        "original": f"{prefix}/original.{extension}",
+        "display": f"{prefix}/display.webp",
+        "thumbnail": f"{prefix}/thumbnail.webp",
+    }
+
+    # The thumbnail is written last, so its presence means the rest exists
+    if not await storage.exists(keys["thumbnail"]):
+        variants = await asyncio.get_running_loop().run_in_executor(
+            get_pool(),
+            render_variants,
+            data,
+            settings.IMAGE_THUMBNAIL_SIZE,
+            settings.IMAGE_DISPLAY_SIZE,
+            settings.IMAGE_WEBP_QUALITY,
+        )
+        await asyncio.gather(
+            storage.put(keys["original"], data, content_type),
+            storage.put(keys["display"], variants["display"], WEBP),
+        )
+        await storage.put(keys["thumbnail"], variants["thumbnail"], WEBP)
+
+    return StoredImage(
+        content_hash=content_hash,
+        image_url=storage.url(keys["original"]),
+        thumbnail_url=storage.url(keys["thumbnail"]),
+        webp_url=storage.url(keys["display"]),
+    )
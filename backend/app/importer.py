@@ -0,0 +1,226 @@
+"""
+Streaming bulk listing import from CSV or JSON Lines
+
+Rows are parsed from the request body as it arrives, validated against
+ListingCreate and written in batches through import_listings() (see
+docs/schema/SUPABASE_BULK_IMPORT.sql), one round trip per batch. While a
+batch is in flight the next one is parsed and validated. Invalid rows are
+reported and skipped; they never stop the run. A batch the database rejects
+is retried row by row to find the culprits; a batch that times out or is
+lost in transit is reported as failed, since it may have committed.
+"""
+import asyncio
+import codecs
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import ValidationError
+from app.models import ImportFormat, ImportReport, ImportRowError, ListingCreate
+from app.repository import is_rejection, repository
+from app.search import index_listing
+
+# CSV columns holding several values separate them with "|"
+LIST_SEPARATOR = "|"
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}"
+            for err in error.errors()
+        )
+    return str(error)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines, tolerating a UTF-8 BOM and CRLF"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Yield (row number, record) for each CSV data row
+    A record ends at a line break outside quotes, so quoted fields may span lines
+    """
+    header: Optional[List[str]] = None
+    record: List[str] = []
+    number = 0
+    async for line in lines:
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            continue
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        number += 1
+        yield number, dict(zip(header, values))
+    if record:
+        number += 1
+        yield number, {"__error__": "Unterminated quoted field"}
+
+
+async def iter_jsonl(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, dict]]:
+    """Yield (row number, record) for each non-blank JSON Lines row"""
+    number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = {"__error__": f"Invalid JSON: {e}"}
+        if not isinstance(record, dict):
+            record = {"__error__": "Each line must be a JSON object"}
+        yield number, record
+
+
+def parse_csv_record(record: dict) -> dict:
+    """Turn CSV strings into ListingCreate input: blanks are missing values"""
+    data = {
+        key: value.strip()
+        for key, value in record.items()
+        if key and value is not None and value.strip()
+    }
+    if "images" in data:
+        data["images"] = [url.strip() for url in data["images"].split(LIST_SEPARATOR) if url.strip()]
+    return data
+
+
+class ListingImporter:
+    """Imports validated listing rows for one seller in batches"""
+
+    def __init__(self, user_id: str, batch_size: int = 500, max_errors: int = 1000):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.total = 0
+        self.imported = 0
+        self.books_created = 0
+        self.failed = 0
+        self.errors: List[ImportRowError] = []
+
+    def _fail(self, number: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(ImportRowError(row=number, error=error))
+
+    def _imported(self, listing_id: str, book_id: str, listing: ListingCreate) -> None:
+        self.imported += 1
+        index_listing({
+            "id": listing_id,
+            "book_id": book_id,
+            "book_title": listing.title,
+            "book_author": listing.author,
+            "book_isbn": listing.isbn,
+            "status": "active",
+        })
+
+    async def _insert_one(self, number: int, listing: ListingCreate) -> None:
+        """Write a single row (used to isolate the failing rows of a batch)"""
+        try:
+            created = await repository.rpc(
+                "create_listing_with_book",
+                {
+                    "p_user_id": self.user_id,
+                    **{f"p_{key}": value for key, value in listing.model_dump(mode="json").items()},
+                },
+            )
+        except Exception as e:
+            self._fail(number, str(e))
+            return
+        if created.get("book_created"):
+            self.books_created += 1
+        self._imported(created["id"], created["book_id"], listing)
+
+    async def _flush(self, batch: List[Tuple[int, ListingCreate]]) -> None:
+        rows = [listing.model_dump(mode="json") for _, listing in batch]
+        try:
+            results = await repository.rpc(
+                "import_listings", {"p_user_id": self.user_id, "p_rows": rows}
+            )
+        except Exception as e:
+            if not is_rejection(e):
+                # A timeout or transport error leaves the batch's outcome
+                # unknown; replaying it could import every row twice
+                for number, _ in batch:
+                    self._fail(number, f"Batch failed and was not retried, check before re-importing: {e}")
+                return
+            # One bad row rolls back the whole batch; retry row by row to
+            # import the rest and report the culprits
+            await asyncio.gather(
+                *(self._insert_one(number, listing) for number, listing in batch)
+            )
+            return
+        for result in results or []:
+            _, listing = batch[result["ordinal"]]
+            if result["book_created"]:
+                self.books_created += 1
+            self._imported(result["listing_id"], result["book_id"], listing)
+
+    async def run(self, records: AsyncIterator[Tuple[int, dict]], fmt: ImportFormat) -> ImportReport:
+        """Validate and import every record, keeping one batch in flight"""
+        batch: List[Tuple[int, ListingCreate]] = []
+        in_flight: Optional[asyncio.Future] = None
+        try:
+            async for number, record in records:
+                self.total += 1
+                if "__error__" in record:
+                    self._fail(number, record["__error__"])
+                    continue
+                try:
+                    data = parse_csv_record(record) if fmt == ImportFormat.CSV else record
+                    batch.append((number, ListingCreate.model_validate(data)))
+                except (ValidationError, ValueError, TypeError) as e:
+                    self._fail(number, _error_message(e))
+                    continue
+                if len(batch) >= self.batch_size:
+                    if in_flight is not None:
+                        await in_flight
+                    in_flight = asyncio.ensure_future(self._flush(batch))
+                    batch = []
+            if in_flight is not None:
+                await in_flight
+                in_flight = None
+            if batch:
+                await self._flush(batch)
+        finally:
+            if in_flight is not None:
+                in_flight.cancel()
+
+        return ImportReport(
+            total=self.total,
+            imported=self.imported,
+            failed=self.failed,
+            books_created=self.books_created,
+            errors=sorted(self.errors, key=lambda error: error.row),
+            errors_truncated=self.failed > len(self.errors),
+        )
+
+
+async def import_listings(
+    chunks: AsyncIterator[bytes],
+    fmt: ImportFormat,
+    user_id: str,
+    batch_size: int = 500,
+    max_errors: int = 1000,
+) -> ImportReport:
+    """Import listings for user_id from a streamed CSV or JSON Lines body"""
+    lines = iter_lines(chunks)
+    records = iter_csv(lines) if fmt == ImportFormat.CSV else iter_jsonl(lines)
+    importer = ListingImporter(user_id, batch_size=batch_size, max_errors=max_errors)
+    return await importer.run(records, fmt)
@@ -0,0 +1,39 @@
+"""
+ISBN helpers
+"""
+import re
+from typing import Optional
+
+_NON_ISBN_CHARS = re.compile(r"[^0-9X]")
+_ISBN10 = re.compile(r"^[0-9]{9}[0-9X]$")
+
+
+def _isbn10_valid(digits: str) -> bool:
+    total = sum((10 - i) * (10 if char == "X" else int(char)) for i, char in enumerate(digits))
+    return total % 11 == 0
+
+
+def _isbn13_check_digit(first12: str) -> str:
+    total = sum((1 if i % 2 == 0 else 3) * int(char) for i, char in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn(value: Optional[str]) -> Optional[str]:
+    """
+    Canonical ISBN: separators stripped, valid ISBN-10s turned into ISBN-13
+    '0-13-468599-7' and '978-0-13-468599-1' -> '9780134685991'
+    Mirrors public.normalize_isbn() in docs/schema/SUPABASE_BOOK_CATALOG.sql
+    """
+    if not value:
+        return None
+    stripped = _NON_ISBN_CHARS.sub("", value.upper()) or None
+    if stripped and _ISBN10.match(stripped) and _isbn10_valid(stripped):
+        first12 = "978" + stripped[:9]
+        return first12 + _isbn13_check_digit(first12)
+    return stripped
+
+
+def looks_like_isbn(value: Optional[str]) -> bool:
+    """Whether a free-text query is an ISBN-10 or ISBN-13 once normalized"""
+    normalized = normalize_isbn(value)
+    return normalized is not None and len(normalized) in (10, 13)
@@ -6,17 +6,55 @@ import warnings
 # Suppress urllib3 OpenSSL warning (doesn't affect functionality)
 warnings.filterwarnings("ignore", message=".*urllib3.*")
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+from app import database
+from app.cache import cache_stats
+from app.compression import CompressionMiddleware
 from app.config import settings
-from app.routes import auth, listings, requests
+from app.images import shutdown_pool
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.querycount import QueryCountMiddleware
+from app.ratelimit import RateLimitMiddleware, create_backend
+from app.repository import repository
+from app.routes import auth, books, conversations, listings, requests, search
+from app.search import load_index
+from app.tokens import token_verifier
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the async Supabase clients and database pool on startup and release them on shutdown"""
+    await database.connect()
+    await repository.connect()
+    await load_index()
+    yield
+    shutdown_pool()
+    await repository.close()
+    await database.disconnect()
+
 
 app = FastAPI(
     title="GMU Book Trading Co API",
     description="Backend API for the GMU Book Trading Co platform",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Rate limiting (innermost, so 429 responses still get CORS headers)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=create_backend(settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_REDIS_URL),
+        identify_user=token_verifier.cached_subject,
+    )
+
+# Upstream query count of each request, for spotting N+1 loops
+if settings.QUERY_COUNT_HEADER:
+    app.add_middleware(QueryCountMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -24,12 +62,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "X-Query-Count"],
+)
+
+# Compression middleware (negotiated br/gzip above a size threshold)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
 )
 
+# Request metrics (outermost, so the timings include the other middleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
+app.include_router(books.router, prefix="/api/books", tags=["Books"])
 app.include_router(listings.router, prefix="/api/listings", tags=["Listings"])
 app.include_router(requests.router, prefix="/api/requests", tags=["Requests"])
+app.include_router(search.router, prefix="/api/search", tags=["Search"])
+app.include_router(conversations.router, prefix="/api/conversations", tags=["Messaging"])
+
+# Uploaded images, when they are stored on local disk
+if settings.STORAGE_BACKEND == "local":
+    app.mount(settings.MEDIA_URL, StaticFiles(directory=settings.MEDIA_ROOT, check_dir=False), name="media")
 
 
 @app.get("/health")
@@ -38,6 +96,18 @@ async def health_check():
     return {"status": "ok", "message": "GMU Book Trading Co Backend is running"}
 
 
+@app.get("/health/caches")
+async def cache_health():
+    """Hit/miss counters and occupancy of the in-process caches"""
+    return cache_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this worker process"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -0,0 +1,73 @@
+"""
+Request/listing matches
+
+Matches are computed by the database when a listing or request is inserted
+(see docs/schema/SUPABASE_MATCHING.sql) and stored in
+listing_request_matches, so serving them is an indexed lookup of at most
+`limit` rows plus the usual bulk hydration, whatever the table sizes.
+"""
+import asyncio
+from typing import List, Optional, Tuple
+from app.hydration import hydrate_listings, hydrate_requests
+from app.repository import repository
+
+
+async def _matched_rows(
+    own_table: str,
+    own_id: str,
+    own_column: str,
+    other_table: str,
+    other_column: str,
+    other_status: str,
+    limit: int,
+) -> Tuple[Optional[dict], List[dict]]:
+    """
+    The row own_id and the best-scored rows of other_table matched to it
+    Rows of other_table that are no longer active/open are left out; twice
+    the limit is read so a few stale matches don't shorten the result
+    """
+    own, matches = await asyncio.gather(
+        repository.select_one(own_table, {"id": own_id}, columns="id"),
+        repository.select(
+            "listing_request_matches",
+            {own_column: own_id},
+            columns=f"{other_column}, match_type, score",
+            order="score",
+            desc=True,
+            limit=limit * 2,
+        ),
+    )
+    if not own or not matches:
+        return own, []
+
+    scores = {match[other_column]: match for match in matches}
+    rows = await repository.select_in(other_table, "id", list(scores))
+    rows = [row for row in rows if row.get("status") == other_status]
+    rows.sort(key=lambda row: scores[row["id"]]["score"], reverse=True)
+    rows = rows[:limit]
+    for row in rows:
+        row["match_type"] = scores[row["id"]]["match_type"]
+        row["score"] = scores[row["id"]]["score"]
+    return own, rows
+
+
+async def listings_for_request(request_id: str, limit: int = 20) -> Optional[List[dict]]:
+    """Active listings matching a request, best first; None if the request doesn't exist"""
+    request, listings = await _matched_rows(
+        "requests", request_id, "request_id", "listings", "listing_id", "active", limit
+    )
+    if request is None:
+        return None
+    hydrated, _ = await hydrate_listings(listings)
+    return hydrated
+
+
+async def requests_for_listing(listing_id: str, limit: int = 20) -> Optional[List[dict]]:
+    """Open requests matching a listing, best first; None if the listing doesn't exist"""
+    listing, requests = await _matched_rows(
+        "listings", listing_id, "listing_id", "requests", "request_id", "open", limit
+    )
+    if listing is None:
+        return None
+    hydrated, _ = await hydrate_requests(requests)
+    return hydrated
@@ -0,0 +1,86 @@
+"""
+Process-wide cache of profile and book metadata
+
+Display names and book title/author/ISBN almost never change. Lookups are
+served from memory and only the ids missing from the cache are fetched, in
+one bulk query per table. Ids that don't exist are cached too (for a
+shorter time) so dangling references don't cost a query on every response.
+
+The hot reads (listing and request pages, listing detail) join this data in
+their own statement (see Repository.listing_page) and do not use the cache.
+It serves the remaining hydration (export, matches, request detail and
+writes) and the book catalog.
+"""
+from typing import Dict, Iterable
+from app.cache import TTLCache, register_cache
+from app.config import settings
+from app.repository import repository
+
+# Cached in place of a row that does not exist
+_NOT_FOUND = object()
+_MISSING = object()
+
+profile_cache = register_cache(
+    "profiles",
+    TTLCache(maxsize=settings.METADATA_CACHE_SIZE, ttl=settings.METADATA_CACHE_TTL_SECONDS),
+)
+# Book columns cached; enough to serve GET /api/books/{id} from memory
+BOOK_COLUMNS = ("title", "author", "isbn", "created_at", "is_active")
+
+book_cache = register_cache(
+    "books",
+    TTLCache(maxsize=settings.METADATA_CACHE_SIZE, ttl=settings.METADATA_CACHE_TTL_SECONDS),
+)
+
+
+async def _get_many(cache: TTLCache, table: str, columns: str, ids: Iterable[str]) -> Dict[str, dict]:
+    """Rows by id, loading cache misses with a single IN query"""
+    found: Dict[str, dict] = {}
+    missing = []
+    for row_id in dict.fromkeys(ids):
+        row = cache.get(row_id, _MISSING)
+        if row is _MISSING:
+            missing.append(row_id)
+        elif row is not _NOT_FOUND:
+            found[row_id] = row
+
+    if missing:
+        generation = cache.generation
+        rows = await repository.select_in(table, "id", missing, columns=f"id, {columns}")
+        loaded = {row["id"]: row for row in rows}
+        for row_id in missing:
+            row = loaded.get(row_id)
+            if row is not None:
+                found[row_id] = row
+                cache.set(row_id, row, generation=generation)
+            else:
+                cache.set(
+                    row_id,
+                    _NOT_FOUND,
+                    ttl=settings.METADATA_NEGATIVE_TTL_SECONDS,
+                    generation=generation,
+                )
+    return found
+
+
+async def get_profiles(user_ids: Iterable[str]) -> Dict[str, dict]:
+    """Profiles (id, display_name) by user id"""
+    return await _get_many(profile_cache, "profiles", "display_name", user_ids)
+
+
+async def get_books(book_ids: Iterable[str]) -> Dict[str, dict]:
+    """Books (id, title, author, isbn, created_at, is_active) by book id"""
+    return await _get_many(book_cache, "books", ", ".join(BOOK_COLUMNS), book_ids)
+
+
+def prime_book(book: dict) -> None:
+    """Cache a book row read or written outside get_books()"""
+    book_cache.set(book["id"], {"id": book["id"], **{key: book.get(key) for key in BOOK_COLUMNS}})
+
+
+def invalidate_profile(user_id: str) -> None:
+    profile_cache.invalidate(user_id)
+
+
+def invalidate_book(book_id: str) -> None:
+    book_cache.invalidate(book_id)
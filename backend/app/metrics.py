@@ -0,0 +1,303 @@
+"""
+Prometheus metrics
+
+A minimal in-process registry of counters, gauges and histograms rendered
+in the Prometheus text format by GET /metrics. Updates are a dict lookup
+and a few additions on the event loop thread (no locks, no I/O), so
+collection stays on in production. Values that already live elsewhere
+(cache counters, subscriber counts) are read when /metrics is scraped
+through registered collectors instead of being tracked per event.
+
+Metrics are per worker process: with several workers, scrape each one
+(or run one worker per container).
+"""
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from starlette.routing import Match
+from app.broker import broker
+from app.cache import cache_stats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans fast cache hits to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    """Base of the metric types: a name, help text and label names"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, values: Labels) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    @abstractmethod
+    def samples(self) -> Iterable[Sample]:
+        """The (suffix, labels, value) samples to expose"""
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._values.items():
+            yield self.name, self._labels(labels), value
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._values.items():
+            yield self.name, self._labels(labels), value
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., count above the last bucket, sum]
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, counts in self._values.items():
+            base = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**base, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", base, counts[-1]
+            yield f"{self.name}_count", base, cumulative
+
+
+class Registry:
+    """Metrics and scrape-time collectors rendered together"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """collector returns freshly filled metrics on every scrape"""
+        self._collectors.append(collector)
+
+    def render(self) -> bytes:
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return ("\n".join(lines) + "\n").encode()
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ("method", "route", "status"),
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being served",
+))
+upstream_call_duration = registry.register(Histogram(
+    "supabase_call_duration_seconds",
+    "Supabase call latency by table (or function) and verb",
+    ("table", "verb"),
+))
+upstream_call_errors = registry.register(Counter(
+    "supabase_call_errors_total",
+    "Failed Supabase calls by table (or function), verb and kind (timeout, error)",
+    ("table", "verb", "kind"),
+))
+upstream_calls_in_flight = registry.register(Gauge(
+    "supabase_calls_in_flight",
+    "Supabase calls awaiting a response",
+))
+upstream_calls_waiting = registry.register(Gauge(
+    "supabase_calls_waiting",
+    "Supabase calls queued for a concurrency slot",
+))
+supabase_http_requests = registry.register(Counter(
+    "supabase_http_requests_total",
+    "HTTP requests sent through the shared Supabase transport",
+))
+supabase_http_connections_opened = registry.register(Counter(
+    "supabase_http_connections_opened_total",
+    "Connections opened by the shared Supabase transport (requests minus this were served on reused connections)",
+))
+supabase_http_requests_in_flight = registry.register(Gauge(
+    "supabase_http_requests_in_flight",
+    "Supabase HTTP requests waiting for response headers",
+))
+
+for gauge in (
+    http_requests_in_flight,
+    upstream_calls_in_flight,
+    upstream_calls_waiting,
+    supabase_http_requests_in_flight,
+):
+    gauge.set(0)
+supabase_http_requests.inc(amount=0)
+supabase_http_connections_opened.inc(amount=0)
+
+
+def _cache_metrics() -> Iterable[Metric]:
+    """Counters of the named in-process caches (see app.cache)"""
+    hits = Counter("cache_hits_total", "Cache lookups served from memory", ("cache",))
+    misses = Counter("cache_misses_total", "Cache lookups that missed", ("cache",))
+    ratio = Gauge("cache_hit_ratio", "Share of cache lookups served from memory", ("cache",))
+    entries = Gauge("cache_entries", "Entries held by the cache", ("cache",))
+    for name, stats in cache_stats().items():
+        hits.inc(name, amount=stats["hits"])
+        misses.inc(name, amount=stats["misses"])
+        ratio.set(stats["hit_ratio"], name)
+        entries.set(stats["size"], name)
+    return hits, misses, ratio, entries
+
+
+def _broker_metrics() -> Iterable[Metric]:
+    """Live event stream subscribers of this process"""
+    subscribers = Gauge("broker_subscribers", "Connected event stream subscribers")
+    subscribers.set(broker.subscriber_count())
+    return (subscribers,)
+
+
+registry.register_collector(_cache_metrics)
+registry.register_collector(_broker_metrics)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request
+    Requests are labeled with their route template (/api/listings/{listing_id}),
+    never the raw path, so label cardinality stays bounded. Responses sent
+    before routing ran (429s from the rate limiter) are matched by path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[object, str] = {}
+
+    @staticmethod
+    def _match(scope) -> str:
+        """Template of the route the router would pick for scope, as it does"""
+        partial = None
+        for candidate in scope["app"].routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                return candidate.path
+            if match == Match.PARTIAL and partial is None:
+                partial = candidate.path
+        return partial or "unmatched"
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return self._match(scope)
+        route = self._routes.get(endpoint)
+        if route is None:
+            # Routing stores the matched endpoint (or mounted app) in the scope
+            for candidate in scope["app"].routes:
+                target = getattr(candidate, "endpoint", None) or getattr(candidate, "app", None)
+                self._routes.setdefault(target, candidate.path)
+            route = self._routes.get(endpoint, "unmatched")
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration.observe(
+                time.perf_counter() - start, scope["method"], self._route(scope), str(status)
+            )
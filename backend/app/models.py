@@ -2,7 +2,7 @@
 Pydantic models for request/response validation
 """
 from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -127,6 +127,13 @@ class BookResponse(BaseModel):
         from_attributes = True
 
 
+class BookListResponse(BaseModel):
+    """Book catalog page"""
+    books: List[BookResponse]
+    count: int
+    next_cursor: Optional[str] = None
+
+
 # Listing Models (Actual listings for sale/rent)
 class ListingCreate(BaseModel):
     """Listing creation request model"""
@@ -164,8 +171,8 @@ class ListingUpdate(BaseModel):
     rent_duration_unit: Optional[str] = Field(None, pattern="^(days|weeks|months)$")
 
 
-class ListingResponse(BaseModel):
-    """Listing response model with book info"""
+class ListingSummaryResponse(BaseModel):
+    """Listing as shown in the feed: book info and thumbnails only"""
     id: str
     user_id: str
     book_id: Optional[str]
@@ -182,8 +189,9 @@ class ListingResponse(BaseModel):
     book_title: Optional[str] = None
     book_author: Optional[str] = None
     book_isbn: Optional[str] = None
-    # Images
-    images: Optional[List[str]] = []
+    # Thumbnails of the images, in order; images added by URL have no
+    # thumbnail and repeat their URL
+    thumbnails: Optional[List[str]] = []
     # User info
     user_display_name: Optional[str] = None
 
@@ -191,10 +199,52 @@ class ListingResponse(BaseModel):
         from_attributes = True
 
 
+class ListingResponse(ListingSummaryResponse):
+    """Listing response model with book info and display-size images"""
+    # Display-size WebP of each image, in the same order as thumbnails;
+    # images added by URL (or uploaded before variants) keep their URL
+    images: Optional[List[str]] = []
+
+
+class ListingImageResponse(BaseModel):
+    """Listing image with its resized variants"""
+    id: str
+    listing_id: str
+    image_url: str
+    thumbnail_url: Optional[str] = None
+    webp_url: Optional[str] = None
+    content_hash: Optional[str] = None
+    created_at: datetime
+
+
 class ListingListResponse(BaseModel):
     """Listing list response model"""
-    listings: List[ListingResponse]
+    listings: List[ListingSummaryResponse]
     count: int
+    next_cursor: Optional[str] = None  # Pass as ?cursor= to fetch the next page
+
+
+# Bulk Import Models
+class ImportFormat(str, Enum):
+    """Bulk import file formats"""
+    CSV = "csv"
+    JSONL = "jsonl"
+
+
+class ImportRowError(BaseModel):
+    """A row that was not imported"""
+    row: int  # 1-based data row number (the CSV header is not counted)
+    error: str
+
+
+class ImportReport(BaseModel):
+    """Outcome of a bulk listing import"""
+    total: int
+    imported: int
+    failed: int
+    books_created: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False  # More errors occurred than are listed
 
 
 # Request Models
@@ -235,6 +285,124 @@ class RequestListResponse(BaseModel):
     """Request list response model"""
     requests: List[RequestResponse]
     count: int
+    next_cursor: Optional[str] = None  # Pass as ?cursor= to fetch the next page
+
+
+# Matching Models
+class MatchType(str, Enum):
+    """How a listing and a request were matched"""
+    ISBN = "isbn"  # Same normalized ISBN
+    TITLE = "title"  # Similar title/author (one side has no ISBN)
+
+
+class ListingMatch(ListingResponse):
+    """A listing matching a request"""
+    match_type: MatchType
+    score: float
+
+
+class ListingMatchListResponse(BaseModel):
+    """Listings matching a request, best first"""
+    request_id: str
+    matches: List[ListingMatch]
+    count: int
+
+
+class RequestMatch(RequestResponse):
+    """A request matching a listing"""
+    match_type: MatchType
+    score: float
+
+
+class RequestMatchListResponse(BaseModel):
+    """Requests matching a listing, best first"""
+    listing_id: str
+    matches: List[RequestMatch]
+    count: int
+
+
+# Messaging Models
+class ConversationCreate(BaseModel):
+    """Start (or reopen) a conversation with the owner of a listing or request"""
+    listing_id: Optional[str] = None
+    request_id: Optional[str] = None
+    body: Optional[str] = Field(None, min_length=1, max_length=4000)  # Optional first message
+
+    @model_validator(mode='after')
+    def validate_context(self):
+        """A conversation is about exactly one listing or request"""
+        if bool(self.listing_id) == bool(self.request_id):
+            raise ValueError('Provide exactly one of listing_id and request_id')
+        return self
+
+
+class ConversationResponse(BaseModel):
+    """Conversation with its participants and unread count for the current user"""
+    id: str
+    listing_id: Optional[str]
+    request_id: Optional[str]
+    created_at: datetime
+    participant_ids: List[str]
+    unread_count: int = 0
+
+
+class ConversationListResponse(BaseModel):
+    """Conversation list response model"""
+    conversations: List[ConversationResponse]
+    count: int
+
+
+class MessageCreate(BaseModel):
+    """Message creation model"""
+    body: str = Field(..., min_length=1, max_length=4000)
+
+
+class MessageResponse(BaseModel):
+    """Message response model"""
+    id: str
+    conversation_id: str
+    sender_id: str
+    body: str
+    created_at: datetime
+
+
+class MessageListResponse(BaseModel):
+    """Message history page, newest first"""
+    messages: List[MessageResponse]
+    count: int
+    next_cursor: Optional[str] = None  # Pass as ?cursor= to fetch older messages
+
+
+class UnreadCountsResponse(BaseModel):
+    """Unread message counts of the current user"""
+    total: int
+    conversations: Dict[str, int]  # conversation_id -> unread count
+
+
+# Search Models
+class SearchKind(str, Enum):
+    """Kinds of search results"""
+    BOOK = "book"
+    LISTING = "listing"
+    REQUEST = "request"
+
+
+class SearchResult(BaseModel):
+    """A ranked search match"""
+    kind: SearchKind
+    id: str
+    book_id: Optional[str] = None
+    title: str
+    author: Optional[str] = None
+    isbn: Optional[str] = None
+    score: float
+
+
+class SearchResponse(BaseModel):
+    """Search response model"""
+    query: str
+    results: List[SearchResult]
+    count: int
 
 
 # Trade Models (for future use)
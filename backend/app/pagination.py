@@ -0,0 +1,42 @@
+"""
+Opaque keyset cursors for newest-first feeds
+
+A cursor encodes the (created_at, id) position of the last row on a page.
+The next page starts strictly after that position, so it costs the same at
+any depth and does not shift when new rows are inserted at the head.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+
+def encode_cursor(row: dict) -> str:
+    """Encode the feed position of a row as an opaque cursor"""
+    payload = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor into its (created_at, id) position
+    Raises ValueError if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        # Both values end up in a PostgREST filter, so only accept
+        # a well-formed timestamp and UUID
+        datetime.fromisoformat(created_at)
+        uuid.UUID(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def next_cursor(rows: List[dict], limit: int) -> Optional[str]:
+    """Cursor for the page after rows, or None if this was the last page"""
+    if len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1])
@@ -0,0 +1,80 @@
+"""
+Upstream query counting
+
+Every Supabase call made through the repository is recorded here, so a
+request that issues one query per row (an N+1 loop) shows up as a growing
+count instead of as production latency. Calls are counted per HTTP request
+(reported in the X-Query-Count response header when QUERY_COUNT_HEADER is
+on) and within capture_queries() blocks, which the query_budget test
+fixture (tests/conftest.py) uses to enforce per-endpoint query budgets.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+HEADER = b"x-query-count"
+
+Operation = Tuple[str, str]
+
+# Calls of the HTTP request being served (tasks it spawns share the list)
+_request_calls: ContextVar[Optional[List[Operation]]] = ContextVar("request_calls", default=None)
+
+# Open capture_queries() blocks. Process-wide rather than per context, since
+# test clients serve requests on another thread than the test itself
+_captures: List[List[Operation]] = []
+
+
+def record(operation: Operation) -> None:
+    """Count one upstream call, as (table or function, verb)"""
+    calls = _request_calls.get()
+    if calls is not None:
+        calls.append(operation)
+    for captured in _captures:
+        captured.append(operation)
+
+
+@contextmanager
+def capture_queries() -> Iterator[List[Operation]]:
+    """Collect the upstream calls made while the block runs"""
+    captured: List[Operation] = []
+    _captures.append(captured)
+    try:
+        yield captured
+    finally:
+        _captures.remove(captured)
+
+
+def format_queries(queries: List[Operation]) -> str:
+    """Calls grouped by operation, most frequent first ("listings select x3, ...")"""
+    counts = {}
+    for operation in queries:
+        counts[operation] = counts.get(operation, 0) + 1
+    ordered = sorted(counts.items(), key=lambda item: -item[1])
+    return ", ".join(f"{table} {verb} x{count}" for (table, verb), count in ordered)
+
+
+class QueryCountMiddleware:
+    """ASGI middleware adding X-Query-Count (upstream calls made so far) to responses"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        calls: List[Operation] = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((HEADER, str(len(calls)).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _request_calls.set(calls)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_calls.reset(token)
@@ -0,0 +1,223 @@
+"""
+Rate limiting for the auth and write endpoints
+
+Each request is matched to at most one Policy, by exact path first and then
+by path prefix, and counted against the caller's key: the user id for
+USER policies (once their token has been verified) or the client IP.
+Limits are enforced with GCRA, a token bucket that stores one timestamp
+per key, so a check costs a dict lookup and some arithmetic.
+
+MemoryBackend keeps state per worker. With several workers, RedisBackend
+shares it so a limit holds across the deployment; it is optional
+(pip install redis) and the limiter fails open if Redis is unreachable.
+"""
+import json
+import math
+import time
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+IP = "ip"
+USER = "user"
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class Policy(NamedTuple):
+    """At most `limit` requests per `period` seconds per key, bursts included"""
+    name: str
+    methods: FrozenSet[str]
+    path: str
+    limit: int
+    period: float
+    key: str = IP
+    prefix: bool = False
+
+
+DEFAULT_POLICIES = (
+    # Every auth call fans out to Supabase Auth; keyed on IP since the
+    # caller is not signed in yet
+    Policy("signup", frozenset({"POST"}), "/api/auth/signup", limit=5, period=3600),
+    Policy("login", frozenset({"POST"}), "/api/auth/login", limit=10, period=60),
+    Policy("resend-verification", frozenset({"POST"}), "/api/auth/resend-verification", limit=3, period=600),
+    Policy("check-verification", frozenset({"GET"}), "/api/auth/check-verification", limit=30, period=60),
+    Policy("verify-email", frozenset({"POST"}), "/api/auth/verify-email", limit=10, period=60),
+    Policy("import", frozenset({"POST"}), "/api/listings/import", limit=10, period=3600, key=USER),
+    Policy("writes", WRITE_METHODS, "/api/", limit=120, period=60, key=USER, prefix=True),
+)
+
+
+class RateLimitBackend(ABC):
+    """Interface of the rate limit state store"""
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, period: float) -> float:
+        """
+        Count one request for key
+        Returns 0 if it is allowed, else the seconds until it would be
+        """
+
+
+class MemoryBackend(RateLimitBackend):
+    """Per-process GCRA state: one theoretical arrival time per key"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+
+    def _prune(self, now: float) -> None:
+        for key in [key for key, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+        # Still full of active keys: drop the oldest ones
+        overflow = len(self._tats) - self.max_keys // 2
+        if overflow > 0:
+            for key in list(islice(self._tats, overflow)):
+                del self._tats[key]
+
+    async def hit(self, key: str, limit: int, period: float) -> float:
+        now = time.monotonic()
+        tat = self._tats.get(key)
+        if tat is None:
+            if len(self._tats) >= self.max_keys:
+                self._prune(now)
+            tat = now
+        elif tat < now:
+            tat = now
+        new_tat = tat + period / limit
+        allow_at = new_tat - period
+        if allow_at > now:
+            return allow_at - now
+        self._tats[key] = new_tat
+        return 0.0
+
+
+# GCRA as a single atomic script, on the Redis clock so workers agree.
+# Returns a string: Redis truncates Lua numbers to integers
+_GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + period / limit
+local allow_at = new_tat - period
+if allow_at > now then return tostring(allow_at - now) end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return '0'
+"""
+
+
+class RedisBackend(RateLimitBackend):
+    """GCRA state shared by all workers through Redis"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package")
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_GCRA_SCRIPT)
+
+    async def hit(self, key: str, limit: int, period: float) -> float:
+        return float(await self._script(keys=[self.prefix + key], args=[limit, period]))
+
+
+def create_backend(name: str, redis_url: str) -> RateLimitBackend:
+    """The backend selected by RATE_LIMIT_BACKEND ("memory" or "redis")"""
+    if name == "redis":
+        return RedisBackend(redis_url)
+    return MemoryBackend()
+
+
+def _bearer_token(headers: Iterable[Tuple[bytes, bytes]]) -> Optional[str]:
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" and token else None
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware rejecting requests over their policy with 429 and Retry-After
+    identify_user maps a bearer token to a user id when the token is already
+    known to be valid, and returns None otherwise. Unverified tokens are
+    never used as keys, since a client could mint new ones to reset its limit.
+    """
+
+    def __init__(
+        self,
+        app,
+        backend: RateLimitBackend,
+        policies: Iterable[Policy] = DEFAULT_POLICIES,
+        identify_user: Optional[Callable[[str], Optional[str]]] = None,
+    ):
+        self.app = app
+        self.backend = backend
+        self.identify_user = identify_user
+        self._exact: Dict[str, List[Policy]] = {}
+        self._prefixes: List[Policy] = []
+        for policy in policies:
+            if policy.prefix:
+                self._prefixes.append(policy)
+            else:
+                self._exact.setdefault(policy.path.rstrip("/"), []).append(policy)
+        # Longest prefix first, so the most specific policy wins
+        self._prefixes.sort(key=lambda policy: len(policy.path), reverse=True)
+
+    def match(self, method: str, path: str) -> Optional[Policy]:
+        """The policy a request counts against, if any"""
+        for policy in self._exact.get(path.rstrip("/"), ()):
+            if method in policy.methods:
+                return policy
+        for policy in self._prefixes:
+            if method in policy.methods and path.startswith(policy.path):
+                return policy
+        return None
+
+    def _identity(self, scope, policy: Policy) -> str:
+        if policy.key == USER and self.identify_user is not None:
+            token = _bearer_token(scope["headers"])
+            user_id = self.identify_user(token) if token else None
+            if user_id:
+                return f"user:{user_id}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.match(scope["method"], scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{policy.name}:{self._identity(scope, policy)}"
+        try:
+            retry_after = await self.backend.hit(key, policy.limit, policy.period)
+        except Exception:
+            retry_after = 0.0  # fail open: an unavailable store must not take the API down
+
+        if retry_after <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Too many requests, please try again later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
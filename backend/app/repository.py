@@ -0,0 +1,1007 @@
+"""
+Async data-access layer
+
+Routers never call the Supabase clients or the database directly. Every
+table, RPC and Auth call goes through the repositories below, which apply
+a per-call timeout and bound the number of in-flight upstream calls so a
+slow response never stalls the event loop.
+
+Table access is the Repository interface with two backends, selected by
+DATABASE_BACKEND: SupabaseRepository over PostgREST (the default) and
+PostgresRepository over a direct asyncpg pool (optional, pip install
+asyncpg). Auth always goes through Supabase Auth.
+"""
+import asyncio
+import json
+import re
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+import httpx
+from postgrest.exceptions import APIError
+from app import database
+from app.config import settings
+from app.metrics import (
+    upstream_call_duration,
+    upstream_call_errors,
+    upstream_calls_in_flight,
+    upstream_calls_waiting,
+)
+from app.querycount import record
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+
+class UpstreamTimeoutError(TimeoutError):
+    """Raised when a Supabase call does not complete within its timeout"""
+
+
+def is_rejection(error: Exception) -> bool:
+    """
+    Whether error is the database refusing a statement (constraint, invalid
+    input, raised exception), which rolled it back. Timeouts and transport
+    errors are not: the statement may have committed before they surfaced.
+    """
+    if isinstance(error, APIError):
+        # PostgREST reports SQLSTATE / PGRST codes; a gateway failure without
+        # an error body carries the HTTP status (an int) instead
+        return isinstance(error.code, str) and bool(error.code)
+    return asyncpg is not None and isinstance(error, asyncpg.PostgresError)
+
+
+class UpstreamLimiter:
+    """Bounds concurrent upstream calls and applies a timeout to each one"""
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        timeout: Optional[float] = None,
+        operation: Tuple[str, str] = ("unknown", "unknown"),
+        **kwargs,
+    ) -> Any:
+        """
+        Await fn(*args, **kwargs) once a concurrency slot is free
+        The timeout covers only the upstream call, not the wait for a slot.
+        A timeout of the HTTP transport itself (httpx.TimeoutException) is
+        raised as UpstreamTimeoutError too, so callers handle one error type.
+        operation is the (table or function, verb) the call is measured under.
+        """
+        timeout = timeout or self.timeout
+        record(operation)
+        upstream_calls_waiting.inc()
+        async with self._semaphore:
+            upstream_calls_waiting.dec()
+            upstream_calls_in_flight.inc()
+            start = time.perf_counter()
+            try:
+                return await asyncio.wait_for(fn(*args, **kwargs), timeout)
+            except asyncio.TimeoutError:
+                upstream_call_errors.inc(*operation, "timeout")
+                raise UpstreamTimeoutError(f"Supabase call timed out after {timeout:g}s")
+            except httpx.TimeoutException as e:
+                upstream_call_errors.inc(*operation, "timeout")
+                raise UpstreamTimeoutError(f"Supabase call timed out: {e!r}") from e
+            except Exception:
+                upstream_call_errors.inc(*operation, "error")
+                raise
+            finally:
+                upstream_calls_in_flight.dec()
+                upstream_call_duration.observe(time.perf_counter() - start, *operation)
+
+
+limiter = UpstreamLimiter(
+    max_concurrency=settings.SUPABASE_MAX_CONCURRENCY,
+    timeout=settings.SUPABASE_TIMEOUT_SECONDS,
+)
+
+
+class Repository(ABC):
+    """
+    Interface of the table data-access layer
+    Routers only use these methods, so the backend (PostgREST or a direct
+    Postgres pool) is chosen by DATABASE_BACKEND without touching them.
+    Rows are returned as PostgREST renders them: JSON-compatible dicts with
+    ISO timestamp strings.
+    """
+
+    async def connect(self) -> None:
+        """Open connections (application startup)"""
+
+    async def close(self) -> None:
+        """Release connections (application shutdown)"""
+
+    @abstractmethod
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*",
+        order: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[dict]:
+        """Select rows matching equality filters, optionally ordered and paged"""
+
+    @abstractmethod
+    async def select_page(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+        columns: str = "*",
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Select a newest-first page ordered by (created_at, id)
+        after is the (created_at, id) position of the previous page's last row
+        (keyset mode); without it, offset pages from the head of the feed.
+        created_from (inclusive) and created_to (exclusive) bound created_at.
+        """
+
+    async def select_one(
+        self,
+        table: str,
+        filters: Dict[str, Any],
+        columns: str = "*",
+    ) -> Optional[dict]:
+        """Select the first row matching equality filters, or None"""
+        rows = await self.select(table, filters, columns=columns, limit=1)
+        return rows[0] if rows else None
+
+    @abstractmethod
+    async def select_in(
+        self,
+        table: str,
+        column: str,
+        values: Iterable,
+        columns: str = "*",
+        order: Optional[str] = None,
+    ) -> List[dict]:
+        """Select rows whose column is in a set of values with one query"""
+
+    async def scan(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 1000,
+        columns: str = "*",
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Iterate over every matching row newest-first in keyset-ordered chunks
+        Memory use is bounded by chunk_size regardless of table size
+        """
+        async for rows in self.scan_chunks(
+            table, filters, chunk_size, columns, created_from, created_to
+        ):
+            for row in rows:
+                yield row
+
+    async def scan_chunks(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 1000,
+        columns: str = "*",
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+    ) -> AsyncIterator[List[dict]]:
+        """Like scan(), but yield each keyset-ordered chunk as a list"""
+        after = None
+        while True:
+            rows = await self.select_page(
+                table,
+                filters,
+                limit=chunk_size,
+                after=after,
+                columns=columns,
+                created_from=created_from,
+                created_to=created_to,
+            )
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            after = (rows[-1]["created_at"], rows[-1]["id"])
+
+    @abstractmethod
+    async def insert(self, table: str, rows) -> List[dict]:
+        """Insert one row (dict) or many rows (list) and return them"""
+
+    @abstractmethod
+    async def update(
+        self,
+        table: str,
+        values: Dict[str, Any],
+        filters: Dict[str, Any],
+    ) -> List[dict]:
+        """Update rows matching equality filters and return them"""
+
+    @abstractmethod
+    async def delete(self, table: str, filters: Dict[str, Any]) -> List[dict]:
+        """Delete rows matching equality filters"""
+
+    @abstractmethod
+    async def rpc(
+        self,
+        function: str,
+        params: Optional[Dict[str, Any]] = None,
+        admin: bool = False,
+    ) -> Any:
+        """
+        Call a Postgres function in the public schema
+        admin calls it with the service role, for functions not granted to
+        anon/authenticated because they trust their user id arguments
+        """
+
+    # Hot read paths: each is a single statement joining the rows with their
+    # book, seller/requester and images, shaped like app.hydration's output
+
+    @abstractmethod
+    async def listing_page(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[dict]:
+        """A newest-first page of hydrated listings (see select_page)"""
+
+    @abstractmethod
+    async def listing_detail(self, listing_id: str) -> Optional[dict]:
+        """One hydrated listing, or None"""
+
+    @abstractmethod
+    async def request_page(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[dict]:
+        """A newest-first page of requests with the requester's display name"""
+
+
+# PostgREST resource embedding for the hot reads (joins over the foreign keys)
+LISTING_EMBED = (
+    "*, books(title, author, isbn), profiles(display_name), "
+    "listing_images(image_url, thumbnail_url, webp_url, created_at)"
+)
+REQUEST_EMBED = "*, profiles(display_name)"
+
+
+def _flatten_listing(row: dict) -> dict:
+    """Hydrated listing from a row with embedded book, profile and images"""
+    book = row.pop("books", None) or {}
+    profile = row.pop("profiles", None) or {}
+    images = sorted(row.pop("listing_images", None) or [], key=lambda img: img["created_at"])
+    return {
+        **row,
+        "book_title": book.get("title"),
+        "book_author": book.get("author"),
+        "book_isbn": book.get("isbn"),
+        "user_display_name": profile.get("display_name"),
+        "images": [img.get("webp_url") or img["image_url"] for img in images],
+        "thumbnails": [img.get("thumbnail_url") or img["image_url"] for img in images],
+    }
+
+
+def _flatten_request(row: dict) -> dict:
+    profile = row.pop("profiles", None) or {}
+    return {**row, "user_display_name": profile.get("display_name")}
+
+
+class SupabaseRepository(Repository):
+    """Table access through PostgREST"""
+
+    def __init__(self, limiter: UpstreamLimiter):
+        self.limiter = limiter
+
+    def _table(self, table: str):
+        return database.get_client().table(table)
+
+    async def _execute(
+        self,
+        query,
+        table: str,
+        verb: str,
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
+        response = await self.limiter.call(
+            query.execute, timeout=timeout, operation=(table, verb)
+        )
+        return response.data or []
+
+    @staticmethod
+    def _apply_filters(query, filters: Optional[Dict[str, Any]]):
+        for column, value in (filters or {}).items():
+            query = query.eq(column, value)
+        return query
+
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*",
+        order: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[dict]:
+        query = self._apply_filters(self._table(table).select(columns), filters)
+        if order:
+            query = query.order(order, desc=desc)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        return await self._execute(query, table, "select")
+
+    async def select_page(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+        columns: str = "*",
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+    ) -> List[dict]:
+        # The created_at bound lets the created_at index serve the range scan
+        query = self._apply_filters(self._table(table).select(columns), filters)
+        if created_from:
+            query = query.gte("created_at", created_from)
+        if created_to:
+            query = query.lt("created_at", created_to)
+        if after:
+            created_at, row_id = after
+            query = query.lte("created_at", created_at).or_(
+                f'created_at.lt."{created_at}",id.lt.{row_id}'
+            )
+        query = query.order("created_at", desc=True).order("id", desc=True)
+        return await self._execute(query.range(offset, offset + limit - 1), table, "select")
+
+    async def select_in(
+        self,
+        table: str,
+        column: str,
+        values: Iterable,
+        columns: str = "*",
+        order: Optional[str] = None,
+    ) -> List[dict]:
+        values = list(values)
+        if not values:
+            return []
+        query = self._table(table).select(columns).in_(column, values)
+        if order:
+            query = query.order(order)
+        return await self._execute(query, table, "select")
+
+    async def insert(self, table: str, rows) -> List[dict]:
+        return await self._execute(self._table(table).insert(rows), table, "insert")
+
+    async def update(
+        self,
+        table: str,
+        values: Dict[str, Any],
+        filters: Dict[str, Any],
+    ) -> List[dict]:
+        return await self._execute(
+            self._apply_filters(self._table(table).update(values), filters), table, "update"
+        )
+
+    async def delete(self, table: str, filters: Dict[str, Any]) -> List[dict]:
+        return await self._execute(
+            self._apply_filters(self._table(table).delete(), filters), table, "delete"
+        )
+
+    async def rpc(
+        self,
+        function: str,
+        params: Optional[Dict[str, Any]] = None,
+        admin: bool = False,
+    ) -> Any:
+        query = database.get_client(admin=admin).rpc(function, params or {})
+        response = await self.limiter.call(query.execute, operation=(function, "rpc"))
+        return response.data
+
+    async def listing_page(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[dict]:
+        rows = await self.select_page(
+            "listings", filters, limit=limit, offset=offset, after=after, columns=LISTING_EMBED
+        )
+        return [_flatten_listing(row) for row in rows]
+
+    async def listing_detail(self, listing_id: str) -> Optional[dict]:
+        row = await self.select_one("listings", {"id": listing_id}, columns=LISTING_EMBED)
+        return _flatten_listing(row) if row else None
+
+    async def request_page(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[dict]:
+        rows = await self.select_page(
+            "requests", filters, limit=limit, offset=offset, after=after, columns=REQUEST_EMBED
+        )
+        return [_flatten_request(row) for row in rows]
+
+
+class AuthRepository(ABC):
+    """Interface of the user account operations the auth routes use"""
+
+    @abstractmethod
+    async def sign_up(self, credentials: dict, timeout: Optional[float] = None):
+        """Register a user; the verification email is sent by the provider"""
+
+    @abstractmethod
+    async def sign_in_with_password(self, credentials: dict):
+        """Exchange email and password for a session"""
+
+    @abstractmethod
+    async def sign_out(self):
+        """End the current session"""
+
+    @abstractmethod
+    async def get_user(self, token: str):
+        """The user an access token belongs to, checked by the provider"""
+
+    @abstractmethod
+    async def resend(self, credentials: dict, timeout: Optional[float] = None):
+        """Send the verification email again"""
+
+    @abstractmethod
+    async def verify_otp(self, params: dict):
+        """Confirm an email verification token"""
+
+    @abstractmethod
+    async def get_user_by_id(self, user_id: str):
+        """Look up one user by id with admin rights"""
+
+    @abstractmethod
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        """
+        Look up one user by email
+        Returns a dict with id, email, email_confirmed_at and created_at, or None
+        """
+
+
+class SupabaseAuthRepository(AuthRepository):
+    """Supabase Auth (GoTrue) access"""
+
+    def __init__(self, limiter: UpstreamLimiter):
+        self.limiter = limiter
+
+    async def sign_up(self, credentials: dict, timeout: Optional[float] = None):
+        return await self.limiter.call(
+            database.get_client().auth.sign_up,
+            credentials,
+            timeout=timeout,
+            operation=("auth", "sign_up"),
+        )
+
+    async def sign_in_with_password(self, credentials: dict):
+        return await self.limiter.call(
+            database.get_client().auth.sign_in_with_password,
+            credentials,
+            operation=("auth", "sign_in_with_password"),
+        )
+
+    async def sign_out(self):
+        return await self.limiter.call(
+            database.get_client().auth.sign_out, operation=("auth", "sign_out")
+        )
+
+    async def get_user(self, token: str):
+        return await self.limiter.call(
+            database.get_client().auth.get_user, token, operation=("auth", "get_user")
+        )
+
+    async def resend(self, credentials: dict, timeout: Optional[float] = None):
+        return await self.limiter.call(
+            database.get_client().auth.resend,
+            credentials,
+            timeout=timeout,
+            operation=("auth", "resend"),
+        )
+
+    async def verify_otp(self, params: dict):
+        return await self.limiter.call(
+            database.get_client().auth.verify_otp, params, operation=("auth", "verify_otp")
+        )
+
+    async def get_user_by_id(self, user_id: str):
+        return await self.limiter.call(
+            database.get_client(admin=True).auth.admin.get_user_by_id,
+            user_id,
+            operation=("auth", "get_user_by_id"),
+        )
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        """
+        Look up one user by email with an indexed query
+        Uses get_auth_user_by_email() from docs/schema/SUPABASE_EMAIL_LOOKUP.sql
+        Returns a dict with id, email, email_confirmed_at and created_at, or None
+        """
+        query = database.get_client(admin=True).rpc(
+            "get_auth_user_by_email", {"p_email": email.lower()}
+        )
+        response = await self.limiter.call(
+            query.execute, operation=("get_auth_user_by_email", "rpc")
+        )
+        rows = response.data or []
+        return rows[0] if rows else None
+
+
+_IDENTIFIER = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+# Hydrated listings: the page is selected first (index range scan), then
+# joined with its book, seller and aggregated images
+_LISTING_SQL = """
+SELECT to_jsonb(l) || jsonb_build_object(
+    'book_title', b.title,
+    'book_author', b.author,
+    'book_isbn', b.isbn,
+    'user_display_name', p.display_name,
+    'images', coalesce(i.images, '[]'::jsonb),
+    'thumbnails', coalesce(i.thumbnails, '[]'::jsonb)
+)
+FROM ({page}) AS l
+LEFT JOIN public.books AS b ON b.id = l.book_id
+LEFT JOIN public.profiles AS p ON p.id = l.user_id
+LEFT JOIN LATERAL (
+    SELECT jsonb_agg(coalesce(li.webp_url, li.image_url) ORDER BY li.created_at) AS images,
+           jsonb_agg(coalesce(li.thumbnail_url, li.image_url) ORDER BY li.created_at) AS thumbnails
+    FROM public.listing_images AS li
+    WHERE li.listing_id = l.id
+) AS i ON true
+ORDER BY l.created_at DESC, l.id DESC
+"""
+
+_REQUEST_SQL = """
+SELECT to_jsonb(r) || jsonb_build_object('user_display_name', p.display_name)
+FROM ({page}) AS r
+LEFT JOIN public.profiles AS p ON p.id = r.user_id
+ORDER BY r.created_at DESC, r.id DESC
+"""
+
+_COLUMNS_SQL = """
+SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+FROM pg_attribute AS a
+WHERE a.attrelid = to_regclass($1) AND a.attnum > 0 AND NOT a.attisdropped
+"""
+
+_FUNCTION_SQL = """
+SELECT p.proretset,
+       p.prorettype = 'void'::regtype,
+       coalesce(p.proargnames, '{}'),
+       coalesce(p.proargmodes::text[], '{}'),
+       ARRAY(
+           SELECT format_type(t.oid, NULL)
+           FROM unnest(coalesce(p.proallargtypes, p.proargtypes::oid[])) WITH ORDINALITY AS t(oid, n)
+           ORDER BY t.n
+       )
+FROM pg_proc AS p
+WHERE p.pronamespace = 'public'::regnamespace AND p.proname = $1
+LIMIT 1
+"""
+
+
+def _ident(name: str) -> str:
+    """Quoted identifier; names come from code, never from requests"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """A parameter in the text form Postgres casts from"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, Enum):
+        return str(value.value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value)
+    return str(value)
+
+
+class _Params:
+    """
+    Positional query arguments
+    Every value is sent as text and cast in the statement to the column or
+    argument type, so the driver never has to guess Python-to-Postgres types
+    and the casts apply to constants (indexes stay usable)
+    """
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+
+    def add(self, value: Any, type_name: str) -> str:
+        self.values.append(_as_text(value))
+        ref = f"${len(self.values)}::text"
+        if type_name.endswith("[]"):
+            # Lists travel as JSON arrays
+            return f"ARRAY(SELECT jsonb_array_elements_text({ref}::jsonb))::{type_name}"
+        return f"{ref}::{type_name}"
+
+
+class PostgresRepository(Repository):
+    """
+    Table access over a direct asyncpg connection pool
+    Queries are built from the same method calls as SupabaseRepository and
+    return the same JSON shapes (rows are rendered with to_jsonb), while the
+    hot reads run hand-written joins as one statement. The connection's role
+    applies instead of the anon key and RLS policies: authorization stays in
+    the routers, as with PostgREST.
+    """
+
+    def __init__(
+        self,
+        limiter: UpstreamLimiter,
+        dsn: str,
+        min_size: int,
+        max_size: int,
+        statement_cache_size: int,
+    ):
+        if asyncpg is None:
+            raise RuntimeError("DATABASE_BACKEND=postgres requires the asyncpg package")
+        if not dsn:
+            raise RuntimeError("DATABASE_BACKEND=postgres requires DATABASE_URL")
+        self.limiter = limiter
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self._pool = None
+        # Catalog lookups, loaded on first use of each table/function
+        self._columns: Dict[str, Dict[str, str]] = {}
+        self._functions: Dict[str, tuple] = {}
+
+    @staticmethod
+    async def _init_connection(connection) -> None:
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(
+                type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+            )
+
+    async def connect(self) -> None:
+        self._pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            # 0 behind PgBouncer in transaction mode (Supabase pooler, port 6543)
+            statement_cache_size=self.statement_cache_size,
+            init=self._init_connection,
+        )
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _fetch(self, sql: str, *args) -> list:
+        if self._pool is None:
+            raise RuntimeError("Postgres pool is not connected. Call repository.connect() on startup.")
+        async with self._pool.acquire() as connection:
+            return await connection.fetch(sql, *args)
+
+    async def _rows(
+        self,
+        sql: str,
+        args: List[Optional[str]],
+        table: str,
+        verb: str,
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
+        records = await self.limiter.call(
+            self._fetch, sql, *args, timeout=timeout, operation=(table, verb)
+        )
+        return [record[0] for record in records]
+
+    async def _column_types(self, table: str) -> Dict[str, str]:
+        types = self._columns.get(table)
+        if types is None:
+            records = await self.limiter.call(
+                self._fetch, _COLUMNS_SQL, f"public.{_ident(table)}", operation=(table, "catalog")
+            )
+            if not records:
+                raise ValueError(f"Unknown table: {table}")
+            types = self._columns[table] = {name: type_name for name, type_name in records}
+        return types
+
+    @staticmethod
+    def _type(types: Dict[str, str], column: str) -> str:
+        type_name = types.get(column)
+        if type_name is None:
+            raise ValueError(f"Unknown column: {column}")
+        return type_name
+
+    @staticmethod
+    def _projection(columns: str) -> str:
+        names = [name.strip() for name in columns.split(",")]
+        if "*" in names:
+            return "to_jsonb(t)"
+        return "jsonb_build_object(" + ", ".join(
+            f"'{name}', t.{_ident(name)}" for name in names
+        ) + ")"
+
+    def _where(
+        self,
+        types: Dict[str, str],
+        params: _Params,
+        filters: Optional[Dict[str, Any]],
+        conditions: Iterable[str] = (),
+    ) -> str:
+        conditions = list(conditions)
+        for column, value in (filters or {}).items():
+            if value is None:
+                conditions.append(f"t.{_ident(column)} IS NULL")
+            else:
+                conditions.append(f"t.{_ident(column)} = {params.add(value, self._type(types, column))}")
+        return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    async def _page_sql(
+        self,
+        table: str,
+        params: _Params,
+        filters: Optional[Dict[str, Any]],
+        limit: int,
+        offset: int,
+        after: Optional[Tuple[str, str]],
+        projection: str,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+    ) -> str:
+        types = await self._column_types(table)
+        created_type = self._type(types, "created_at")
+        conditions = []
+        if created_from:
+            conditions.append(f"t.created_at >= {params.add(created_from, created_type)}")
+        if created_to:
+            conditions.append(f"t.created_at < {params.add(created_to, created_type)}")
+        if after:
+            # Row comparison: one range condition on the (created_at, id) index
+            created_at, row_id = after
+            conditions.append(
+                f"(t.created_at, t.id) < ({params.add(created_at, created_type)}, "
+                f"{params.add(row_id, self._type(types, 'id'))})"
+            )
+        where = self._where(types, params, filters, conditions)
+        return (
+            f"SELECT {projection} FROM public.{_ident(table)} AS t{where} "
+            f"ORDER BY t.created_at DESC, t.id DESC "
+            f"LIMIT {int(limit)} OFFSET {int(offset)}"
+        )
+
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*",
+        order: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[dict]:
+        types = await self._column_types(table)
+        params = _Params()
+        sql = f"SELECT {self._projection(columns)} FROM public.{_ident(table)} AS t"
+        sql += self._where(types, params, filters)
+        if order:
+            sql += f" ORDER BY t.{_ident(order)} {'DESC' if desc else 'ASC'}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)} OFFSET {int(offset)}"
+        return await self._rows(sql, params.values, table, "select")
+
+    async def select_page(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+        columns: str = "*",
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+    ) -> List[dict]:
+        params = _Params()
+        sql = await self._page_sql(
+            table, params, filters, limit, offset, after,
+            self._projection(columns), created_from, created_to,
+        )
+        return await self._rows(sql, params.values, table, "select")
+
+    async def select_in(
+        self,
+        table: str,
+        column: str,
+        values: Iterable,
+        columns: str = "*",
+        order: Optional[str] = None,
+    ) -> List[dict]:
+        values = list(values)
+        if not values:
+            return []
+        types = await self._column_types(table)
+        params = _Params()
+        sql = (
+            f"SELECT {self._projection(columns)} FROM public.{_ident(table)} AS t "
+            f"WHERE t.{_ident(column)} = ANY({params.add(values, self._type(types, column) + '[]')})"
+        )
+        if order:
+            sql += f" ORDER BY t.{_ident(order)}"
+        return await self._rows(sql, params.values, table, "select")
+
+    async def insert(self, table: str, rows) -> List[dict]:
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        if not rows:
+            return []
+        types = await self._column_types(table)
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        params = _Params()
+        values = ", ".join(
+            "(" + ", ".join(
+                params.add(row[column], self._type(types, column)) if column in row else "DEFAULT"
+                for column in columns
+            ) + ")"
+            for row in rows
+        )
+        sql = (
+            f"INSERT INTO public.{_ident(table)} AS t ({', '.join(_ident(c) for c in columns)}) "
+            f"VALUES {values} RETURNING to_jsonb(t)"
+        )
+        return await self._rows(sql, params.values, table, "insert")
+
+    async def update(
+        self,
+        table: str,
+        values: Dict[str, Any],
+        filters: Dict[str, Any],
+    ) -> List[dict]:
+        if not filters:
+            raise ValueError("update() requires filters")
+        types = await self._column_types(table)
+        params = _Params()
+        assignments = ", ".join(
+            f"{_ident(column)} = {params.add(value, self._type(types, column))}"
+            for column, value in values.items()
+        )
+        sql = (
+            f"UPDATE public.{_ident(table)} AS t SET {assignments}"
+            f"{self._where(types, params, filters)} RETURNING to_jsonb(t)"
+        )
+        return await self._rows(sql, params.values, table, "update")
+
+    async def delete(self, table: str, filters: Dict[str, Any]) -> List[dict]:
+        if not filters:
+            raise ValueError("delete() requires filters")
+        types = await self._column_types(table)
+        params = _Params()
+        sql = (
+            f"DELETE FROM public.{_ident(table)} AS t"
+            f"{self._where(types, params, filters)} RETURNING to_jsonb(t)"
+        )
+        return await self._rows(sql, params.values, table, "delete")
+
+    async def _signature(self, function: str) -> tuple:
+        """(returns a set, returns void, input argument types by name)"""
+        signature = self._functions.get(function)
+        if signature is None:
+            records = await self.limiter.call(
+                self._fetch, _FUNCTION_SQL, function, operation=(function, "catalog")
+            )
+            if not records:
+                raise ValueError(f"Unknown function: {function}")
+            returns_set, returns_void, names, modes, types = records[0]
+            modes = modes or ["i"] * len(types)
+            arguments = {
+                name: type_name
+                for name, mode, type_name in zip(names, modes, types)
+                if mode in ("i", "b", "v")
+            }
+            signature = self._functions[function] = (returns_set, returns_void, arguments)
+        return signature
+
+    async def rpc(
+        self,
+        function: str,
+        params: Optional[Dict[str, Any]] = None,
+        admin: bool = False,
+    ) -> Any:
+        # admin is a PostgREST role switch; the pool's role already applies
+        returns_set, returns_void, arguments = await self._signature(function)
+        query_params = _Params()
+        call = f"public.{_ident(function)}(" + ", ".join(
+            f"{_ident(name)} => {query_params.add(value, self._type(arguments, name))}"
+            for name, value in (params or {}).items()
+        ) + ")"
+        if returns_void:
+            await self.limiter.call(
+                self._fetch, f"SELECT {call}", *query_params.values, operation=(function, "rpc")
+            )
+            return None
+        # Mirrors PostgREST: set-returning functions give a list, others a
+        # single value (an object for composite and OUT-parameter results)
+        rows = await self._rows(
+            f"SELECT to_jsonb(r) FROM {call} AS r", query_params.values, function, "rpc"
+        )
+        if returns_set:
+            return rows
+        return rows[0] if rows else None
+
+    async def listing_page(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[dict]:
+        params = _Params()
+        page = await self._page_sql("listings", params, filters, limit, offset, after, "t.*")
+        return await self._rows(
+            _LISTING_SQL.format(page=page), params.values, "listings", "select"
+        )
+
+    async def listing_detail(self, listing_id: str) -> Optional[dict]:
+        types = await self._column_types("listings")
+        params = _Params()
+        page = f"SELECT t.* FROM public.listings AS t{self._where(types, params, {'id': listing_id})}"
+        rows = await self._rows(
+            _LISTING_SQL.format(page=page), params.values, "listings", "select"
+        )
+        return rows[0] if rows else None
+
+    async def request_page(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[dict]:
+        params = _Params()
+        page = await self._page_sql("requests", params, filters, limit, offset, after, "t.*")
+        return await self._rows(
+            _REQUEST_SQL.format(page=page), params.values, "requests", "select"
+        )
+
+
+def create_repository(backend: str, limiter: UpstreamLimiter) -> Repository:
+    """The repository selected by DATABASE_BACKEND ("supabase" or "postgres")"""
+    if backend == "postgres":
+        return PostgresRepository(
+            limiter,
+            dsn=settings.DATABASE_URL,
+            min_size=settings.DATABASE_POOL_MIN_SIZE,
+            max_size=settings.DATABASE_POOL_MAX_SIZE,
+            statement_cache_size=settings.DATABASE_STATEMENT_CACHE_SIZE,
+        )
+    return SupabaseRepository(limiter)
+
+
+repository = create_repository(settings.DATABASE_BACKEND, limiter)
+auth_repository = SupabaseAuthRepository(limiter)
@@ -1,7 +1,10 @@
 """
 Authentication routes with GMU email validation and email verification
 """
+import jwt
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.security import HTTPAuthorizationCredentials
+from typing import Optional
 from app.models import (
     UserSignup,
     UserLogin,
@@ -9,8 +12,11 @@ from app.models import (
     EmailVerificationRequest,
     VerifyEmailRequest,
 )
-from app.database import supabase, supabase_admin
-from app.dependencies import get_current_user
+from app.repository import auth_repository
+from app.concurrency import gather_within
+from app.config import settings
+from app.dependencies import get_current_user, optional_security
+from app.tokens import RevocationListFull, token_verifier
 
 router = APIRouter()
 
@@ -31,20 +37,14 @@ async def signup(user_data: UserSignup):
     IMPORTANT: Ensure Supabase dashboard has "Enable email confirmations" ON and 
     no custom SMTP configured to prevent auto-verification issues.
     """
-    import asyncio
-    
     try:
         # Email domain validation is handled by Pydantic model
         # Use Supabase's native sign_up() - it automatically sends verification emails
         # and respects Supabase's "Enable email confirmations" setting
-        loop = asyncio.get_event_loop()
-        
-        def signup_user():
-            # Use regular sign_up() - it properly sends verification emails
-            # and respects Supabase's "Enable email confirmations" setting
-            # This is the standard way that prevents auto-verification
-            # Uses Supabase's native email system (not custom SMTP)
-            return supabase.auth.sign_up(
+        # This is the standard way that prevents auto-verification
+        # Uses Supabase's native email system (not custom SMTP)
+        try:
+            response = await auth_repository.sign_up(
                 {
                     "email": user_data.email,
                     "password": user_data.password,
@@ -54,42 +54,23 @@ async def signup(user_data: UserSignup):
                         },
                         "email_redirect_to": "http://localhost:3000/auth/verify",
                     },
-                }
+                },
+                timeout=20.0,  # Standard timeout for Supabase native email system
             )
-        
-        # Use standard timeout for Supabase's native email system
-        try:
-            response = await asyncio.wait_for(
-                loop.run_in_executor(None, signup_user),
-                timeout=20.0  # Standard timeout for Supabase native email system
-            )
-        except asyncio.TimeoutError:
+        except TimeoutError:
             # Even if timeout, user might have been created
             # Check if user exists and return appropriate message
             try:
-                # Try to get user to see if it was created
-                users_response = supabase_admin.auth.admin.list_users()
-                # list_users() returns a dict with 'users' key, or could be a list
-                if isinstance(users_response, dict):
-                    users_list = users_response.get('users', [])
-                elif isinstance(users_response, list):
-                    users_list = users_response
-                else:
-                    # Try to access as attribute
-                    users_list = getattr(users_response, 'users', [])
-                
-                user_exists = any(
-                    u.email and u.email.lower() == user_data.email.lower()
-                    for u in users_list
+                # Try to get user to see if it was created (indexed lookup)
+                user_exists = await auth_repository.get_user_by_email(user_data.email) is not None
+            except Exception:
+                user_exists = False
+            
+            if user_exists:
+                raise HTTPException(
+                    status_code=status.HTTP_201_CREATED,
+                    detail="Account created but email sending timed out. Please use the resend verification endpoint to receive your verification email.",
                 )
-                
-                if user_exists:
-                    raise HTTPException(
-                        status_code=status.HTTP_201_CREATED,
-                        detail="Account created but email sending timed out. Please use the resend verification endpoint to receive your verification email.",
-                    )
-            except:
-                pass
             
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
@@ -170,7 +151,7 @@ async def login(user_data: UserLogin):
     """
     try:
         # Email domain validation is handled by Pydantic model
-        response = supabase.auth.sign_in_with_password(
+        response = await auth_repository.sign_in_with_password(
             {
                 "email": user_data.email,
                 "password": user_data.password,
@@ -226,13 +207,32 @@ async def login(user_data: UserLogin):
 
 
 @router.post("/logout", response_model=dict)
-async def logout():
+async def logout(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+):
     """
     Logout the current user
+    The bearer token, if provided and verifiable locally, is revoked locally
+    until it expires; an invalid token is rejected with 401
     """
     try:
-        supabase.auth.sign_out()
+        if credentials and token_verifier.can_verify(credentials.credentials):
+            try:
+                await token_verifier.revoke(credentials.credentials)
+            except jwt.InvalidTokenError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail=f"Logout failed: {str(e)}",
+                )
+            except RevocationListFull:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Logout is temporarily unavailable, please try again later",
+                )
+        await auth_repository.sign_out()
         return {"message": "Logout successful"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -245,18 +245,35 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """
     Get current user information
     Requires authentication via Bearer token
+    
+    The user record is fetched from Supabase for the verified user id. If the
+    lookup fails or misses the deadline, the fields only Supabase knows
+    (email_verified, created_at) are returned as null.
     """
     try:
-        # Get full user details from Supabase
-        user_response = supabase_admin.auth.admin.get_user_by_id(current_user["id"])
-        
-        if not user_response.user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
+        results, _ = await gather_within(
+            settings.HYDRATION_DEADLINE_SECONDS,
+            user=auth_repository.get_user_by_id(current_user["id"]),
+        )
+        user = None
+        user_response = results["user"]
+        if user_response is not None:
+            if not user_response.user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found",
+                )
+            user = user_response.user
         
-        user = user_response.user
+        if user is None:
+            return {
+                "user": {
+                    "id": current_user["id"],
+                    "email": current_user["email"],
+                    "email_verified": None,
+                    "created_at": None,
+                }
+            }
         
         return {
             "user": {
@@ -266,6 +283,8 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
                 "created_at": user.created_at,
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -281,30 +300,19 @@ async def resend_verification_email(request: EmailVerificationRequest):
     Sends a new verification email to the user's @gmu.edu email address
     using Supabase's native email system.
     """
-    import asyncio
-    
     try:
         # Email domain validation is handled by Pydantic model
-        # Use Supabase's native resend method which sends emails via Supabase's system
-        loop = asyncio.get_event_loop()
-        
-        def resend_email():
-            # Use the resend method which sends emails via Supabase's native email system
-            # Note: This requires the user to exist and not be confirmed
-            return supabase.auth.resend(
+        # Use the resend method which sends emails via Supabase's native email system
+        # Note: This requires the user to exist and not be confirmed
+        try:
+            await auth_repository.resend(
                 {
                     "type": "signup",
                     "email": request.email,
-                }
-            )
-        
-        # Try to resend with standard timeout for Supabase native email system
-        try:
-            response = await asyncio.wait_for(
-                loop.run_in_executor(None, resend_email),
-                timeout=20.0  # Standard timeout for Supabase native email system
+                },
+                timeout=20.0,  # Standard timeout for Supabase native email system
             )
-        except asyncio.TimeoutError:
+        except TimeoutError:
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
                 detail="Email sending timed out. Please try again later.",
@@ -379,25 +387,8 @@ async def check_email_verification(email: str = None):
                 detail="Only GMU email addresses (@gmu.edu) are allowed",
             )
         
-        # Get user by email using admin client
-        users_response = supabase_admin.auth.admin.list_users()
-        
-        # list_users() returns a dict with 'users' key containing the list of users
-        # Handle different return types for compatibility
-        if isinstance(users_response, dict):
-            users_list = users_response.get('users', [])
-        elif isinstance(users_response, list):
-            users_list = users_response
-        else:
-            # Try to access as attribute (in case it's an object)
-            users_list = getattr(users_response, 'users', [])
-        
-        # Find user by email
-        user = None
-        for u in users_list:
-            if u.email and u.email.lower() == email.lower():
-                user = u
-                break
+        # Get user by email with an indexed lookup (no full user list download)
+        user = await auth_repository.get_user_by_email(email)
         
         if not user:
             raise HTTPException(
@@ -405,12 +396,12 @@ async def check_email_verification(email: str = None):
                 detail="No account found with this email address. Please sign up first.",
             )
         
-        is_verified = user.email_confirmed_at is not None
+        is_verified = user["email_confirmed_at"] is not None
         
         return {
-            "email": user.email,
+            "email": user["email"],
             "email_verified": is_verified,
-            "verified_at": user.email_confirmed_at.isoformat() if user.email_confirmed_at else None,
+            "verified_at": user["email_confirmed_at"],
             "message": "Email is verified" if is_verified else "Email not yet verified. Please check your email for the verification link.",
         }
     except HTTPException:
@@ -432,7 +423,7 @@ async def verify_email(request: VerifyEmailRequest):
     """
     try:
         # Verify the email token
-        response = supabase.auth.verify_otp(
+        response = await auth_repository.verify_otp(
             {
                 "token": request.token,
                 "type": "email",
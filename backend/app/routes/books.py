@@ -1,42 +1,68 @@
 """
-Book management routes
+Book catalog routes - shared book metadata, one book per edition
 """
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from typing import Optional
 from app.models import (
     BookCreate,
-    BookUpdate,
     BookResponse,
     BookListResponse,
-    BookStatus,
 )
-from app.database import supabase
+from app.repository import repository
 from app.dependencies import get_current_user
+from app.pagination import decode_cursor, next_cursor
+from app.catalog import find_book_by_isbn, get_book as load_book, upsert_book
+from app.http_cache import compute_etag, etag_matches, not_modified, set_cache_headers
+from app.metadata import BOOK_COLUMNS
 
 router = APIRouter()
 
 
 @router.get("/", response_model=BookListResponse)
 async def get_books(
-    status: Optional[BookStatus] = Query(default=BookStatus.AVAILABLE, alias="status"),
+    request: Request,
+    response: Response,
+    isbn: Optional[str] = Query(default=None, description="Look up the book with this ISBN-10 or ISBN-13"),
     limit: int = Query(default=50, ge=1, le=100),
-    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Opaque next_cursor from a previous page"),
 ):
     """
-    Get all books with optional filtering
+    Get active books, newest first, or the book with a given ISBN
     """
     try:
-        response = (
-            supabase.table("books")
-            .select("*")
-            .eq("status", status.value)
-            .order("created_at", desc=True)
-            .range(offset, offset + limit - 1)
-            .execute()
-        )
+        if isbn:
+            book = await find_book_by_isbn(isbn)
+            books = [book] if book and book.get("is_active") else []
+            page_cursor = None
+        else:
+            after = None
+            if cursor:
+                try:
+                    after = decode_cursor(cursor)
+                except ValueError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=str(e),
+                    )
+
+            books = await repository.select_page(
+                "books",
+                {"is_active": True},
+                limit=limit,
+                after=after,
+                columns=", ".join(("id",) + BOOK_COLUMNS),
+            )
+            page_cursor = next_cursor(books, limit)
 
-        books = response.data if response.data else []
-        return BookListResponse(books=books, count=len(books))
+        # Books have no updated_at: the version is the returned fields
+        etag = compute_etag(books, fields=BOOK_COLUMNS)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+
+        set_cache_headers(response, etag)
+        return BookListResponse(books=books, count=len(books), next_cursor=page_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -45,22 +71,26 @@ async def get_books(
 
 
 @router.get("/{book_id}", response_model=BookResponse)
-async def get_book(book_id: str):
+async def get_book(book_id: str, request: Request, response: Response):
     """
-    Get a specific book by ID
+    Get an active book by ID
     """
     try:
-        response = (
-            supabase.table("books").select("*").eq("id", book_id).single().execute()
-        )
+        book = await load_book(book_id)
 
-        if not response.data:
+        # Inactive books are hidden, as they are from the catalog pages
+        if not book or not book.get("is_active"):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Book not found",
             )
 
-        return BookResponse(**response.data)
+        etag = compute_etag([book], fields=BOOK_COLUMNS)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+
+        set_cache_headers(response, etag)
+        return BookResponse(**book)
     except HTTPException:
         raise
     except Exception as e:
@@ -73,133 +103,25 @@ async def get_book(book_id: str):
 @router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
 async def create_book(
     book_data: BookCreate,
+    response: Response,
     current_user: dict = Depends(get_current_user),
 ):
     """
-    Create a new book listing (requires authentication)
-    """
-    try:
-        book_dict = book_data.model_dump()
-        book_dict["seller_id"] = current_user["id"]
-        book_dict["status"] = "available"
-        book_dict["images"] = book_dict.get("images", [])
-
-        response = (
-            supabase.table("books").insert(book_dict).select().single().execute()
-        )
-
-        if not response.data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to create book listing",
-            )
-
-        return BookResponse(**response.data)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create book listing: {str(e)}",
-        )
-
-
-@router.put("/{book_id}", response_model=BookResponse)
-async def update_book(
-    book_id: str,
-    book_data: BookUpdate,
-    current_user: dict = Depends(get_current_user),
-):
-    """
-    Update a book listing (requires authentication, owner only)
+    Add a book to the catalog (requires authentication)
+    Returns the existing book (200) when one with the same ISBN is already
+    in the catalog, in either ISBN-10 or ISBN-13 form
     """
     try:
-        # Check if book exists and user owns it
-        existing_response = (
-            supabase.table("books")
-            .select("seller_id")
-            .eq("id", book_id)
-            .single()
-            .execute()
-        )
-
-        if not existing_response.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Book not found",
-            )
-
-        if existing_response.data["seller_id"] != current_user["id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only update your own books",
-            )
-
-        # Update book
-        update_dict = book_data.model_dump(exclude_unset=True)
-        response = (
-            supabase.table("books")
-            .update(update_dict)
-            .eq("id", book_id)
-            .select()
-            .single()
-            .execute()
-        )
-
-        if not response.data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to update book listing",
-            )
-
-        return BookResponse(**response.data)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to update book listing: {str(e)}",
-        )
-
-
-@router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_book(
-    book_id: str,
-    current_user: dict = Depends(get_current_user),
-):
-    """
-    Delete a book listing (requires authentication, owner only)
-    """
-    try:
-        # Check if book exists and user owns it
-        existing_response = (
-            supabase.table("books")
-            .select("seller_id")
-            .eq("id", book_id)
-            .single()
-            .execute()
-        )
-
-        if not existing_response.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Book not found",
-            )
-
-        if existing_response.data["seller_id"] != current_user["id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only delete your own books",
-            )
+        book, created = await upsert_book(book_data.title, book_data.author, book_data.isbn)
 
-        # Delete book
-        supabase.table("books").delete().eq("id", book_id).execute()
+        if not created:
+            response.status_code = status.HTTP_200_OK
 
-        return None
+        return BookResponse(**book)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to delete book listing: {str(e)}",
+            detail=f"Failed to create book: {str(e)}",
         )
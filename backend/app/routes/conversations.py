@@ -0,0 +1,368 @@
+"""
+Messaging routes - conversations between buyers and sellers
+"""
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Dict, FrozenSet, Iterable, Optional
+from app.models import (
+    ConversationCreate,
+    ConversationResponse,
+    ConversationListResponse,
+    MessageCreate,
+    MessageResponse,
+    MessageListResponse,
+    UnreadCountsResponse,
+)
+from app.repository import repository
+from app.dependencies import get_broker, get_current_user, get_stream_user
+from app.broker import Broker, Event, sse_stream
+from app.pagination import decode_cursor, next_cursor
+from app.cache import TTLCache, register_cache
+from app.config import settings
+
+router = APIRouter()
+
+# Participants never change once a conversation exists, so membership checks
+# and message fan-out are served from memory
+participant_cache = register_cache(
+    "conversation_participants",
+    TTLCache(
+        maxsize=settings.CONVERSATION_CACHE_SIZE,
+        ttl=settings.CONVERSATION_CACHE_TTL_SECONDS,
+    ),
+)
+
+
+def user_topic(user_id: str) -> str:
+    """Broker topic carrying a user's message and read events"""
+    return f"user:{user_id}"
+
+
+async def get_participants(conversation_id: str) -> FrozenSet[str]:
+    """User ids taking part in a conversation (empty if it doesn't exist)"""
+    cached = participant_cache.get(conversation_id)
+    if cached is not None:
+        return cached
+    rows = await repository.select(
+        "conversation_participants",
+        {"conversation_id": conversation_id},
+        columns="user_id",
+    )
+    participants = frozenset(row["user_id"] for row in rows)
+    if participants:
+        participant_cache.set(conversation_id, participants)
+    return participants
+
+
+async def require_participant(conversation_id: str, user_id: str) -> FrozenSet[str]:
+    """
+    Participants of a conversation the user takes part in
+    Other users get the same 404 as for a missing conversation
+    """
+    participants = await get_participants(conversation_id)
+    if user_id not in participants:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found",
+        )
+    return participants
+
+
+async def publish(broker: Broker, user_ids: Iterable[str], event: Event) -> None:
+    """Push an event to every connected session of the given users"""
+    await asyncio.gather(*(broker.publish(user_topic(user_id), event) for user_id in user_ids))
+
+
+async def unread_counts(user_id: str) -> Dict[str, int]:
+    """Unread counts of all the user's conversations with one query"""
+    rows = await repository.rpc("unread_counts", {"p_user_id": user_id}, admin=True)
+    return {row["conversation_id"]: row["unread"] for row in rows or []}
+
+
+@router.get("/", response_model=ConversationListResponse)
+async def get_conversations(
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Get the current user's conversations, newest first, with unread counts
+    (requires authentication)
+    """
+    try:
+        memberships = await repository.select(
+            "conversation_participants",
+            {"user_id": current_user["id"]},
+            columns="conversation_id",
+        )
+        conversation_ids = [row["conversation_id"] for row in memberships]
+        if not conversation_ids:
+            return ConversationListResponse(conversations=[], count=0)
+
+        conversations, participants, unread = await asyncio.gather(
+            repository.select_in("conversations", "id", conversation_ids),
+            repository.select_in(
+                "conversation_participants",
+                "conversation_id",
+                conversation_ids,
+                columns="conversation_id, user_id",
+            ),
+            unread_counts(current_user["id"]),
+        )
+
+        participant_ids: Dict[str, list] = {}
+        for row in participants:
+            participant_ids.setdefault(row["conversation_id"], []).append(row["user_id"])
+        for conversation_id, user_ids in participant_ids.items():
+            participant_cache.set(conversation_id, frozenset(user_ids))
+
+        conversations.sort(key=lambda conversation: conversation["created_at"], reverse=True)
+        results = [
+            ConversationResponse(
+                **conversation,
+                participant_ids=participant_ids.get(conversation["id"], []),
+                unread_count=unread.get(conversation["id"], 0),
+            )
+            for conversation in conversations
+        ]
+        return ConversationListResponse(conversations=results, count=len(results))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch conversations: {str(e)}",
+        )
+
+
+@router.get("/unread", response_model=UnreadCountsResponse)
+async def get_unread_counts(
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Get unread message counts for all of the current user's conversations
+    (requires authentication)
+    """
+    try:
+        counts = await unread_counts(current_user["id"])
+        return UnreadCountsResponse(
+            total=sum(counts.values()),
+            conversations={cid: count for cid, count in counts.items() if count},
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch unread counts: {str(e)}",
+        )
+
+
+@router.get("/stream")
+async def stream_events(
+    current_user: dict = Depends(get_stream_user),
+    broker: Broker = Depends(get_broker),
+):
+    """
+    Server-sent events for the current user (requires authentication)
+    Emits "message" for every message in the user's conversations, "read"
+    when another session of the user marks a conversation read, and
+    "resync" if the client fell behind and should refetch. Accepts the
+    token as ?access_token= for EventSource clients.
+    """
+    return StreamingResponse(
+        sse_stream(
+            broker,
+            [user_topic(current_user["id"])],
+            settings.BROKER_BUFFER_SIZE,
+            settings.SSE_KEEPALIVE_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
+async def create_conversation(
+    conversation_data: ConversationCreate,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    broker: Broker = Depends(get_broker),
+):
+    """
+    Start a conversation with the owner of a listing or request, optionally
+    with a first message (requires authentication)
+    Returns the existing conversation (200) if the user already has one
+    about the same listing or request
+    """
+    try:
+        table = "listings" if conversation_data.listing_id else "requests"
+        context_id = conversation_data.listing_id or conversation_data.request_id
+        owner = await repository.select_one(table, {"id": context_id}, columns="user_id")
+
+        if not owner:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Listing not found" if table == "listings" else "Request not found",
+            )
+
+        if owner["user_id"] == current_user["id"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You cannot start a conversation with yourself",
+            )
+
+        result = await repository.rpc(
+            "start_conversation",
+            {
+                "p_user_id": current_user["id"],
+                "p_owner_id": owner["user_id"],
+                "p_listing_id": conversation_data.listing_id,
+                "p_request_id": conversation_data.request_id,
+                "p_body": conversation_data.body,
+            },
+            admin=True,
+        )
+
+        conversation = result["conversation"]
+        participants = frozenset(result["participant_ids"])
+        participant_cache.set(conversation["id"], participants)
+
+        if result["message"]:
+            message = MessageResponse(**result["message"])
+            await publish(broker, participants, Event("message", message.model_dump(mode="json")))
+
+        if not result["created"]:
+            response.status_code = status.HTTP_200_OK
+
+        return ConversationResponse(**conversation, participant_ids=list(participants))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create conversation: {str(e)}",
+        )
+
+
+@router.get("/{conversation_id}/messages", response_model=MessageListResponse)
+async def get_messages(
+    conversation_id: str,
+    limit: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="Opaque next_cursor from a previous page (older messages)"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Get a conversation's messages, newest first (requires authentication, participants only)
+    """
+    try:
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e),
+                )
+
+        await require_participant(conversation_id, current_user["id"])
+
+        messages = await repository.select_page(
+            "messages",
+            {"conversation_id": conversation_id},
+            limit=limit,
+            after=after,
+        )
+
+        return MessageListResponse(
+            messages=messages,
+            count=len(messages),
+            next_cursor=next_cursor(messages, limit),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch messages: {str(e)}",
+        )
+
+
+@router.post("/{conversation_id}/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
+async def send_message(
+    conversation_id: str,
+    message_data: MessageCreate,
+    current_user: dict = Depends(get_current_user),
+    broker: Broker = Depends(get_broker),
+):
+    """
+    Send a message and push it to every participant's open streams
+    (requires authentication, participants only)
+    """
+    try:
+        participants = await require_participant(conversation_id, current_user["id"])
+
+        created_rows = await repository.insert(
+            "messages",
+            {
+                "conversation_id": conversation_id,
+                "sender_id": current_user["id"],
+                "body": message_data.body,
+            },
+        )
+
+        if not created_rows:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to send message",
+            )
+
+        message = MessageResponse(**created_rows[0])
+        await publish(broker, participants, Event("message", message.model_dump(mode="json")))
+        return message
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to send message: {str(e)}",
+        )
+
+
+@router.post("/{conversation_id}/read", status_code=status.HTTP_204_NO_CONTENT)
+async def mark_read(
+    conversation_id: str,
+    current_user: dict = Depends(get_current_user),
+    broker: Broker = Depends(get_broker),
+):
+    """
+    Mark every message in a conversation as read (requires authentication, participants only)
+    """
+    try:
+        await require_participant(conversation_id, current_user["id"])
+
+        # Read up to the newest message's own timestamp, so a message that
+        # arrives meanwhile stays unread regardless of clock differences
+        latest = await repository.select_page(
+            "messages", {"conversation_id": conversation_id}, limit=1, columns="id, created_at"
+        )
+        if not latest:
+            return None
+
+        last_read_at = latest[0]["created_at"]
+        await repository.update(
+            "conversation_participants",
+            {"last_read_at": last_read_at},
+            {"conversation_id": conversation_id, "user_id": current_user["id"]},
+        )
+        await publish(
+            broker,
+            [current_user["id"]],
+            Event("read", {"conversation_id": conversation_id, "last_read_at": last_read_at}),
+        )
+        return None
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to mark conversation read: {str(e)}",
+        )
@@ -1,107 +1,121 @@
 """
 Listing management routes - handles book listings for sale/rent
 """
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import Optional
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, status, Depends, File, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
 from app.models import (
     ListingCreate,
     ListingUpdate,
     ListingResponse,
     ListingListResponse,
+    ListingImageResponse,
     ListingStatus,
     ListingType,
+    ImportFormat,
+    ImportReport,
+    RequestMatchListResponse,
 )
-from app.database import supabase
-from app.dependencies import get_current_user
+from app.repository import repository
+from app.dependencies import get_broker, get_current_user, get_storage
+from app.broker import Broker, sse_stream
+from app.feed import feed_topics, publish_listing, publish_listing_deleted
+from app.pagination import decode_cursor, next_cursor
+from app.hydration import hydrate_listings
+from app.search import index_listing, unindex
+from app.cache import TTLCache, register_cache
+from app.http_cache import cache_headers, compute_etag, etag_matches, not_modified, set_cache_headers
+from app.serialization import (
+    NDJSON_MEDIA_TYPE,
+    listing_adapter,
+    listing_page_adapter,
+    negotiate,
+    render,
+    stream_ndjson,
+)
+from app.importer import import_listings
+from app.images import InvalidImageError, store_image
+from app.storage import Storage
+from app.matching import requests_for_listing
+from app.config import settings
 
 router = APIRouter()
 
+# Read-through cache of hydrated listing detail, invalidated by every write
+# to a listing or its images. The cache is per process, so other workers
+# pick up a change after at most LISTING_CACHE_TTL_SECONDS.
+listing_cache = register_cache(
+    "listing_detail",
+    TTLCache(
+        maxsize=settings.LISTING_CACHE_SIZE,
+        ttl=settings.LISTING_CACHE_TTL_SECONDS,
+    ),
+)
+
 
 @router.get("/", response_model=ListingListResponse)
 async def get_listings(
-    status: Optional[ListingStatus] = Query(default=ListingStatus.ACTIVE, alias="status"),
-    type: Optional[ListingType] = Query(default=None, alias="type"),
+    request: Request,
+    status_filter: Optional[ListingStatus] = Query(default=ListingStatus.ACTIVE, alias="status"),
+    type_filter: Optional[ListingType] = Query(default=None, alias="type"),
     limit: int = Query(default=50, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Opaque next_cursor from a previous page; takes precedence over offset"),
 ):
     """
     Get all listings with optional filtering
     Returns listings with joined book and user data
     """
     try:
-        # Build query
-        query = supabase.table("listings").select("*")
-        
-        if status:
-            query = query.eq("status", status.value)
-        if type:
-            query = query.eq("type", type.value)
+        # Build filters
+        filters = {}
+        if status_filter:
+            filters["status"] = status_filter.value
+        if type_filter:
+            filters["type"] = type_filter.value
         
-        query = query.order("created_at", desc=True).range(offset, offset + limit - 1)
-        
-        response = query.execute()
+        # Keyset mode (cursor) costs the same at any depth and is stable
+        # under inserts; offset mode is kept for backward compatibility
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e),
+                )
         
-        listings_data = response.data if response.data else []
+        # Rows come back joined with their book, seller and images in a
+        # single statement
+        listings = await repository.listing_page(
+            filters,
+            limit=limit,
+            offset=0 if after else offset,
+            after=after,
+        )
         
-        # Transform data to match ListingResponse model
-        listings = []
-        for listing in listings_data:
-            # Get images for this listing
-            images_response = (
-                supabase.table("listing_images")
-                .select("image_url")
-                .eq("listing_id", listing["id"])
-                .order("created_at")
-                .execute()
-            )
-            images = [img["image_url"] for img in (images_response.data or [])]
-            
-            # Get book data if book_id exists
-            book_title = None
-            book_author = None
-            book_isbn = None
-            if listing.get("book_id"):
-                try:
-                    book_response = (
-                        supabase.table("books")
-                        .select("title, author, isbn")
-                        .eq("id", listing["book_id"])
-                        .single()
-                        .execute()
-                    )
-                    if book_response.data:
-                        book_title = book_response.data.get("title")
-                        book_author = book_response.data.get("author")
-                        book_isbn = book_response.data.get("isbn")
-                except:
-                    pass
-            
-            # Get user display name
-            user_display_name = None
-            if listing.get("user_id"):
-                try:
-                    profile_response = (
-                        supabase.table("profiles")
-                        .select("display_name")
-                        .eq("id", listing["user_id"])
-                        .single()
-                        .execute()
-                    )
-                    if profile_response.data:
-                        user_display_name = profile_response.data.get("display_name")
-                except:
-                    pass
-            
-            listings.append({
-                **listing,
-                "book_title": book_title,
-                "book_author": book_author,
-                "book_isbn": book_isbn,
-                "user_display_name": user_display_name,
-                "images": images,
-            })
+        # An unchanged page is answered before any serialization
+        media_type = negotiate(request)
+        etag = compute_etag(listings, variant=media_type)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
         
-        return ListingListResponse(listings=listings, count=len(listings))
+        # Validated and encoded in one pass
+        return render(
+            media_type,
+            listing_page_adapter,
+            {
+                "listings": listings,
+                "count": len(listings),
+                "next_cursor": next_cursor(listings, limit),
+            },
+            headers=cache_headers(etag),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -109,90 +123,146 @@ async def get_listings(
         )
 
 
+@router.get("/export")
+async def export_listings(
+    status_filter: Optional[ListingStatus] = Query(default=None, alias="status"),
+    type_filter: Optional[ListingType] = Query(default=None, alias="type"),
+    created_from: Optional[datetime] = Query(default=None, description="Only rows created at or after this time"),
+    created_to: Optional[datetime] = Query(default=None, description="Only rows created before this time"),
+):
+    """
+    Stream listings as NDJSON (one hydrated listing per line, newest first)
+    Optionally filtered by status, type and creation time. The table is read in keyset-ordered
+    chunks, so memory use stays constant however many rows are exported.
+    A failure mid-stream ends the output with an {"error": ...} line.
+    """
+    filters = {}
+    if status_filter:
+        filters["status"] = status_filter.value
+    if type_filter:
+        filters["type"] = type_filter.value
+
+    chunks = repository.scan_chunks(
+        "listings",
+        filters,
+        chunk_size=settings.EXPORT_CHUNK_SIZE,
+        created_from=created_from.isoformat() if created_from else None,
+        created_to=created_to.isoformat() if created_to else None,
+    )
+    return StreamingResponse(
+        stream_ndjson(chunks, hydrate_listings, listing_adapter),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+@router.get("/stream")
+async def stream_listings(
+    status_filter: Optional[ListingStatus] = Query(default=ListingStatus.ACTIVE, alias="status"),
+    type_filter: Optional[ListingType] = Query(default=None, alias="type"),
+    broker: Broker = Depends(get_broker),
+):
+    """
+    Server-sent events for listings matching the same filters as GET /
+    "created" and "updated" carry the listing, "deleted" carries its id.
+    An update that moves a listing out of the filters (e.g. sold) is still
+    sent once, with the new status. "resync" means the client fell behind
+    and should refetch the page.
+    """
+    return StreamingResponse(
+        sse_stream(
+            broker,
+            feed_topics(status_filter, type_filter),
+            settings.BROKER_BUFFER_SIZE,
+            settings.SSE_KEEPALIVE_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def load_listing(
+    listing_id: str,
+    if_none_match: Optional[str] = None,
+) -> Tuple[Optional[ListingResponse], Optional[str]]:
+    """
+    Load a hydrated listing through the detail cache, with its ETag
+    Returns (None, etag) when if_none_match still matches. Raises 404 if the
+    listing is missing.
+    """
+    cached = listing_cache.get(listing_id)
+    if cached is not None:
+        etag = compute_etag([cached])
+        return (None if etag_matches(if_none_match, etag) else cached), etag
+
+    generation = listing_cache.generation
+
+    # The listing, its book, seller and images in a single statement
+    listing = await repository.listing_detail(listing_id)
+    if not listing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Listing not found",
+        )
+
+    listing_response = ListingResponse(**listing)
+    etag = compute_etag([listing_response])
+
+    # Not cached if it was loaded while the listing was being written to
+    listing_cache.set(listing_id, listing_response, generation=generation)
+    return (None if etag_matches(if_none_match, etag) else listing_response), etag
+
+
 @router.get("/{listing_id}", response_model=ListingResponse)
-async def get_listing(listing_id: str):
+async def get_listing(listing_id: str, request: Request, response: Response):
     """
     Get a specific listing by ID with book and user data
     """
     try:
-        response = (
-            supabase.table("listings")
-            .select("*")
-            .eq("id", listing_id)
-            .single()
-            .execute()
+        listing, etag = await load_listing(
+            listing_id, request.headers.get("if-none-match")
         )
+        if listing is None:
+            return not_modified(etag)
+        if etag:
+            set_cache_headers(response, etag)
+        return listing
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch listing: {str(e)}",
+        )
+
+
+@router.get("/{listing_id}/matches", response_model=RequestMatchListResponse)
+async def get_listing_matches(
+    listing_id: str,
+    limit: int = Query(default=20, ge=1, le=50),
+):
+    """
+    Get the open requests this listing satisfies, best match first
+    """
+    try:
+        matches = await requests_for_listing(listing_id, limit=limit)
 
-        if not response.data:
+        if matches is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Listing not found",
             )
 
-        listing = response.data
-        
-        # Get images
-        images_response = (
-            supabase.table("listing_images")
-            .select("image_url")
-            .eq("listing_id", listing_id)
-            .order("created_at")
-            .execute()
+        return RequestMatchListResponse(
+            listing_id=listing_id,
+            matches=matches,
+            count=len(matches),
         )
-        images = [img["image_url"] for img in (images_response.data or [])]
-        
-        # Get book data if book_id exists
-        book_title = None
-        book_author = None
-        book_isbn = None
-        if listing.get("book_id"):
-            try:
-                book_response = (
-                    supabase.table("books")
-                    .select("title, author, isbn")
-                    .eq("id", listing["book_id"])
-                    .single()
-                    .execute()
-                )
-                if book_response.data:
-                    book_title = book_response.data.get("title")
-                    book_author = book_response.data.get("author")
-                    book_isbn = book_response.data.get("isbn")
-            except:
-                pass
-        
-        # Get user display name
-        user_display_name = None
-        if listing.get("user_id"):
-            try:
-                profile_response = (
-                    supabase.table("profiles")
-                    .select("display_name")
-                    .eq("id", listing["user_id"])
-                    .single()
-                    .execute()
-                )
-                if profile_response.data:
-                    user_display_name = profile_response.data.get("display_name")
-            except:
-                pass
-        
-        listing_response = {
-            **listing,
-            "book_title": book_title,
-            "book_author": book_author,
-            "book_isbn": book_isbn,
-            "user_display_name": user_display_name,
-            "images": images,
-        }
-
-        return ListingResponse(**listing_response)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch listing: {str(e)}",
+            detail=f"Failed to fetch matches: {str(e)}",
         )
 
 
@@ -200,72 +270,48 @@ async def get_listing(listing_id: str):
 async def create_listing(
     listing_data: ListingCreate,
     current_user: dict = Depends(get_current_user),
+    broker: Broker = Depends(get_broker),
 ):
     """
     Create a new listing (requires authentication)
     Creates book metadata if book_id is not provided
+
+    The book, listing and images are written in one transaction by
+    create_listing_with_book() (docs/schema/SUPABASE_CREATE_LISTING.sql),
+    which also returns the hydrated listing, so this is one round trip.
+    A book_id is not required: a book with the same ISBN is reused.
     """
     try:
-        book_id = listing_data.book_id
-        
-        # If no book_id provided, create book metadata first
-        if not book_id:
-            book_dict = {
-                "title": listing_data.title,
-                "author": listing_data.author,
-                "isbn": listing_data.isbn,
-            }
-            book_response = (
-                supabase.table("books")
-                .insert(book_dict)
-                .select()
-                .single()
-                .execute()
-            )
-            book_id = book_response.data["id"]
-        
-        # Create listing
-        listing_dict = {
-            "user_id": current_user["id"],
-            "book_id": book_id,
-            "type": listing_data.type.value,
-            "price": listing_data.price,
-            "condition": listing_data.condition.value,
-            "description": listing_data.description,
-            "status": ListingStatus.ACTIVE.value,
-        }
-        
-        # Add rental fields if type is rent
-        if listing_data.type == ListingType.RENT:
-            listing_dict["rent_duration_value"] = listing_data.rent_duration_value
-            listing_dict["rent_duration_unit"] = listing_data.rent_duration_unit
-        
-        listing_response = (
-            supabase.table("listings")
-            .insert(listing_dict)
-            .select()
-            .single()
-            .execute()
+        created = await repository.rpc(
+            "create_listing_with_book",
+            {
+                "p_user_id": current_user["id"],
+                "p_type": listing_data.type.value,
+                "p_price": listing_data.price,
+                "p_condition": listing_data.condition.value,
+                "p_book_id": listing_data.book_id,
+                "p_title": listing_data.title,
+                "p_author": listing_data.author,
+                "p_isbn": listing_data.isbn,
+                "p_description": listing_data.description,
+                "p_rent_duration_value": listing_data.rent_duration_value,
+                "p_rent_duration_unit": listing_data.rent_duration_unit,
+                "p_images": listing_data.images or [],
+            },
         )
-        
-        if not listing_response.data:
+
+        if not created:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Failed to create listing",
             )
-        
-        listing_id = listing_response.data["id"]
-        
-        # Add images if provided
-        if listing_data.images:
-            image_records = [
-                {"listing_id": listing_id, "image_url": img_url}
-                for img_url in listing_data.images
-            ]
-            supabase.table("listing_images").insert(image_records).execute()
-        
-        # Fetch complete listing with joins
-        return await get_listing(listing_id)
+
+        # Images given as URLs have no thumbnails
+        listing = ListingResponse(**created, thumbnails=created.get("images") or [])
+        listing_cache.set(listing.id, listing)
+        index_listing(listing.model_dump())
+        await publish_listing(broker, "created", listing)
+        return listing
         
     except HTTPException:
         raise
@@ -276,32 +322,73 @@ async def create_listing(
         )
 
 
+@router.post("/import", response_model=ImportReport)
+async def import_listings_file(
+    request: Request,
+    import_format: Optional[ImportFormat] = Query(default=None, alias="format", description="csv or jsonl; inferred from Content-Type when omitted"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Bulk-import listings from a CSV or JSON Lines request body (requires authentication)
+    Each row has the ListingCreate fields; in CSV, images are "|"-separated.
+    The body is streamed and written in batches; invalid rows are reported
+    in the result and do not stop the import.
+    """
+    if import_format is None:
+        content_type = request.headers.get("content-type", "")
+        if "csv" in content_type:
+            import_format = ImportFormat.CSV
+        elif "json" in content_type:
+            import_format = ImportFormat.JSONL
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Send Content-Type text/csv or application/x-ndjson, or pass ?format=",
+            )
+
+    try:
+        return await import_listings(
+            request.stream(),
+            import_format,
+            current_user["id"],
+            batch_size=settings.IMPORT_BATCH_SIZE,
+            max_errors=settings.IMPORT_MAX_REPORTED_ERRORS,
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Import file must be UTF-8 encoded (rows before the bad bytes were imported)",
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import listings: {str(e)}",
+        )
+
+
 @router.put("/{listing_id}", response_model=ListingResponse)
 async def update_listing(
     listing_id: str,
     listing_data: ListingUpdate,
     current_user: dict = Depends(get_current_user),
+    broker: Broker = Depends(get_broker),
 ):
     """
     Update a listing (requires authentication, owner only)
     """
     try:
         # Check if listing exists and user owns it
-        existing_response = (
-            supabase.table("listings")
-            .select("user_id")
-            .eq("id", listing_id)
-            .single()
-            .execute()
+        existing = await repository.select_one(
+            "listings", {"id": listing_id}, columns="user_id, status, type"
         )
 
-        if not existing_response.data:
+        if not existing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Listing not found",
             )
 
-        if existing_response.data["user_id"] != current_user["id"]:
+        if existing["user_id"] != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only update your own listings",
@@ -312,23 +399,22 @@ async def update_listing(
         if "status" in update_dict:
             update_dict["status"] = update_dict["status"].value
         
-        response = (
-            supabase.table("listings")
-            .update(update_dict)
-            .eq("id", listing_id)
-            .select()
-            .single()
-            .execute()
-        )
+        updated_rows = await repository.update("listings", update_dict, {"id": listing_id})
+        listing_cache.invalidate(listing_id)
 
-        if not response.data:
+        if not updated_rows:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Failed to update listing",
             )
 
         # Fetch complete listing with joins
-        return await get_listing(listing_id)
+        listing, _ = await load_listing(listing_id)
+        index_listing(listing.model_dump())
+        await publish_listing(
+            broker, "updated", listing, previous=[(existing["status"], existing["type"])]
+        )
+        return listing
         
     except HTTPException:
         raise
@@ -343,6 +429,7 @@ async def update_listing(
 async def delete_listing(
     listing_id: str,
     current_user: dict = Depends(get_current_user),
+    broker: Broker = Depends(get_broker),
 ):
     """
     Delete a listing (requires authentication, owner only)
@@ -350,28 +437,28 @@ async def delete_listing(
     """
     try:
         # Check if listing exists and user owns it
-        existing_response = (
-            supabase.table("listings")
-            .select("user_id")
-            .eq("id", listing_id)
-            .single()
-            .execute()
+        existing = await repository.select_one(
+            "listings", {"id": listing_id}, columns="user_id, status, type"
         )
 
-        if not existing_response.data:
+        if not existing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Listing not found",
             )
 
-        if existing_response.data["user_id"] != current_user["id"]:
+        if existing["user_id"] != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only delete your own listings",
             )
 
         # Delete listing (images cascade automatically)
-        supabase.table("listings").delete().eq("id", listing_id).execute()
+        await repository.delete("listings", {"id": listing_id})
+        listing_cache.invalidate(listing_id)
+
+        unindex("listing", listing_id)
+        await publish_listing_deleted(broker, listing_id, existing["status"], existing["type"])
 
         return None
     except HTTPException:
@@ -394,21 +481,17 @@ async def add_listing_images(
     """
     try:
         # Check ownership
-        existing_response = (
-            supabase.table("listings")
-            .select("user_id")
-            .eq("id", listing_id)
-            .single()
-            .execute()
+        existing = await repository.select_one(
+            "listings", {"id": listing_id}, columns="user_id"
         )
 
-        if not existing_response.data:
+        if not existing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Listing not found",
             )
 
-        if existing_response.data["user_id"] != current_user["id"]:
+        if existing["user_id"] != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only add images to your own listings",
@@ -419,7 +502,8 @@ async def add_listing_images(
             {"listing_id": listing_id, "image_url": img_url}
             for img_url in image_urls
         ]
-        supabase.table("listing_images").insert(image_records).execute()
+        await repository.insert("listing_images", image_records)
+        listing_cache.invalidate(listing_id)
 
         return {"message": "Images added successfully", "count": len(image_urls)}
     except HTTPException:
@@ -431,6 +515,81 @@ async def add_listing_images(
         )
 
 
+@router.post(
+    "/{listing_id}/images/upload",
+    response_model=List[ListingImageResponse],
+    status_code=status.HTTP_201_CREATED,
+)
+async def upload_listing_images(
+    listing_id: str,
+    files: List[UploadFile] = File(...),
+    current_user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage),
+):
+    """
+    Upload images to a listing as multipart/form-data "files" (requires authentication, owner only)
+    Stores each image with a thumbnail and a display-size WebP variant;
+    images already uploaded before (by anyone) are not processed again
+    """
+    try:
+        if len(files) > settings.IMAGE_MAX_FILES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.IMAGE_MAX_FILES} images can be uploaded at once",
+            )
+
+        # Check ownership
+        existing = await repository.select_one(
+            "listings", {"id": listing_id}, columns="user_id"
+        )
+
+        if not existing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Listing not found",
+            )
+
+        if existing["user_id"] != current_user["id"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only add images to your own listings",
+            )
+
+        uploads = []
+        for upload in files:
+            data = await upload.read(settings.IMAGE_MAX_BYTES + 1)
+            if len(data) > settings.IMAGE_MAX_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"{upload.filename} is larger than {settings.IMAGE_MAX_BYTES} bytes",
+                )
+            uploads.append(data)
+
+        # Images are resized in parallel by the process pool
+        try:
+            stored = await asyncio.gather(*(store_image(data, storage) for data in uploads))
+        except InvalidImageError as e:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=str(e),
+            )
+
+        created_rows = await repository.insert(
+            "listing_images",
+            [{"listing_id": listing_id, **image._asdict()} for image in stored],
+        )
+        listing_cache.invalidate(listing_id)
+
+        return created_rows
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to upload images: {str(e)}",
+        )
+
+
 @router.delete("/{listing_id}/images/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_listing_image(
     listing_id: str,
@@ -442,28 +601,25 @@ async def delete_listing_image(
     """
     try:
         # Check ownership
-        existing_response = (
-            supabase.table("listings")
-            .select("user_id")
-            .eq("id", listing_id)
-            .single()
-            .execute()
+        existing = await repository.select_one(
+            "listings", {"id": listing_id}, columns="user_id"
         )
 
-        if not existing_response.data:
+        if not existing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Listing not found",
             )
 
-        if existing_response.data["user_id"] != current_user["id"]:
+        if existing["user_id"] != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only delete images from your own listings",
             )
 
         # Delete image
-        supabase.table("listing_images").delete().eq("id", image_id).execute()
+        await repository.delete("listing_images", {"id": image_id})
+        listing_cache.invalidate(listing_id)
 
         return None
     except HTTPException:
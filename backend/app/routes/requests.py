@@ -1,67 +1,94 @@
 """
 Request management routes - handles book requests
 """
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import Optional
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional, Tuple
 from app.models import (
     RequestCreate,
     RequestUpdate,
     RequestResponse,
     RequestListResponse,
     RequestStatus,
+    ListingMatchListResponse,
 )
-from app.database import supabase
+from app.repository import repository
 from app.dependencies import get_current_user
+from app.pagination import decode_cursor, next_cursor
+from app.hydration import hydrate_requests
+from app.search import index_request, unindex
+from app.matching import listings_for_request
+from app.config import settings
+from app.http_cache import cache_headers, compute_etag, etag_matches, not_modified, set_cache_headers
+from app.serialization import (
+    NDJSON_MEDIA_TYPE,
+    negotiate,
+    render,
+    request_adapter,
+    request_page_adapter,
+    stream_ndjson,
+)
 
 router = APIRouter()
 
 
 @router.get("/", response_model=RequestListResponse)
 async def get_requests(
-    status: Optional[RequestStatus] = Query(default=RequestStatus.OPEN, alias="status"),
+    request: Request,
+    status_filter: Optional[RequestStatus] = Query(default=RequestStatus.OPEN, alias="status"),
     limit: int = Query(default=50, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Opaque next_cursor from a previous page; takes precedence over offset"),
 ):
     """
     Get all requests with optional filtering
     """
     try:
-        query = supabase.table("requests").select("*")
-        
-        if status:
-            query = query.eq("status", status.value)
-        
-        query = query.order("created_at", desc=True).range(offset, offset + limit - 1)
+        filters = {}
+        if status_filter:
+            filters["status"] = status_filter.value
         
-        response = query.execute()
+        # Keyset mode (cursor) costs the same at any depth and is stable
+        # under inserts; offset mode is kept for backward compatibility
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e),
+                )
         
-        requests_data = response.data if response.data else []
+        # Rows come back with the requester's display name in a single
+        # statement
+        requests = await repository.request_page(
+            filters,
+            limit=limit,
+            offset=0 if after else offset,
+            after=after,
+        )
         
-        # Transform data
-        requests = []
-        for req in requests_data:
-            # Get user display name
-            user_display_name = None
-            if req.get("user_id"):
-                try:
-                    profile_response = (
-                        supabase.table("profiles")
-                        .select("display_name")
-                        .eq("id", req["user_id"])
-                        .single()
-                        .execute()
-                    )
-                    if profile_response.data:
-                        user_display_name = profile_response.data.get("display_name")
-                except:
-                    pass
-            
-            requests.append({
-                **req,
-                "user_display_name": user_display_name,
-            })
+        # An unchanged page is answered before any serialization
+        media_type = negotiate(request)
+        etag = compute_etag(requests, variant=media_type)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
         
-        return RequestListResponse(requests=requests, count=len(requests))
+        # Validated and encoded in one pass
+        return render(
+            media_type,
+            request_page_adapter,
+            {
+                "requests": requests,
+                "count": len(requests),
+                "next_cursor": next_cursor(requests, limit),
+            },
+            headers=cache_headers(etag),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -69,56 +96,114 @@ async def get_requests(
         )
 
 
+@router.get("/export")
+async def export_requests(
+    status_filter: Optional[RequestStatus] = Query(default=None, alias="status"),
+    created_from: Optional[datetime] = Query(default=None, description="Only rows created at or after this time"),
+    created_to: Optional[datetime] = Query(default=None, description="Only rows created before this time"),
+):
+    """
+    Stream requests as NDJSON (one hydrated request per line, newest first)
+    Optionally filtered by status and creation time. The table is read in keyset-ordered
+    chunks, so memory use stays constant however many rows are exported.
+    A failure mid-stream ends the output with an {"error": ...} line.
+    """
+    filters = {}
+    if status_filter:
+        filters["status"] = status_filter.value
+
+    chunks = repository.scan_chunks(
+        "requests",
+        filters,
+        chunk_size=settings.EXPORT_CHUNK_SIZE,
+        created_from=created_from.isoformat() if created_from else None,
+        created_to=created_to.isoformat() if created_to else None,
+    )
+    return StreamingResponse(
+        stream_ndjson(chunks, hydrate_requests, request_adapter),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+async def load_request(
+    request_id: str,
+    if_none_match: Optional[str] = None,
+) -> Tuple[Optional[RequestResponse], Optional[str]]:
+    """
+    Load a hydrated request with its ETag
+    The ETag covers the requester's display name, so it is computed after
+    hydration. Returns (None, etag) when if_none_match still matches, and a
+    None ETag for degraded responses. Raises 404 if the request is missing.
+    """
+    req = await repository.select_one("requests", {"id": request_id})
+
+    if not req:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Request not found",
+        )
+
+    hydrated, complete = await hydrate_requests([req])
+    if not complete:
+        return RequestResponse(**hydrated[0]), None
+
+    etag = compute_etag(hydrated)
+    if etag_matches(if_none_match, etag):
+        return None, etag
+    return RequestResponse(**hydrated[0]), etag
+
+
 @router.get("/{request_id}", response_model=RequestResponse)
-async def get_request(request_id: str):
+async def get_request(request_id: str, request: Request, response: Response):
     """
     Get a specific request by ID
     """
     try:
-        response = (
-            supabase.table("requests")
-            .select("*")
-            .eq("id", request_id)
-            .single()
-            .execute()
+        req, etag = await load_request(
+            request_id, request.headers.get("if-none-match")
+        )
+        if req is None:
+            return not_modified(etag)
+        if etag:
+            set_cache_headers(response, etag)
+        return req
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch request: {str(e)}",
         )
 
-        if not response.data:
+
+@router.get("/{request_id}/matches", response_model=ListingMatchListResponse)
+async def get_request_matches(
+    request_id: str,
+    limit: int = Query(default=20, ge=1, le=50),
+):
+    """
+    Get the active listings that satisfy this request, best match first
+    """
+    try:
+        matches = await listings_for_request(request_id, limit=limit)
+
+        if matches is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Request not found",
             )
 
-        req = response.data
-        
-        # Get user display name
-        user_display_name = None
-        if req.get("user_id"):
-            try:
-                profile_response = (
-                    supabase.table("profiles")
-                    .select("display_name")
-                    .eq("id", req["user_id"])
-                    .single()
-                    .execute()
-                )
-                if profile_response.data:
-                    user_display_name = profile_response.data.get("display_name")
-            except:
-                pass
-        
-        return RequestResponse(
-            **{
-                **req,
-                "user_display_name": user_display_name,
-            }
+        return ListingMatchListResponse(
+            request_id=request_id,
+            matches=matches,
+            count=len(matches),
         )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch request: {str(e)}",
+            detail=f"Failed to fetch matches: {str(e)}",
         )
 
 
@@ -141,22 +226,18 @@ async def create_request(
             "status": RequestStatus.OPEN.value,
         }
 
-        response = (
-            supabase.table("requests")
-            .insert(request_dict)
-            .select()
-            .single()
-            .execute()
-        )
+        created_rows = await repository.insert("requests", request_dict)
 
-        if not response.data:
+        if not created_rows:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Failed to create request",
             )
 
         # Fetch with joins
-        return await get_request(response.data["id"])
+        request_response, _ = await load_request(created_rows[0]["id"])
+        index_request(request_response.model_dump())
+        return request_response
         
     except HTTPException:
         raise
@@ -178,21 +259,17 @@ async def update_request(
     """
     try:
         # Check if request exists and user owns it
-        existing_response = (
-            supabase.table("requests")
-            .select("user_id")
-            .eq("id", request_id)
-            .single()
-            .execute()
+        existing = await repository.select_one(
+            "requests", {"id": request_id}, columns="user_id"
         )
 
-        if not existing_response.data:
+        if not existing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Request not found",
             )
 
-        if existing_response.data["user_id"] != current_user["id"]:
+        if existing["user_id"] != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only update your own requests",
@@ -203,23 +280,18 @@ async def update_request(
         if "status" in update_dict:
             update_dict["status"] = update_dict["status"].value
 
-        response = (
-            supabase.table("requests")
-            .update(update_dict)
-            .eq("id", request_id)
-            .select()
-            .single()
-            .execute()
-        )
+        updated_rows = await repository.update("requests", update_dict, {"id": request_id})
 
-        if not response.data:
+        if not updated_rows:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Failed to update request",
             )
 
         # Fetch with joins
-        return await get_request(request_id)
+        request_response, _ = await load_request(request_id)
+        index_request(request_response.model_dump())
+        return request_response
         
     except HTTPException:
         raise
@@ -240,28 +312,26 @@ async def delete_request(
     """
     try:
         # Check if request exists and user owns it
-        existing_response = (
-            supabase.table("requests")
-            .select("user_id")
-            .eq("id", request_id)
-            .single()
-            .execute()
+        existing = await repository.select_one(
+            "requests", {"id": request_id}, columns="user_id"
         )
 
-        if not existing_response.data:
+        if not existing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Request not found",
             )
 
-        if existing_response.data["user_id"] != current_user["id"]:
+        if existing["user_id"] != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only delete your own requests",
             )
 
         # Delete request
-        supabase.table("requests").delete().eq("id", request_id).execute()
+        await repository.delete("requests", {"id": request_id})
+
+        unindex("request", request_id)
 
         return None
     except HTTPException:
@@ -0,0 +1,30 @@
+"""
+Search routes - ranked search over books, listings and requests
+"""
+from fastapi import APIRouter, HTTPException, status, Query
+from typing import Optional
+from app.models import SearchKind, SearchResponse
+from app.search import search
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SearchResponse)
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200, description="Title, author or ISBN"),
+    kind: Optional[SearchKind] = Query(default=None, description="Only return books, listings or requests"),
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    """
+    Search books, active listings and open requests
+    Matches title and author (full-text and fuzzy) and normalized ISBN,
+    ranked best match first
+    """
+    try:
+        results = await search(q.strip(), limit=limit, kind=kind.value if kind else None)
+        return SearchResponse(query=q, results=results, count=len(results))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Search failed: {str(e)}",
+        )
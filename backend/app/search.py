@@ -0,0 +1,257 @@
+"""
+Catalog search over books, active listings and open requests
+
+Search normally runs in Postgres through search_catalog() (see
+docs/schema/SUPABASE_SEARCH.sql). With SEARCH_BACKEND=memory, an in-process
+index with the same ranking rules serves local runs that don't have the
+search migration applied.
+"""
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from app.config import settings
+from app.isbn import looks_like_isbn, normalize_isbn
+from app.repository import repository
+
+_WORD = re.compile(r"\w+")
+
+# pg_trgm's default similarity threshold for the % operator
+SIMILARITY_THRESHOLD = 0.3
+
+# Upper bound on documents gathered from broad posting lists per query
+MAX_CANDIDATES = 2000
+
+DocKey = Tuple[str, str]
+
+
+def _tokens(text: Optional[str]) -> Set[str]:
+    return set(_WORD.findall(text.lower())) if text else set()
+
+
+def _trigrams(text: Optional[str]) -> Set[str]:
+    """Trigrams of each word, padded the way pg_trgm pads them"""
+    grams = set()
+    for word in _tokens(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class SearchIndex:
+    """
+    In-process inverted index over title/author tokens, trigrams and
+    normalized ISBNs. Candidates are gathered from the posting lists, so a
+    query only touches documents sharing at least one term with it.
+    """
+
+    def __init__(self):
+        self._docs: Dict[DocKey, dict] = {}
+        self._tokens: Dict[str, Set[DocKey]] = defaultdict(set)
+        self._trigrams: Dict[str, Set[DocKey]] = defaultdict(set)
+        self._isbns: Dict[str, Set[DocKey]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        kind: str,
+        doc_id: str,
+        title: Optional[str],
+        author: Optional[str] = None,
+        isbn: Optional[str] = None,
+        book_id: Optional[str] = None,
+    ) -> None:
+        """Index a document, replacing any previous version of it"""
+        key = (kind, doc_id)
+        self.remove(kind, doc_id)
+        doc = {
+            "kind": kind,
+            "id": doc_id,
+            "book_id": book_id,
+            "title": title or "",
+            "author": author,
+            "isbn": isbn,
+            "_title_tokens": _tokens(title),
+            "_author_tokens": _tokens(author),
+            "_title_trigrams": _trigrams(title),
+            "_author_trigrams": _trigrams(author),
+            "_isbn": normalize_isbn(isbn),
+        }
+        self._docs[key] = doc
+        for token in doc["_title_tokens"] | doc["_author_tokens"]:
+            self._tokens[token].add(key)
+        for gram in doc["_title_trigrams"] | doc["_author_trigrams"]:
+            self._trigrams[gram].add(key)
+        if doc["_isbn"]:
+            self._isbns[doc["_isbn"]].add(key)
+
+    def remove(self, kind: str, doc_id: str) -> None:
+        key = (kind, doc_id)
+        doc = self._docs.pop(key, None)
+        if not doc:
+            return
+        for token in doc["_title_tokens"] | doc["_author_tokens"]:
+            self._discard(self._tokens, token, key)
+        for gram in doc["_title_trigrams"] | doc["_author_trigrams"]:
+            self._discard(self._trigrams, gram, key)
+        if doc["_isbn"]:
+            self._discard(self._isbns, doc["_isbn"], key)
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[DocKey]], term: str, key: DocKey) -> None:
+        keys = postings.get(term)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del postings[term]
+
+    @staticmethod
+    def _top(postings: List[Set[DocKey]], size: int) -> Set[DocKey]:
+        """The documents appearing in the most posting lists"""
+        if sum(len(keys) for keys in postings) <= size:
+            return set().union(*postings)
+        hits: Counter = Counter()
+        for keys in postings:
+            hits.update(keys)
+        return {key for key, _ in hits.most_common(size)}
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None) -> List[dict]:
+        """
+        Rank documents the way search_catalog() does:
+        10 for an exact ISBN match, plus 2x the share of query words found
+        in the title (author words count 0.4), plus the best trigram
+        similarity of title or author to the query
+        """
+        query_isbn = normalize_isbn(query) if looks_like_isbn(query) else None
+        query_tokens = _tokens(query)
+        query_trigrams = _trigrams(query)
+
+        # Gather candidates from posting lists: ISBN matches, then documents
+        # containing every query word, widening to any query word and finally
+        # to shared trigrams (typo tolerance) only while results are short
+        candidates: Set[DocKey] = set()
+        if query_isbn:
+            candidates |= self._isbns.get(query_isbn, set())
+
+        postings = sorted(
+            (self._tokens[token] for token in query_tokens if token in self._tokens),
+            key=len,
+        )
+        if postings:
+            candidates |= set.intersection(*postings)
+            if len(candidates) < limit:
+                candidates |= self._top(postings, MAX_CANDIDATES)
+
+        if len(candidates) < limit:
+            # Very common trigrams carry little signal and dominate the cost
+            common = max(len(self._docs) // 10, MAX_CANDIDATES)
+            grams = sorted(
+                (self._trigrams[gram] for gram in query_trigrams if gram in self._trigrams),
+                key=len,
+            )
+            selective = [keys for keys in grams if len(keys) <= common] or grams[:3]
+            candidates |= self._top(selective, max(limit * 10, 200))
+
+        results = []
+        for key in candidates:
+            doc = self._docs[key]
+            if kind and doc["kind"] != kind:
+                continue
+            isbn_match = query_isbn is not None and doc["_isbn"] == query_isbn
+            title_share = len(query_tokens & doc["_title_tokens"]) / len(query_tokens) if query_tokens else 0.0
+            author_share = len(query_tokens & doc["_author_tokens"]) / len(query_tokens) if query_tokens else 0.0
+            similarity = max(
+                _similarity(query_trigrams, doc["_title_trigrams"]),
+                _similarity(query_trigrams, doc["_author_trigrams"]),
+            )
+            if not (isbn_match or title_share or author_share or similarity >= SIMILARITY_THRESHOLD):
+                continue
+            score = (10.0 if isbn_match else 0.0) + 2 * (title_share + 0.4 * author_share) + similarity
+            results.append({
+                "kind": doc["kind"],
+                "id": doc["id"],
+                "book_id": doc["book_id"],
+                "title": doc["title"],
+                "author": doc["author"],
+                "isbn": doc["isbn"],
+                "score": score,
+            })
+
+        results.sort(key=lambda result: result["score"], reverse=True)
+        return results[:limit]
+
+
+search_index = SearchIndex()
+
+
+def memory_backend() -> bool:
+    return settings.SEARCH_BACKEND == "memory"
+
+
+async def search(query: str, limit: int = 20, kind: Optional[str] = None) -> List[dict]:
+    """Ranked matches for a free-text or ISBN query"""
+    if memory_backend():
+        return search_index.search(query, limit=limit, kind=kind)
+    return await repository.rpc(
+        "search_catalog",
+        {"p_query": query, "p_limit": limit, "p_kind": kind},
+    ) or []
+
+
+async def load_index() -> None:
+    """Build the in-process index from the database (memory backend only)"""
+    if not memory_backend():
+        return
+    books = {}
+    async for book in repository.scan("books"):
+        books[book["id"]] = book
+        search_index.add("book", book["id"], book["title"], book.get("author"), book.get("isbn"), book["id"])
+    async for listing in repository.scan("listings", {"status": "active"}):
+        book = books.get(listing.get("book_id"), {})
+        search_index.add(
+            "listing", listing["id"], book.get("title"), book.get("author"), book.get("isbn"), listing.get("book_id")
+        )
+    async for req in repository.scan("requests", {"status": "open"}):
+        search_index.add("request", req["id"], req["book_title"], req.get("author"), req.get("isbn"))
+
+
+def index_listing(listing: dict) -> None:
+    """Keep the in-process index in step with a created or updated listing"""
+    if not memory_backend():
+        return
+    if listing.get("book_id"):
+        search_index.add(
+            "book", listing["book_id"], listing.get("book_title"), listing.get("book_author"),
+            listing.get("book_isbn"), listing["book_id"],
+        )
+    if listing.get("status") == "active":
+        search_index.add(
+            "listing", listing["id"], listing.get("book_title"), listing.get("book_author"),
+            listing.get("book_isbn"), listing.get("book_id"),
+        )
+    else:
+        search_index.remove("listing", listing["id"])
+
+
+def index_request(req: dict) -> None:
+    """Keep the in-process index in step with a created or updated request"""
+    if not memory_backend():
+        return
+    if req.get("status") == "open":
+        search_index.add("request", req["id"], req.get("book_title"), req.get("author"), req.get("isbn"))
+    else:
+        search_index.remove("request", req["id"])
+
+
+def unindex(kind: str, doc_id: str) -> None:
+    """Drop a deleted listing or request from the in-process index"""
+    if memory_backend():
+        search_index.remove(kind, doc_id)
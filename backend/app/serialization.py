@@ -0,0 +1,105 @@
+"""
+Single-pass response serialization for the list and export endpoints
+
+FastAPI validates a returned model against response_model, converts it to
+JSON-compatible Python objects and only then encodes it with json.dumps.
+render() instead validates the hydrated rows once with a precompiled
+TypeAdapter and encodes them straight to bytes in pydantic-core. Clients that
+send Accept: application/msgpack get MessagePack when msgpack is installed.
+stream_ndjson() does the same per row for streamed exports.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from app.models import (
+    ListingListResponse,
+    ListingResponse,
+    ListingSummaryResponse,
+    RequestListResponse,
+    RequestResponse,
+)
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Built once at import: schema compilation is the expensive part
+listing_page_adapter = TypeAdapter(ListingListResponse)
+request_page_adapter = TypeAdapter(RequestListResponse)
+listing_adapter = TypeAdapter(ListingResponse)
+listing_summary_adapter = TypeAdapter(ListingSummaryResponse)
+request_adapter = TypeAdapter(RequestResponse)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def negotiate(request: Request) -> str:
+    """Media type to answer with: MessagePack if asked for and available, else JSON"""
+    accept = request.headers.get("accept", "")
+    if msgpack is not None and any(media in accept for media in MSGPACK_MEDIA_TYPES):
+        return MSGPACK_MEDIA_TYPES[0]
+    return "application/json"
+
+
+def render(
+    media_type: str,
+    adapter: TypeAdapter,
+    payload: Any,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Validate payload once and encode it in the negotiated media type
+    The returned Response bypasses FastAPI's response_model pass, which
+    stays on the route only to document the schema
+    """
+    value = adapter.validate_python(payload)
+    if media_type in MSGPACK_MEDIA_TYPES:
+        content = msgpack.packb(adapter.dump_python(value, mode="json"))
+    else:
+        content = adapter.dump_json(value)
+    response = Response(content=content, media_type=media_type, headers=headers)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+async def stream_ndjson(
+    chunks: AsyncIterator[List[dict]],
+    hydrate: Callable[[List[dict]], Awaitable[Tuple[List[dict], bool]]],
+    adapter: TypeAdapter,
+) -> AsyncIterator[bytes]:
+    """
+    Hydrate and encode row chunks as NDJSON, one write per chunk
+    The next chunk is read while the current one is hydrated, so at most two
+    chunks are held at a time. The status line is long gone when a later
+    chunk fails, so a failure ends the stream with an {"error": ...} line.
+    A chunk whose hydration stays incomplete after one retry is a failure
+    too, rather than rows exported with null book and seller fields.
+    """
+    rows_iter = chunks.__aiter__()
+    upcoming = asyncio.ensure_future(rows_iter.__anext__())
+    try:
+        while True:
+            try:
+                rows = await upcoming
+            except StopAsyncIteration:
+                return
+            upcoming = asyncio.ensure_future(rows_iter.__anext__())
+            hydrated, complete = await hydrate(rows)
+            if not complete:
+                # Usually transient; books and profiles fetched by the first
+                # attempt are served from the metadata cache
+                hydrated, complete = await hydrate(rows)
+            if not complete:
+                raise RuntimeError("related books, profiles or images could not be loaded")
+            yield b"".join(
+                adapter.dump_json(adapter.validate_python(row)) + b"\n" for row in hydrated
+            )
+    except Exception as e:
+        yield json.dumps({"error": f"Export failed: {e}"}).encode() + b"\n"
+    finally:
+        upcoming.cancel()
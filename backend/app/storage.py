@@ -0,0 +1,101 @@
+"""
+Storage backends for uploaded files
+
+Keys are content-addressed (see app.images): an object never changes once
+written, so writes of an existing key can be skipped and files can be
+cached by clients indefinitely. LocalStorage keeps files on disk (local
+runs and tests); SupabaseStorage uses a public Supabase Storage bucket.
+"""
+import asyncio
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from app import database
+from app.config import settings
+
+# Objects are immutable, so caches may keep them for a year
+CACHE_SECONDS = 31536000
+
+
+class Storage(ABC):
+    """Interface of the file storage used for uploads"""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Whether an object is stored under key"""
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes, content_type: str) -> None:
+        """Store an object under key"""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """Public URL of a stored object"""
+
+
+class LocalStorage(Storage):
+    """Files under a directory, served by the app at base_url"""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _write(self, path: str, data: bytes) -> None:
+        # Write to a temporary file first so readers never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self._path(key))
+
+    async def put(self, key: str, data: bytes, content_type: str) -> None:
+        await asyncio.to_thread(self._write, self._path(key), data)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class SupabaseStorage(Storage):
+    """Objects in a public Supabase Storage bucket"""
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    def _bucket(self):
+        return database.get_client(admin=True).storage.from_(self.bucket)
+
+    async def exists(self, key: str) -> bool:
+        return await self._bucket().exists(key)
+
+    async def put(self, key: str, data: bytes, content_type: str) -> None:
+        await self._bucket().upload(
+            key,
+            data,
+            {"content-type": content_type, "cache-control": str(CACHE_SECONDS), "upsert": "true"},
+        )
+
+    def url(self, key: str) -> str:
+        return f"{settings.SUPABASE_URL}/storage/v1/object/public/{self.bucket}/{key}"
+
+
+def create_storage() -> Storage:
+    """The storage backend selected by STORAGE_BACKEND"""
+    if settings.STORAGE_BACKEND == "supabase":
+        return SupabaseStorage(settings.STORAGE_BUCKET)
+    return LocalStorage(settings.MEDIA_ROOT, settings.MEDIA_URL)
+
+
+storage = create_storage()
@@ -0,0 +1,177 @@
+"""
+Local verification of Supabase access tokens
+
+Tokens are verified against the project JWT secret (HS256) or the project's
+JWKS (asymmetric signing keys) without a round trip to Supabase Auth.
+Verified claims are cached by token hash, and tokens revoked through
+/api/auth/logout are rejected for the rest of their lifetime.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Dict, Optional
+import jwt
+from app.cache import TTLCache, register_cache
+from app.config import settings
+
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+
+
+def hash_token(token: str) -> str:
+    """Cache key for a token; the raw token is never stored"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevocationListFull(Exception):
+    """Raised when a token cannot be revoked because the list is full"""
+
+
+class RevocationList:
+    """
+    Token hashes rejected until their expiry
+    Unlike TTLCache, entries are never evicted to make room: dropping one
+    would make a logged-out token valid again, so a full list refuses new
+    entries instead.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._expiry: Dict[str, float] = {}
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        for token_hash in [h for h, expires_at in self._expiry.items() if expires_at <= now]:
+            del self._expiry[token_hash]
+
+    def add(self, token_hash: str, ttl: float) -> None:
+        """Revoke for ttl seconds; raises RevocationListFull when full"""
+        if ttl <= 0:
+            return
+        if token_hash not in self._expiry and len(self._expiry) >= self.maxsize:
+            self._purge()
+            if len(self._expiry) >= self.maxsize:
+                raise RevocationListFull(f"{self.maxsize} unexpired tokens are already revoked")
+        self._expiry[token_hash] = time.monotonic() + ttl
+
+    def __contains__(self, token_hash: str) -> bool:
+        expires_at = self._expiry.get(token_hash)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._expiry[token_hash]
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+
+class TokenVerifier:
+    """Verifies access tokens locally and caches the verified claims"""
+
+    def __init__(
+        self,
+        secret: Optional[str],
+        jwks_url: str,
+        audience: str,
+        cache_size: int,
+        cache_ttl: float,
+        jwks_ttl: int,
+        revoked_size: int,
+    ):
+        self.secret = secret
+        self.audience = audience
+        self._claims = register_cache(
+            "auth_tokens", TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        )
+        self._revoked = RevocationList(maxsize=revoked_size)
+        self._jwks = jwt.PyJWKClient(
+            jwks_url,
+            cache_keys=True,
+            lifespan=jwks_ttl,
+            headers={"apikey": settings.SUPABASE_ANON_KEY},
+        )
+
+    def can_verify(self, token: str) -> bool:
+        """
+        Whether the token's algorithm can be verified locally
+        HS256 tokens need SUPABASE_JWT_SECRET; asymmetric tokens use the JWKS
+        """
+        try:
+            algorithm = jwt.get_unverified_header(token).get("alg")
+        except jwt.InvalidTokenError:
+            return True  # malformed, let verify() reject it
+        return algorithm in ASYMMETRIC_ALGORITHMS or (
+            algorithm == "HS256" and bool(self.secret)
+        )
+
+    async def verify(self, token: str) -> dict:
+        """
+        Return the verified claims for a token
+        Raises jwt.InvalidTokenError if the token is invalid or expired,
+        and jwt.PyJWKClientError if the signing keys cannot be fetched
+        """
+        token_hash = hash_token(token)
+        claims = self._claims.get(token_hash)
+        if claims is not None:
+            return claims
+
+        algorithm = jwt.get_unverified_header(token).get("alg")
+        if algorithm == "HS256" and self.secret:
+            key = self.secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            # Key lookups are served from the JWKS cache; only a cache miss
+            # fetches the key set, so keep that off the event loop
+            signing_key = await asyncio.to_thread(
+                self._jwks.get_signing_key_from_jwt, token
+            )
+            key = signing_key.key
+        else:
+            raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            options={"require": ["exp", "sub"]},
+        )
+        # Never cache claims beyond the token's own expiry
+        self._claims.set(
+            token_hash,
+            claims,
+            ttl=min(self._claims.ttl, claims["exp"] - time.time()),
+        )
+        return claims
+
+    def cached_subject(self, token: str) -> Optional[str]:
+        """User id of a token verified earlier, without verifying it again"""
+        claims = self._claims.get(hash_token(token))
+        return claims["sub"] if claims is not None else None
+
+    def is_revoked(self, token: str) -> bool:
+        return hash_token(token) in self._revoked
+
+    async def revoke(self, token: str) -> None:
+        """
+        Reject a token locally until it expires
+        The token is verified first, so only genuine tokens take up room and
+        their verified exp bounds how long they are kept. Raises
+        jwt.InvalidTokenError for tokens that fail verification and
+        RevocationListFull when the revocation list is full.
+        """
+        claims = await self.verify(token)
+        token_hash = hash_token(token)
+        self._revoked.add(token_hash, claims["exp"] - time.time())
+        self._claims.pop(token_hash)
+
+
+token_verifier = TokenVerifier(
+    secret=settings.SUPABASE_JWT_SECRET,
+    jwks_url=f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json",
+    audience="authenticated",
+    cache_size=settings.AUTH_TOKEN_CACHE_SIZE,
+    cache_ttl=settings.AUTH_TOKEN_CACHE_TTL_SECONDS,
+    jwks_ttl=settings.AUTH_JWKS_CACHE_TTL_SECONDS,
+    revoked_size=settings.AUTH_REVOKED_TOKENS_MAX_SIZE,
+)
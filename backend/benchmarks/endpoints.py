@@ -0,0 +1,359 @@
+"""
+Endpoint latency and throughput against an in-memory Supabase stand-in
+
+Runs the FastAPI app from app/main.py in process with its Supabase clients
+replaced by benchmarks.standin (tables, RPCs and Auth held in memory, every
+call delayed by the injected latency), so performance can be compared
+offline without a Supabase project. Virtual users loop over weighted,
+scripted scenarios:
+
+    feed     GET /api/listings/, then the next page through its cursor
+    detail   GET /api/listings/{id}
+    write    POST /api/listings/, then PUT /api/listings/{id}
+    request  POST /api/requests/
+
+The report gives, per endpoint, the requests and errors, the mean number of
+upstream calls (X-Query-Count), p50/p95/p99 latency and throughput.
+Requests are driven straight through the ASGI interface: the numbers cover
+the app and its middleware, but no HTTP server or network besides the
+injected latency. Requests started during the warmup are not counted.
+
+Run from the backend directory:
+    python -m benchmarks.endpoints [--latency-ms 20] [--jitter-ms 5] [--users 50]
+        [--duration 10] [--warmup 2] [--mix feed=50,detail=35,write=10,request=5]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from benchmarks.standin import StandInClient, Store
+
+JWT_SECRET = "benchmark-jwt-secret"
+
+CONDITIONS = ("new", "like_new", "good", "acceptable")
+
+
+def configure_environment(rate_limit: bool) -> None:
+    """Settings the app reads on import; the Supabase values are never contacted"""
+    os.environ.setdefault("SUPABASE_URL", "http://standin.invalid")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "standin-anon-key")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "standin-service-role-key")
+    # Tokens minted by the stand-in must verify locally
+    os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+    os.environ["QUERY_COUNT_HEADER"] = "true"
+    os.environ["RATE_LIMIT_ENABLED"] = "true" if rate_limit else "false"
+
+
+def seed(store: Store, rng: random.Random, users: int, books: int, listings: int, requests: int) -> dict:
+    """Fill the store with a marketplace of the given size; returns ids the scenarios use"""
+    now = datetime.now(timezone.utc)
+
+    def timestamp(days_ago: float) -> str:
+        return (now - timedelta(days=days_ago)).isoformat(timespec="microseconds")
+
+    user_ids = []
+    for i in range(users):
+        user = store.table("auth.users").add({
+            "email": f"student{i}@gmu.edu",
+            "password": "benchmark-password",
+            "email_confirmed_at": timestamp(60),
+            "created_at": timestamp(60),
+        })
+        store.table("profiles").add({"id": user["id"], "display_name": f"Student {i}", "created_at": timestamp(60)})
+        user_ids.append(user["id"])
+
+    book_ids = [
+        store.table("books").add({
+            "title": f"Textbook {i}",
+            "author": f"Author {i % 97}",
+            "isbn": f"978{rng.randrange(10 ** 9, 10 ** 10)}",
+            "created_at": timestamp(45),
+        })["id"]
+        for i in range(books)
+    ]
+
+    active = []
+    for i in range(listings):
+        rental = rng.random() < 0.2
+        created_at = timestamp(30 * (listings - i) / listings)
+        listing = store.table("listings").add({
+            "user_id": rng.choice(user_ids),
+            "book_id": rng.choice(book_ids),
+            "type": "rent" if rental else "sale",
+            "price": round(rng.uniform(5, 150), 2),
+            "condition": rng.choice(CONDITIONS),
+            "description": "Lightly used, no highlighting",
+            "rent_duration_value": rng.randint(1, 16) if rental else None,
+            "rent_duration_unit": "weeks" if rental else None,
+            "status": "active" if rng.random() < 0.9 else "sold",
+            "created_at": created_at,
+        })
+        for n in range(rng.randint(0, 3)):
+            store.table("listing_images").add({
+                "listing_id": listing["id"],
+                "image_url": f"https://images.example/{listing['id']}/{n}.jpg",
+                "created_at": created_at,
+            })
+        if listing["status"] == "active":
+            active.append(listing["id"])
+
+    for i in range(requests):
+        store.table("requests").add({
+            "user_id": rng.choice(user_ids),
+            "book_title": f"Textbook {rng.randrange(books * 2)}",
+            "status": "open",
+            "created_at": timestamp(30 * (requests - i) / requests),
+        })
+
+    return {"users": user_ids, "books": book_ids, "listings": active}
+
+
+async def call_app(
+    app,
+    method: str,
+    path: str,
+    query: Optional[dict] = None,
+    body: Optional[dict] = None,
+    token: Optional[str] = None,
+) -> Tuple[int, Dict[bytes, bytes], bytes]:
+    """One request through the ASGI interface: (status, headers, body)"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    headers = [(b"host", b"benchmark"), (b"accept", b"application/json")]
+    if body is not None:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(query or {}).encode(),
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    sent = False
+    response = {"status": 500, "headers": {}, "body": []}
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.Event().wait()  # no disconnect while the request runs
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], b"".join(response["body"])
+
+
+class Recorder:
+    """Latency samples, errors and upstream call counts per endpoint"""
+
+    def __init__(self, record_from: float):
+        self.record_from = record_from
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.queries: Dict[str, int] = defaultdict(int)
+
+    async def request(self, app, label: str, method: str, path: str, expected: int = 200, **kwargs) -> Optional[dict]:
+        start = time.perf_counter()
+        status, headers, body = await call_app(app, method, path, **kwargs)
+        elapsed = time.perf_counter() - start
+        if start >= self.record_from:
+            self.latencies[label].append(elapsed)
+            self.queries[label] += int(headers.get(b"x-query-count", 0))
+            if status != expected:
+                self.errors[label] += 1
+        return json.loads(body) if status == expected and body else None
+
+
+class Context:
+    """Seeded ids and signed-in users shared by the virtual users"""
+
+    def __init__(self, client: StandInClient, ids: dict):
+        self.listings = ids["listings"]
+        self.tokens = {
+            user_id: client.mint_token(user_id, f"{user_id}@gmu.edu") for user_id in ids["users"]
+        }
+
+
+async def feed(app, recorder: Recorder, context: Context, rng: random.Random, user_id: str) -> None:
+    page = await recorder.request(app, "GET /api/listings/", "GET", "/api/listings/", query={"limit": 20})
+    if page and page.get("next_cursor"):
+        await recorder.request(
+            app,
+            "GET /api/listings/?cursor",
+            "GET",
+            "/api/listings/",
+            query={"limit": 20, "cursor": page["next_cursor"]},
+        )
+
+
+async def detail(app, recorder: Recorder, context: Context, rng: random.Random, user_id: str) -> None:
+    listing_id = rng.choice(context.listings)
+    await recorder.request(app, "GET /api/listings/{id}", "GET", f"/api/listings/{listing_id}")
+
+
+async def write(app, recorder: Recorder, context: Context, rng: random.Random, user_id: str) -> None:
+    token = context.tokens[user_id]
+    listing = await recorder.request(
+        app,
+        "POST /api/listings/",
+        "POST",
+        "/api/listings/",
+        expected=201,
+        token=token,
+        body={
+            "title": f"Textbook {rng.randrange(1000)}",
+            "author": "Benchmark Author",
+            "isbn": f"978{rng.randrange(10 ** 9, 10 ** 10)}",
+            "type": "sale",
+            "price": round(rng.uniform(5, 150), 2),
+            "condition": rng.choice(CONDITIONS),
+            "images": ["https://images.example/front.jpg"],
+        },
+    )
+    if listing:
+        context.listings.append(listing["id"])
+        await recorder.request(
+            app,
+            "PUT /api/listings/{id}",
+            "PUT",
+            f"/api/listings/{listing['id']}",
+            token=token,
+            body={"price": round(listing["price"] * 0.9, 2), "description": "Price lowered"},
+        )
+
+
+async def post_request(app, recorder: Recorder, context: Context, rng: random.Random, user_id: str) -> None:
+    await recorder.request(
+        app,
+        "POST /api/requests/",
+        "POST",
+        "/api/requests/",
+        expected=201,
+        token=context.tokens[user_id],
+        body={"book_title": f"Textbook {rng.randrange(1000)}", "desired_condition": "good"},
+    )
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "feed": feed,
+    "detail": detail,
+    "write": write,
+    "request": post_request,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def report(recorder: Recorder, elapsed: float) -> None:
+    print(f"{'endpoint':<28} {'requests':>8} {'errors':>6} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    total = 0
+    for label in sorted(recorder.latencies):
+        samples = sorted(recorder.latencies[label])
+        total += len(samples)
+        print(
+            f"{label:<28} {len(samples):>8} {recorder.errors[label]:>6} "
+            f"{recorder.queries[label] / len(samples):>7.1f} "
+            f"{percentile(samples, 0.50) * 1000:>8.1f} "
+            f"{percentile(samples, 0.95) * 1000:>8.1f} "
+            f"{percentile(samples, 0.99) * 1000:>8.1f} "
+            f"{len(samples) / elapsed:>8.1f}"
+        )
+    print(f"{'total':<28} {total:>8} {sum(recorder.errors.values()):>6} {'':>7} {'':>8} {'':>8} {'':>8} {total / elapsed:>8.1f}")
+
+
+async def run(args) -> None:
+    configure_environment(args.rate_limit)
+    # Imported here so the settings above are in place first
+    from app import database
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    store = Store()
+    ids = seed(store, rng, args.seed_users, args.seed_books, args.seed_listings, args.seed_requests)
+    client = StandInClient(
+        store,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        jwt_secret=JWT_SECRET,
+        seed=args.seed,
+    )
+    database.supabase = database.supabase_admin = client
+    context = Context(client, ids)
+
+    weights = parse_mix(args.mix)
+    scenarios = [SCENARIOS[name] for name in weights]
+    start = time.perf_counter()
+    recorder = Recorder(record_from=start + args.warmup)
+    deadline = recorder.record_from + args.duration
+
+    async def virtual_user(number: int) -> None:
+        user_rng = random.Random(f"{args.seed}:{number}")
+        user_id = user_rng.choice(ids["users"])
+        while time.perf_counter() < deadline:
+            scenario = user_rng.choices(scenarios, weights=list(weights.values()))[0]
+            await scenario(app, recorder, context, user_rng, user_id)
+
+    await asyncio.gather(*(virtual_user(number) for number in range(args.users)))
+    elapsed = time.perf_counter() - recorder.record_from
+
+    print(
+        f"{args.users} users, {args.duration:g}s after {args.warmup:g}s warmup, "
+        f"upstream latency {args.latency_ms:g}ms +0-{args.jitter_ms:g}ms, mix {args.mix}"
+    )
+    report(recorder, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Injected latency of every upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Random extra latency, uniform from 0")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds first (fills the caches)")
+    parser.add_argument("--mix", default="feed=50,detail=35,write=10,request=5", help="Scenario weights")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--seed-users", type=int, default=500)
+    parser.add_argument("--seed-books", type=int, default=2000)
+    parser.add_argument("--seed-listings", type=int, default=5000)
+    parser.add_argument("--seed-requests", type=int, default=1000)
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the rate limiter on (off by default)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
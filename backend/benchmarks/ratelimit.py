@@ -0,0 +1,80 @@
+"""
+Per-request overhead of RateLimitMiddleware with the in-memory backend
+
+Drives the middleware directly with ASGI scopes (no server, no network) for
+an unlimited route, a limited route under its limit, a rejected request and
+a write keyed on a verified user, and compares with calling the app bare.
+
+Run from the backend directory:
+    python -m benchmarks.ratelimit [--requests 200000] [--clients 10000]
+"""
+import argparse
+import asyncio
+import time
+from app.ratelimit import MemoryBackend, Policy, RateLimitMiddleware, DEFAULT_POLICIES
+
+
+async def app(scope, receive, send):
+    pass
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+def make_scope(method: str, path: str, client: str, token: str = None) -> dict:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return {"type": "http", "method": method, "path": path, "headers": headers, "client": (client, 50000)}
+
+
+async def per_request_us(handler, scopes) -> float:
+    start = time.perf_counter()
+    for scope in scopes:
+        await handler(scope, receive, send)
+    return (time.perf_counter() - start) * 1e6 / len(scopes)
+
+
+async def run(requests: int, clients: int) -> None:
+    # Limits high enough that only the "rejected" case is ever over them
+    policies = [policy._replace(limit=10 ** 9) for policy in DEFAULT_POLICIES]
+    policies.append(Policy("tight", frozenset({"POST"}), "/api/tight", limit=1, period=3600))
+    middleware = RateLimitMiddleware(
+        app,
+        MemoryBackend(),
+        policies=policies,
+        identify_user=lambda token: token,
+    )
+
+    ips = [f"10.0.{i // 256 % 256}.{i % 256}" for i in range(clients)]
+    cases = {
+        "unlimited GET": [make_scope("GET", "/api/listings", ips[i % clients]) for i in range(requests)],
+        "login (per IP)": [make_scope("POST", "/api/auth/login", ips[i % clients]) for i in range(requests)],
+        "write (per user)": [
+            make_scope("PUT", "/api/listings/abc", ips[i % clients], token=f"user-{i % clients}")
+            for i in range(requests)
+        ],
+        "rejected (429)": [make_scope("POST", "/api/tight", "10.9.9.9") for _ in range(requests)],
+    }
+
+    bare = await per_request_us(app, cases["unlimited GET"])
+    print(f"{requests} requests from {clients} clients")
+    print(f"  bare app                 {bare:7.2f} us/request")
+    for name, scopes in cases.items():
+        total = await per_request_us(middleware, scopes)
+        print(f"  {name:<24} {total:7.2f} us/request  (+{total - bare:.2f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.clients))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Per-page CPU and payload cost of the listing feed serialization paths
+
+Compares FastAPI's default response_model path (validate the returned model,
+dump it to JSON-compatible objects, json.dumps) with the single-pass
+TypeAdapter path used by app.serialization, and reports the payload size
+raw, gzip/brotli compressed and as MessagePack.
+
+Run from the backend directory:
+    python -m benchmarks.serialization [--items 100] [--images 4] [--rounds 500]
+"""
+import argparse
+import gzip
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from app.models import ListingListResponse
+from app.serialization import listing_page_adapter
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def make_page(items: int, images: int) -> dict:
+    """A hydrated listing page shaped like the rows PostgREST returns"""
+    now = datetime.now(timezone.utc)
+    listings = []
+    for i in range(items):
+        listing_id = str(uuid.uuid4())
+        created_at = (now - timedelta(minutes=i)).isoformat()
+        listings.append({
+            "id": listing_id,
+            "user_id": str(uuid.uuid4()),
+            "book_id": str(uuid.uuid4()),
+            "type": "rent" if i % 3 == 0 else "sale",
+            "price": 20 + i % 50 + 0.99,
+            "condition": "good",
+            "description": f"Lightly used copy #{i}, some highlighting in chapters 3-5.",
+            "rent_duration_value": 4 if i % 3 == 0 else None,
+            "rent_duration_unit": "months" if i % 3 == 0 else None,
+            "status": "active",
+            "created_at": created_at,
+            "updated_at": created_at,
+            "book_title": f"Calculus: Early Transcendentals ({i % 9 + 1}th Edition)",
+            "book_author": "James Stewart",
+            "book_isbn": "978-1-285-74155-0",
+            "user_display_name": f"Student {i}",
+            "images": [
+                f"https://cdn.example.com/listings/{listing_id}/{n}.jpg"
+                for n in range(images)
+            ],
+        })
+    return {"listings": listings, "count": len(listings), "next_cursor": None}
+
+
+def default_path(page: dict) -> bytes:
+    """What a route returning ListingListResponse costs with response_model"""
+    model = ListingListResponse(**page)
+    # FastAPI validates the returned model against the precompiled response
+    # field, then dumps it to JSON-compatible objects
+    content = listing_page_adapter.dump_python(
+        listing_page_adapter.validate_python(model), mode="json"
+    )
+    # Starlette JSONResponse.render
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fast_path(page: dict) -> bytes:
+    """app.serialization.render for a JSON client"""
+    return listing_page_adapter.dump_json(listing_page_adapter.validate_python(page))
+
+
+def per_call_ms(fn, page: dict, rounds: int) -> float:
+    fn(page)  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(page)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    page = make_page(args.items, args.images)
+    default_ms = per_call_ms(default_path, page, args.rounds)
+    fast_ms = per_call_ms(fast_path, page, args.rounds)
+    body = fast_path(page)
+
+    print(f"Page: {args.items} listings x {args.images} images, {args.rounds} rounds")
+    print(f"  default response_model path  {default_ms:8.3f} ms/page")
+    print(f"  single-pass TypeAdapter      {fast_ms:8.3f} ms/page  ({default_ms / fast_ms:.1f}x)")
+
+    print("Payload:")
+    print(f"  json                {len(body):8d} bytes")
+    sizes = {"json + gzip(6)": len(gzip.compress(body, compresslevel=6))}
+    if brotli is not None:
+        sizes["json + br(4)"] = len(brotli.compress(body, quality=4))
+    if msgpack is not None:
+        packed = msgpack.packb(listing_page_adapter.dump_python(
+            listing_page_adapter.validate_python(page), mode="json"
+        ))
+        sizes["msgpack"] = len(packed)
+        sizes["msgpack + gzip(6)"] = len(gzip.compress(packed, compresslevel=6))
+    for name, size in sizes.items():
+        print(f"  {name:<19} {size:8d} bytes  ({size / len(body):.0%})")
+
+    gzip_ms = per_call_ms(lambda _: gzip.compress(body, compresslevel=6), page, args.rounds)
+    print(f"  gzip(6) cost        {gzip_ms:8.3f} ms/page")
+    if brotli is not None:
+        br_ms = per_call_ms(lambda _: brotli.compress(body, quality=4), page, args.rounds)
+        print(f"  br(4) cost          {br_ms:8.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
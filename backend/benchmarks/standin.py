@@ -0,0 +1,515 @@
+"""
+In-memory stand-in for the Supabase clients
+
+Implements the part of the supabase-py AsyncClient the app uses: PostgREST
+table queries (select/insert/update/delete with eq/in/range filters, the
+keyset or() filter, order and range), the RPCs called by the benchmarked
+endpoints, and the Auth calls. Every call sleeps for the injected latency
+first, so the app sees the round trip a real project would cost without
+any network. Rows are plain dicts; timestamps are ISO strings as PostgREST
+returns them.
+
+    client = StandInClient(Store(), latency=0.02, jitter=0.005)
+    database.supabase = database.supabase_admin = client
+"""
+import asyncio
+import random
+import time
+import uuid
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import jwt
+from app.isbn import normalize_isbn
+
+# Column defaults applied on insert, beyond id and timestamps
+DEFAULTS = {
+    "books": {"author": None, "isbn": None, "is_active": True},
+    "listings": {
+        "book_id": None,
+        "description": None,
+        "rent_duration_value": None,
+        "rent_duration_unit": None,
+        "status": "active",
+    },
+    "listing_images": {"thumbnail_url": None, "webp_url": None},
+    "requests": {"author": None, "isbn": None, "desired_condition": None, "description": None, "status": "open"},
+    "profiles": {"avatar_url": None, "is_active": True},
+}
+
+# Columns with a hash index; equality and IN filters on them skip the scan
+INDEXED = {"id", "listing_id", "user_id", "conversation_id", "isbn_normalized"}
+
+# Embeddable resources: (table, embedded table) -> (column, embedded column, to-many)
+RELATIONS = {
+    ("listings", "books"): ("book_id", "id", False),
+    ("listings", "profiles"): ("user_id", "id", False),
+    ("listings", "listing_images"): ("id", "listing_id", True),
+    ("requests", "profiles"): ("user_id", "id", False),
+}
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+class Table:
+    """Rows by id, kept in (created_at, id) order with hash indexes"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Dict[str, dict] = {}
+        self._order: List[Tuple[str, str]] = []
+        self._indexes: Dict[str, Dict[Any, Dict[str, dict]]] = {column: {} for column in INDEXED}
+
+    def add(self, row: dict) -> dict:
+        row = {"id": str(uuid.uuid4()), **DEFAULTS.get(self.name, {}), **row}
+        row.setdefault("created_at", now_iso())
+        if self.name == "books":
+            # Generated column (docs/schema/SUPABASE_BOOK_CATALOG.sql)
+            row["isbn_normalized"] = normalize_isbn(row.get("isbn"))
+        if self.name in ("listings", "requests"):
+            row.setdefault("updated_at", row["created_at"])
+        self.rows[row["id"]] = row
+        insort(self._order, (row["created_at"], row["id"]))
+        for column, index in self._indexes.items():
+            if column in row:
+                index.setdefault(row[column], {})[row["id"]] = row
+        return row
+
+    def remove(self, row: dict) -> None:
+        del self.rows[row["id"]]
+        position = bisect_left(self._order, (row["created_at"], row["id"]))
+        del self._order[position]
+        for column, index in self._indexes.items():
+            if column in row:
+                index.get(row[column], {}).pop(row["id"], None)
+
+    def lookup(self, column: str, values: Iterable) -> List[dict]:
+        index = self._indexes[column]
+        return [row for value in values for row in index.get(value, {}).values()]
+
+    def ordered(self, desc: bool) -> Iterable[dict]:
+        keys = reversed(self._order) if desc else iter(self._order)
+        return (self.rows[row_id] for _, row_id in keys)
+
+
+class Store:
+    """The tables of one stand-in project"""
+
+    def __init__(self):
+        self.tables: Dict[str, Table] = {}
+
+    def table(self, name: str) -> Table:
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = Table(name)
+        return table
+
+
+def _compare(op: str, left, right) -> bool:
+    if left is None:
+        return False
+    if op == "eq":
+        return left == right
+    if op == "neq":
+        return left != right
+    if op == "lt":
+        return left < right
+    if op == "lte":
+        return left <= right
+    if op == "gt":
+        return left > right
+    if op == "gte":
+        return left >= right
+    raise ValueError(f"Unsupported operator in stand-in: {op}")
+
+
+def _split_top_level(expression: str) -> List[str]:
+    """Comma-separated terms outside double quotes and parentheses"""
+    terms, current, quoted, depth = [], [], False, 0
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+        elif char == "," and not quoted and depth == 0:
+            terms.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    terms.append("".join(current).strip())
+    return terms
+
+
+def _parse_columns(columns: str) -> Tuple[Optional[List[str]], Dict[str, List[str]]]:
+    """Plain columns (None for *) and embedded resources of a select()"""
+    names, embeds = [], {}
+    for term in _split_top_level(columns):
+        if "(" in term:
+            name, _, inner = term.partition("(")
+            embeds[name.strip()] = [column.strip() for column in inner.rstrip(")").split(",")]
+        elif term:
+            names.append(term)
+    return (None if not names or "*" in names else names), embeds
+
+
+def _parse_or(expression: str) -> Callable[[dict], bool]:
+    conditions = []
+    for term in _split_top_level(expression):
+        column, op, value = term.split(".", 2)
+        conditions.append((column, op, value.strip('"')))
+    return lambda row: any(_compare(op, row.get(column), value) for column, op, value in conditions)
+
+
+class Response(SimpleNamespace):
+    """What execute() returns: rows in .data"""
+
+
+class Query:
+    """Chainable PostgREST query builder over a Table"""
+
+    def __init__(self, client: "StandInClient", table: str):
+        self.client = client
+        self.table = client.store.table(table)
+        self.action = "select"
+        self.payload: Any = None
+        self.columns: Optional[List[str]] = None
+        self.embeds: Dict[str, List[str]] = {}
+        self.filters: List[Tuple[str, str, Any]] = []
+        self.predicates: List[Callable[[dict], bool]] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self.start = 0
+        self.stop: Optional[int] = None
+
+    # Actions
+    def select(self, *columns: str, count: Optional[str] = None) -> "Query":
+        self.columns, self.embeds = _parse_columns(",".join(columns) or "*")
+        return self
+
+    def insert(self, rows) -> "Query":
+        self.action, self.payload = "insert", rows
+        return self
+
+    def update(self, values: dict) -> "Query":
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self) -> "Query":
+        self.action = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column: str, op: str, value) -> "Query":
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column: str, value) -> "Query":
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value) -> "Query":
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value) -> "Query":
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value) -> "Query":
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value) -> "Query":
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value) -> "Query":
+        return self._filter(column, "lte", value)
+
+    def in_(self, column: str, values: Iterable) -> "Query":
+        return self._filter(column, "in", list(values))
+
+    def or_(self, expression: str) -> "Query":
+        self.predicates.append(_parse_or(expression))
+        return self
+
+    # Shaping
+    def order(self, column: str, desc: bool = False, **kwargs) -> "Query":
+        self.orders.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int) -> "Query":
+        self.start, self.stop = start, end + 1
+        return self
+
+    def limit(self, count: int) -> "Query":
+        self.stop = self.start + count
+        return self
+
+    def _matches(self, row: dict) -> bool:
+        for column, op, value in self.filters:
+            if op == "in":
+                if row.get(column) not in value:
+                    return False
+            elif not _compare(op, row.get(column), value):
+                return False
+        return all(predicate(row) for predicate in self.predicates)
+
+    def _candidates(self) -> Iterable[dict]:
+        for column, op, value in self.filters:
+            if column in INDEXED and op in ("eq", "in"):
+                return self.table.lookup(column, value if op == "in" else [value])
+        return self.table.rows.values()
+
+    def _select(self) -> List[dict]:
+        feed_order = [column for column, _ in self.orders] in (["created_at"], ["created_at", "id"])
+        if feed_order and len({desc for _, desc in self.orders}) == 1 and not any(
+            column in INDEXED and op in ("eq", "in") for column, op, _ in self.filters
+        ):
+            # Newest-first feeds walk the (created_at, id) order and stop early
+            rows = []
+            for row in self.table.ordered(self.orders[0][1]):
+                if self._matches(row):
+                    rows.append(row)
+                    if self.stop is not None and len(rows) >= self.stop:
+                        break
+        else:
+            rows = [row for row in self._candidates() if self._matches(row)]
+            for column, desc in reversed(self.orders):
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        return rows[self.start:self.stop]
+
+    def _project(self, row: dict) -> dict:
+        if self.columns is None:
+            projected = dict(row)
+        else:
+            projected = {column: row.get(column) for column in self.columns}
+        for name, columns in self.embeds.items():
+            column, embedded_column, to_many = RELATIONS[(self.table.name, name)]
+            embedded = [
+                {key: match.get(key) for key in columns}
+                for match in self.client.store.table(name).lookup(embedded_column, [row.get(column)])
+            ]
+            projected[name] = embedded if to_many else (embedded[0] if embedded else None)
+        return projected
+
+    def _run(self) -> List[dict]:
+        if self.action == "insert":
+            rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            return [dict(self.table.add(dict(row))) for row in rows]
+        rows = [row for row in self._candidates() if self._matches(row)]
+        if self.action == "update":
+            for row in rows:
+                row.update(self.payload)
+                if "updated_at" in row:
+                    row["updated_at"] = now_iso()
+            return [dict(row) for row in rows]
+        if self.action == "delete":
+            for row in rows:
+                self.table.remove(row)
+            return rows
+        return [self._project(row) for row in self._select()]
+
+    async def execute(self) -> Response:
+        await self.client.round_trip()
+        return Response(data=self._run(), count=None)
+
+
+class RpcCall:
+    """A pending rpc() call"""
+
+    def __init__(self, client: "StandInClient", function: str, params: dict):
+        self.client = client
+        self.function = function
+        self.params = params
+
+    async def execute(self) -> Response:
+        await self.client.round_trip()
+        handler = RPCS.get(self.function)
+        if handler is None:
+            raise RuntimeError(f"Function {self.function} is not implemented by the stand-in")
+        return Response(data=handler(self.client.store, **self.params), count=None)
+
+
+def _upsert_book(store: Store, p_title: str, p_author: Optional[str] = None, p_isbn: Optional[str] = None) -> dict:
+    books = store.table("books")
+    normalized = normalize_isbn(p_isbn)
+    existing = books.lookup("isbn_normalized", [normalized]) if normalized else []
+    if existing:
+        return {"book": dict(existing[0]), "created": False}
+    book = books.add({"title": p_title, "author": p_author, "isbn": p_isbn})
+    return {"book": dict(book), "created": True}
+
+
+def _create_listing_with_book(
+    store: Store,
+    p_user_id: str,
+    p_type: str,
+    p_price: float,
+    p_condition: str,
+    p_book_id: Optional[str] = None,
+    p_title: Optional[str] = None,
+    p_author: Optional[str] = None,
+    p_isbn: Optional[str] = None,
+    p_description: Optional[str] = None,
+    p_rent_duration_value: Optional[int] = None,
+    p_rent_duration_unit: Optional[str] = None,
+    p_images: Optional[List[str]] = None,
+) -> dict:
+    if p_book_id:
+        book = store.table("books").rows.get(p_book_id)
+        if book is None:
+            raise RuntimeError(f"Book {p_book_id} not found")
+        created = False
+    else:
+        upserted = _upsert_book(store, p_title, p_author, p_isbn)
+        book, created = upserted["book"], upserted["created"]
+    rental = p_type == "rent"
+    listing = store.table("listings").add({
+        "user_id": p_user_id,
+        "book_id": book["id"],
+        "type": p_type,
+        "price": p_price,
+        "condition": p_condition,
+        "description": p_description,
+        "rent_duration_value": p_rent_duration_value if rental else None,
+        "rent_duration_unit": p_rent_duration_unit if rental else None,
+    })
+    for url in p_images or []:
+        store.table("listing_images").add({"listing_id": listing["id"], "image_url": url})
+    profile = store.table("profiles").rows.get(p_user_id, {})
+    return {
+        **listing,
+        "book_title": book["title"],
+        "book_author": book.get("author"),
+        "book_isbn": book.get("isbn"),
+        "user_display_name": profile.get("display_name"),
+        "images": list(p_images or []),
+        "book_created": created,
+    }
+
+
+def _get_auth_user_by_email(store: Store, p_email: str) -> List[dict]:
+    users = [user for user in store.table("auth.users").rows.values() if user["email"] == p_email]
+    return [
+        {key: user.get(key) for key in ("id", "email", "email_confirmed_at", "created_at")}
+        for user in users
+    ]
+
+
+RPCS: Dict[str, Callable[..., Any]] = {
+    "upsert_book": _upsert_book,
+    "create_listing_with_book": _create_listing_with_book,
+    "get_auth_user_by_email": _get_auth_user_by_email,
+}
+
+
+class StandInAuth:
+    """Supabase Auth calls over the auth.users table of the store"""
+
+    def __init__(self, client: "StandInClient"):
+        self.client = client
+        self.admin = SimpleNamespace(get_user_by_id=self._get_user_by_id)
+
+    @property
+    def _users(self) -> Table:
+        return self.client.store.table("auth.users")
+
+    @staticmethod
+    def _user(row: dict) -> SimpleNamespace:
+        return SimpleNamespace(**row, user_metadata={"full_name": row.get("full_name")})
+
+    def _session(self, row: dict) -> SimpleNamespace:
+        expires_at = int(time.time()) + 3600
+        return SimpleNamespace(
+            access_token=self.client.mint_token(row["id"], row["email"]),
+            refresh_token=uuid.uuid4().hex,
+            expires_at=expires_at,
+        )
+
+    async def sign_up(self, credentials: dict) -> SimpleNamespace:
+        await self.client.round_trip()
+        row = self._users.add({
+            "email": credentials["email"].lower(),
+            "password": credentials["password"],
+            "email_confirmed_at": None,
+            "full_name": credentials.get("options", {}).get("data", {}).get("full_name"),
+        })
+        return SimpleNamespace(user=self._user(row), session=None)
+
+    async def sign_in_with_password(self, credentials: dict) -> SimpleNamespace:
+        await self.client.round_trip()
+        email = credentials["email"].lower()
+        for row in self._users.rows.values():
+            if row["email"] == email and row["password"] == credentials["password"]:
+                return SimpleNamespace(user=self._user(row), session=self._session(row))
+        raise RuntimeError("Invalid login credentials")
+
+    async def sign_out(self) -> None:
+        await self.client.round_trip()
+
+    async def get_user(self, token: str) -> SimpleNamespace:
+        await self.client.round_trip()
+        claims = jwt.decode(token, self.client.jwt_secret, algorithms=["HS256"], audience="authenticated")
+        row = self._users.rows.get(claims["sub"])
+        return SimpleNamespace(user=self._user(row) if row else None)
+
+    async def _get_user_by_id(self, user_id: str) -> SimpleNamespace:
+        await self.client.round_trip()
+        row = self._users.rows.get(user_id)
+        return SimpleNamespace(user=self._user(row) if row else None)
+
+    async def resend(self, credentials: dict) -> None:
+        await self.client.round_trip()
+
+    async def verify_otp(self, params: dict) -> SimpleNamespace:
+        await self.client.round_trip()
+        raise RuntimeError("OTP verification is not implemented by the stand-in")
+
+
+class StandInClient:
+    """
+    Drop-in for supabase.AsyncClient backed by a Store
+    Each upstream call waits latency seconds plus up to jitter seconds
+    """
+
+    def __init__(
+        self,
+        store: Store,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        jwt_secret: str = "standin-jwt-secret",
+        seed: Optional[int] = None,
+    ):
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.jwt_secret = jwt_secret
+        self.calls = 0
+        self._random = random.Random(seed)
+        self.auth = StandInAuth(self)
+
+    async def round_trip(self) -> None:
+        self.calls += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        # sleep(0) still yields, as awaiting a real response would
+        await asyncio.sleep(delay)
+
+    def table(self, name: str) -> Query:
+        return Query(self, name)
+
+    def from_(self, name: str) -> Query:
+        return Query(self, name)
+
+    def rpc(self, function: str, params: Optional[dict] = None) -> RpcCall:
+        return RpcCall(self, function, params or {})
+
+    def mint_token(self, user_id: str, email: str, ttl: int = 3600) -> str:
+        """An access token the app verifies locally with SUPABASE_JWT_SECRET"""
+        now = int(time.time())
+        claims = {
+            "sub": user_id,
+            "email": email,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "iat": now,
+            "exp": now + ttl,
+        }
+        return jwt.encode(claims, self.jwt_secret, algorithm="HS256")
@@ -0,0 +1,145 @@
+"""
+Connection reuse of the shared Supabase HTTP transport under concurrent load
+
+Starts a local HTTP/1.1 keep-alive server that answers every request after
+the injected latency, then sends requests from concurrent tasks through two
+httpx clients sharing app.database.create_transport(), as the anon and
+service role clients do. The report gives the connections opened, counted
+both by the transport's metrics and by the server, the share of requests
+served on a reused connection, the peak pool size and the latency.
+HTTP/2 is negotiated over TLS only, so the local server exercises the
+HTTP/1.1 pool; the pool limits and timeouts apply the same way.
+
+Run from the backend directory:
+    python -m benchmarks.transport [--requests 5000] [--concurrency 100]
+        [--latency-ms 20] [--max-connections 100] [--max-keepalive 50]
+"""
+import argparse
+import asyncio
+import math
+import os
+import time
+from typing import List
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\n\r\n[]"
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Settings read on import; the pool limits come from the command line"""
+    os.environ.setdefault("SUPABASE_URL", "http://standin.invalid")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "standin-anon-key")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "standin-service-role-key")
+    os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-jwt-secret")
+    os.environ["SUPABASE_HTTP_MAX_CONNECTIONS"] = str(args.max_connections)
+    os.environ["SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS"] = str(args.max_keepalive)
+
+
+class Server:
+    """Keep-alive HTTP/1.1 server counting the connections it accepts"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                for line in head.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length" and int(value):
+                        await reader.readexactly(int(value))
+                await asyncio.sleep(self.latency)
+                writer.write(RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+async def run(args: argparse.Namespace) -> None:
+    configure_environment(args)
+    import httpx
+    from app import database
+    from app.metrics import supabase_http_connections_opened, supabase_http_requests
+
+    server = Server(args.latency_ms / 1000)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/rest/v1/listings"
+
+    transport = database.create_transport()
+    clients = [
+        httpx.AsyncClient(transport=transport, timeout=database.http_timeout(), headers={"apikey": key})
+        for key in ("anon", "service_role")
+    ]
+    requests_before = supabase_http_requests.value()
+    opened_before = supabase_http_connections_opened.value()
+    latencies: List[float] = []
+    errors = 0
+    peak = 0
+    remaining = args.requests
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, params={"select": "*"})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    async def sample_pool() -> None:
+        nonlocal peak
+        while True:
+            peak = max(peak, len(transport.pool_connections()))
+            await asyncio.sleep(0.005)
+
+    sampler = asyncio.create_task(sample_pool())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(clients[i % len(clients)]) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    for client in clients:
+        await client.aclose()
+    await transport.aclose()
+    listener.close()
+    await listener.wait_closed()
+
+    requests = supabase_http_requests.value() - requests_before
+    opened = supabase_http_connections_opened.value() - opened_before
+    latencies.sort()
+    print(f"requests             {requests:>10.0f}   errors {errors}")
+    print(f"connections opened   {opened:>10.0f}   (server accepted {server.connections})")
+    print(f"reused               {(1 - opened / requests) * 100 if requests else 0:>9.1f}%")
+    print(f"peak pool size       {peak:>10}   (limit {args.max_connections}, keep-alive {args.max_keepalive})")
+    print(
+        f"latency ms           p50 {percentile(latencies, 0.50) * 1000:.1f}  "
+        f"p95 {percentile(latencies, 0.95) * 1000:.1f}  p99 {percentile(latencies, 0.99) * 1000:.1f}"
+    )
+    print(f"throughput           {len(latencies) / elapsed:>10.0f} req/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000, help="Total requests")
+    parser.add_argument("--concurrency", type=int, default=100, help="Concurrent tasks, split over the two clients")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Server-side delay of every response")
+    parser.add_argument("--max-connections", type=int, default=100, help="SUPABASE_HTTP_MAX_CONNECTIONS")
+    parser.add_argument("--max-keepalive", type=int, default=50, help="SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Shared fixtures
+
+The app from app/main.py is served in process against the in-memory
+Supabase stand-in from benchmarks/standin.py (no network, no latency), and
+the query_budget fixture fails a test when the code inside its block makes
+more Supabase calls than allowed:
+
+    @pytest.mark.parametrize("limit", [1, 20, 100])
+    def test_listing_page_queries(api, query_budget, limit):
+        with query_budget(4):
+            api.get("/api/listings/", query={"limit": limit})
+
+Running the same budget over several page sizes is what catches N+1 loops:
+a batched endpoint stays flat, a per-row one grows with the limit.
+"""
+import asyncio
+import json
+import random
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Iterator, List, Optional, Tuple
+import pytest
+from benchmarks.endpoints import JWT_SECRET, call_app, configure_environment, seed
+from benchmarks.standin import StandInClient, Store
+
+# Settings are read when app.config is first imported
+configure_environment(rate_limit=False)
+
+from app import database  # noqa: E402
+from app.main import app  # noqa: E402
+from app.querycount import Operation, capture_queries, format_queries  # noqa: E402
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More upstream calls were made than the budget allows"""
+
+
+def assert_query_budget(queries: List[Operation], budget: int, label: str = "Block") -> None:
+    """Fail if queries holds more than budget calls"""
+    if len(queries) > budget:
+        raise QueryBudgetExceeded(
+            f"{label} made {len(queries)} Supabase calls, budget is {budget}: {format_queries(queries)}"
+        )
+
+
+@pytest.fixture
+def query_budget() -> Callable[..., ContextManager[List[Operation]]]:
+    """
+    query_budget(n, label=...) is a context manager failing if its block makes
+    more than n upstream calls; it yields the list of calls recorded so far
+    """
+
+    @contextmanager
+    def budget(limit: int, label: str = "Block") -> Iterator[List[Operation]]:
+        with capture_queries() as queries:
+            yield queries
+        assert_query_budget(queries, limit, label)
+
+    return budget
+
+
+class Api:
+    """Synchronous requests to the app through the ASGI interface"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, client: StandInClient, ids: dict):
+        self.loop = loop
+        self.client = client
+        self.ids = ids
+
+    def token(self, user_id: Optional[str] = None) -> str:
+        """An access token for user_id (default: the first seeded user)"""
+        user_id = user_id or self.ids["users"][0]
+        return self.client.mint_token(user_id, f"{user_id}@gmu.edu")
+
+    def request(self, method: str, path: str, **kwargs) -> Tuple[int, Optional[dict]]:
+        status, _, body = self.loop.run_until_complete(call_app(app, method, path, **kwargs))
+        return status, (json.loads(body) if body else None)
+
+    def get(self, path: str, **kwargs) -> Tuple[int, Optional[dict]]:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, body: dict, **kwargs) -> Tuple[int, Optional[dict]]:
+        return self.request("POST", path, body=body, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def api() -> Iterator[Api]:
+    """The app over a seeded stand-in, shared by the whole session"""
+    store = Store()
+    ids = seed(store, random.Random(1), users=20, books=100, listings=400, requests=200)
+    client = StandInClient(store, latency=0.0, jwt_secret=JWT_SECRET, seed=1)
+    database.supabase = database.supabase_admin = client
+    loop = asyncio.new_event_loop()
+    try:
+        yield Api(loop, client, ids)
+    finally:
+        database.supabase = database.supabase_admin = None
+        loop.close()
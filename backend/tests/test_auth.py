@@ -0,0 +1,59 @@
+"""
+Token revocation on logout, and signups timing out upstream
+"""
+import httpx
+import jwt
+import pytest
+from app.tokens import RevocationList, RevocationListFull, hash_token, token_verifier
+
+
+def test_logout_revokes_token(api):
+    token = api.token(api.ids["users"][1])
+    status, _ = api.post("/api/auth/logout", {}, token=token)
+    assert status == 200
+    status, _ = api.get("/api/auth/user", token=token)
+    assert status == 401
+
+
+def test_logout_rejects_forged_token(api):
+    user_id = api.ids["users"][2]
+    claims = jwt.decode(api.token(user_id), options={"verify_signature": False})
+    forged = jwt.encode(claims, "not-the-project-secret", algorithm="HS256")
+    status, _ = api.post("/api/auth/logout", {}, token=forged)
+    assert status == 401
+    assert not token_verifier.is_revoked(forged)
+
+
+def test_full_revocation_list_keeps_entries():
+    revoked = RevocationList(maxsize=2)
+    revoked.add(hash_token("a"), ttl=60)
+    revoked.add(hash_token("b"), ttl=60)
+    with pytest.raises(RevocationListFull):
+        revoked.add(hash_token("c"), ttl=60)
+    assert hash_token("a") in revoked and hash_token("b") in revoked
+
+
+def read_timeout(users=None):
+    """A sign_up that times out reading the response, optionally after creating the user"""
+
+    async def sign_up(credentials: dict):
+        if users is not None:
+            users.add({"email": credentials["email"], "password": credentials["password"], "email_confirmed_at": None})
+        raise httpx.ReadTimeout("timed out")
+
+    return sign_up
+
+
+def test_signup_read_timeout_after_user_created(api, monkeypatch):
+    monkeypatch.setattr(api.client.auth, "sign_up", read_timeout(api.client.store.table("auth.users")))
+    body = {"email": "slowmail@gmu.edu", "password": "correct-horse-battery"}
+    status, response = api.post("/api/auth/signup", body)
+    assert status == 201
+    assert "resend verification" in response["detail"]
+
+
+def test_signup_read_timeout_before_user_created(api, monkeypatch):
+    monkeypatch.setattr(api.client.auth, "sign_up", read_timeout())
+    body = {"email": "lostsignup@gmu.edu", "password": "correct-horse-battery"}
+    status, _ = api.post("/api/auth/signup", body)
+    assert status == 504
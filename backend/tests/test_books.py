@@ -0,0 +1,18 @@
+"""
+Book detail visibility and versioning
+"""
+from app.http_cache import compute_etag
+from app.metadata import BOOK_COLUMNS
+
+
+def test_inactive_book_is_hidden(api):
+    book = api.client.store.table("books").add({"title": "Withdrawn Edition", "is_active": False})
+    status, _ = api.get(f"/api/books/{book['id']}")
+    assert status == 404
+
+
+def test_book_etag_follows_its_fields():
+    book = {"id": "b1", "title": "Discrete Mathematics", "author": "Rosen", "isbn": None, "is_active": True}
+    etag = compute_etag([book], fields=BOOK_COLUMNS)
+    assert compute_etag([{**book, "title": "Discrete Mathematics and Its Applications"}], fields=BOOK_COLUMNS) != etag
+    assert compute_etag([dict(book)], fields=BOOK_COLUMNS) == etag
@@ -0,0 +1,20 @@
+"""
+Subscriptions held by server-sent event streams
+"""
+import asyncio
+from app.broker import InProcessBroker, sse_stream
+
+
+def test_stream_subscribes_only_once_started():
+    broker = InProcessBroker()
+    stream = sse_stream(broker, ["user:1"], buffer_size=10, keepalive=60)
+    # A response that is never sent leaves nothing subscribed
+    assert broker.subscriber_count() == 0
+
+    async def consume():
+        assert await stream.__anext__() == b"retry: 3000\n\n"
+        assert broker.subscriber_count("user:1") == 1
+        await stream.aclose()
+
+    asyncio.run(consume())
+    assert broker.subscriber_count() == 0
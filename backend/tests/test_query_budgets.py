@@ -0,0 +1,78 @@
+"""
+Upstream query budgets of the hot endpoints
+
+Each budget holds whatever the page size, so a per-row lookup creeping back
+into a list endpoint fails here instead of showing up as production latency.
+"""
+import pytest
+
+LIMITS = [1, 20, 100]
+
+
+@pytest.mark.parametrize("limit", LIMITS)
+def test_listing_page(api, query_budget, limit):
+    with query_budget(1, "GET /api/listings/"):
+        status, page = api.get("/api/listings/", query={"limit": limit})
+    assert status == 200
+    assert page["count"] == limit
+
+    with query_budget(1, "GET /api/listings/?cursor"):
+        status, page = api.get("/api/listings/", query={"limit": limit, "cursor": page["next_cursor"]})
+    assert status == 200
+    assert page["count"] == limit
+
+
+@pytest.mark.parametrize("limit", LIMITS)
+def test_request_page(api, query_budget, limit):
+    with query_budget(1, "GET /api/requests/"):
+        status, page = api.get("/api/requests/", query={"limit": limit})
+    assert status == 200
+    assert page["count"] == limit
+
+
+def test_listing_detail(api, query_budget):
+    listing_id = api.ids["listings"][0]
+    with query_budget(1, "GET /api/listings/{id}"):
+        status, listing = api.get(f"/api/listings/{listing_id}")
+    assert status == 200
+    assert listing["id"] == listing_id
+
+
+def test_request_detail(api, query_budget):
+    _, page = api.get("/api/requests/", query={"limit": 1})
+    request_id = page["requests"][0]["id"]
+    with query_budget(2, "GET /api/requests/{id}"):
+        status, request = api.get(f"/api/requests/{request_id}")
+    assert status == 200
+    assert request["id"] == request_id
+
+
+@pytest.mark.parametrize("images", [0, 1, 10])
+def test_create_listing(api, query_budget, images):
+    body = {
+        "title": "Operating System Concepts",
+        "author": "Silberschatz",
+        "isbn": "978-1-118-06333-0",
+        "type": "sale",
+        "price": 40,
+        "condition": "good",
+        "images": [f"https://images.example/{n}.jpg" for n in range(images)],
+    }
+    with query_budget(1, "POST /api/listings/"):
+        status, listing = api.post("/api/listings/", body, token=api.token())
+    assert status == 201
+    assert len(listing["images"]) == images
+
+
+def test_create_request(api, query_budget):
+    body = {"book_title": "Linear Algebra and Its Applications", "desired_condition": "good"}
+    with query_budget(3, "POST /api/requests/"):
+        status, request = api.post("/api/requests/", body, token=api.token())
+    assert status == 201
+    assert request["book_title"] == body["book_title"]
+
+
+def test_budget_exceeded_fails(api, query_budget):
+    with pytest.raises(AssertionError, match="budget is 0: listings select x1"):
+        with query_budget(0, "GET /api/listings/"):
+            api.get("/api/listings/", query={"limit": 5})
@@ -0,0 +1,135 @@
+-- ============================================================================
+-- DEDUPLICATED BOOK CATALOG
+-- ============================================================================
+-- Makes books one row per edition. normalize_isbn() now returns the
+-- canonical ISBN-13, so an ISBN-10 and its ISBN-13 are the same key. Existing
+-- duplicates are merged, books get a unique isbn_normalized column, and
+-- upsert_book() resolves title/author/ISBN to that row, creating it only
+-- when the ISBN is new. create_listing_with_book() goes through
+-- upsert_book(), so concurrent listings of a new edition share one book.
+-- Run this in your Supabase SQL Editor after SUPABASE_SEARCH.sql and
+-- SUPABASE_MATCHING.sql, then re-run SUPABASE_CREATE_LISTING.sql.
+-- ============================================================================
+
+-- ============================================================================
+-- 1. CANONICAL ISBN
+-- ============================================================================
+
+-- Strips separators and turns a valid ISBN-10 into its ISBN-13:
+-- '0-13-468599-7' and '978-0-13-468599-1' -> '9780134685991'.
+-- Anything else (ISBN-13s, malformed values) is returned stripped only.
+-- Mirrored by normalize_isbn() in backend/app/isbn.py.
+CREATE OR REPLACE FUNCTION public.normalize_isbn(p_isbn text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT CASE
+    WHEN s.v ~ '^[0-9]{9}[0-9X]$'
+     AND (SELECT sum((11 - i) * CASE WHEN substr(s.v, i, 1) = 'X' THEN 10 ELSE substr(s.v, i, 1)::int END)
+          FROM generate_series(1, 10) AS i) % 11 = 0
+    THEN '978' || left(s.v, 9) || (
+      (10 - (SELECT sum(CASE WHEN i % 2 = 1 THEN 1 ELSE 3 END * substr('978' || left(s.v, 9), i, 1)::int)
+             FROM generate_series(1, 12) AS i) % 10) % 10
+    )::text
+    ELSE s.v
+  END
+  FROM (SELECT NULLIF(regexp_replace(upper(coalesce(p_isbn, '')), '[^0-9X]', '', 'g'), '') AS v) AS s
+$$;
+
+-- Expression indexes built with the previous definition must be rebuilt
+DO $$
+BEGIN
+  IF to_regclass('public.idx_books_isbn_normalized') IS NOT NULL THEN
+    REINDEX INDEX public.idx_books_isbn_normalized;
+  END IF;
+  IF to_regclass('public.idx_requests_isbn_normalized') IS NOT NULL THEN
+    REINDEX INDEX public.idx_requests_isbn_normalized;
+  END IF;
+END;
+$$;
+
+-- ============================================================================
+-- 2. MERGE DUPLICATE BOOKS
+-- ============================================================================
+
+-- Listings move to the oldest book of each ISBN, then the others are removed
+WITH ranked AS (
+  SELECT
+    id,
+    first_value(id) OVER (
+      PARTITION BY public.normalize_isbn(isbn) ORDER BY created_at, id
+    ) AS keep_id
+  FROM books
+  WHERE public.normalize_isbn(isbn) IS NOT NULL
+)
+UPDATE listings l
+SET book_id = r.keep_id
+FROM ranked r
+WHERE l.book_id = r.id AND r.id <> r.keep_id;
+
+DELETE FROM books b
+USING (
+  SELECT
+    id,
+    first_value(id) OVER (
+      PARTITION BY public.normalize_isbn(isbn) ORDER BY created_at, id
+    ) AS keep_id
+  FROM books
+  WHERE public.normalize_isbn(isbn) IS NOT NULL
+) r
+WHERE b.id = r.id AND r.id <> r.keep_id;
+
+-- ============================================================================
+-- 3. UNIQUE ISBN
+-- ============================================================================
+
+-- Stored so PostgREST can filter on it (GET /api/books?isbn=...) and
+-- ON CONFLICT can target it; books without an ISBN stay NULL and never conflict
+ALTER TABLE books ADD COLUMN IF NOT EXISTS isbn_normalized text
+  GENERATED ALWAYS AS (public.normalize_isbn(isbn)) STORED;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_books_isbn_unique ON books (isbn_normalized);
+
+-- Keyset pagination of the catalog (GET /api/books)
+CREATE INDEX IF NOT EXISTS idx_books_created_at ON books (created_at DESC, id DESC);
+
+-- ============================================================================
+-- 4. UPSERT
+-- ============================================================================
+
+-- Returns the book for the ISBN, inserting it if there is none yet; created
+-- says which. Safe under concurrent calls: a racing insert of the same ISBN
+-- makes this one fall back to reading the winner's row.
+CREATE OR REPLACE FUNCTION public.upsert_book(
+  p_title text,
+  p_author text DEFAULT NULL,
+  p_isbn text DEFAULT NULL,
+  OUT book books,
+  OUT created boolean
+)
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+BEGIN
+  INSERT INTO books (title, author, isbn)
+  VALUES (p_title, p_author, p_isbn)
+  ON CONFLICT (isbn_normalized) DO NOTHING
+  RETURNING * INTO book;
+
+  created := FOUND;
+  IF NOT created THEN
+    SELECT * INTO book FROM books WHERE isbn_normalized = public.normalize_isbn(p_isbn);
+  END IF;
+END;
+$$;
+
+-- ============================================================================
+-- 5. MATCHES
+-- ============================================================================
+
+-- ISBN-10/ISBN-13 pairs now match; re-run the backfill at the end of
+-- SUPABASE_MATCHING.sql to add them for existing rows.
+
+-- Example:
+-- SELECT * FROM public.upsert_book('Effective Java', 'Joshua Bloch', '0-13-468599-7');
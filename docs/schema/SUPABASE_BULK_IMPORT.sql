@@ -0,0 +1,113 @@
+-- ============================================================================
+-- BULK LISTING IMPORT
+-- ============================================================================
+-- import_listings() inserts a batch of validated listing rows in one
+-- transaction, used by POST /api/listings/import. Books are deduplicated by
+-- books.isbn_normalized, both against existing books and within the batch;
+-- rows without an ISBN (or book_id) get a book of their own.
+-- Run this in your Supabase SQL Editor after SUPABASE_BOOK_CATALOG.sql
+-- (which adds isbn_normalized and its unique index).
+-- ============================================================================
+
+-- p_rows is a JSON array of ListingCreate objects:
+--   [{"book_id": null, "title": "...", "author": "...", "isbn": "...",
+--     "type": "sale", "price": 25, "condition": "good", "description": null,
+--     "rent_duration_value": null, "rent_duration_unit": null, "images": []}]
+-- Returns one row per input element; ordinal is its 0-based array index.
+CREATE OR REPLACE FUNCTION public.import_listings(p_user_id uuid, p_rows jsonb)
+RETURNS TABLE (ordinal integer, listing_id uuid, book_id uuid, book_created boolean)
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+#variable_conflict use_column
+BEGIN
+  -- 1. The batch, with ids generated up front so every inserted row maps
+  --    back to its input
+  DROP TABLE IF EXISTS pg_temp.import_rows;
+  CREATE TEMP TABLE import_rows ON COMMIT DROP AS
+  SELECT
+    (t.ord - 1)::integer AS ordinal,
+    t.value AS r,
+    public.normalize_isbn(t.value->>'isbn') AS isbn_key,
+    NULLIF(t.value->>'book_id', '')::uuid AS book_id,
+    false AS book_created,
+    gen_random_uuid() AS listing_id
+  FROM jsonb_array_elements(p_rows) WITH ORDINALITY AS t(value, ord);
+
+  -- 2. Rows without an ISBN (or book_id) get a book of their own
+  UPDATE import_rows
+  SET book_id = gen_random_uuid(), book_created = true
+  WHERE book_id IS NULL AND isbn_key IS NULL;
+
+  INSERT INTO books (id, title, author, isbn)
+  SELECT i.book_id, i.r->>'title', i.r->>'author', i.r->>'isbn'
+  FROM import_rows i
+  WHERE i.book_created;
+
+  -- 3. ISBNs missing from the catalog: the first row of the batch with each
+  --    ISBN creates the book. An ISBN another writer inserts meanwhile is
+  --    skipped here instead of failing the batch; step 4 resolves it.
+  WITH created AS (
+    INSERT INTO books (title, author, isbn)
+    SELECT DISTINCT ON (i.isbn_key) i.r->>'title', i.r->>'author', i.r->>'isbn'
+    FROM import_rows i
+    WHERE i.book_id IS NULL
+      AND NOT EXISTS (SELECT 1 FROM books b WHERE b.isbn_normalized = i.isbn_key)
+    ORDER BY i.isbn_key, i.ordinal
+    ON CONFLICT (isbn_normalized) DO NOTHING
+    RETURNING id, isbn_normalized
+  )
+  UPDATE import_rows i
+  SET book_id = c.id,
+      book_created = i.ordinal = (
+        SELECT min(j.ordinal) FROM import_rows j
+        WHERE j.isbn_key = i.isbn_key AND j.book_id IS NULL
+      )
+  FROM created c
+  WHERE i.book_id IS NULL AND i.isbn_key = c.isbn_normalized;
+
+  -- 4. Every other ISBN is in the catalog by now (a new statement sees the
+  --    books concurrent writers committed); uses idx_books_isbn_unique
+  UPDATE import_rows i
+  SET book_id = b.id
+  FROM books b
+  WHERE i.book_id IS NULL AND b.isbn_normalized = i.isbn_key;
+
+  -- 5. The listings and their images
+  INSERT INTO listings (
+    id, user_id, book_id, type, price, condition, description,
+    rent_duration_value, rent_duration_unit, status
+  )
+  SELECT
+    i.listing_id, p_user_id, i.book_id,
+    (i.r->>'type')::listing_type,
+    (i.r->>'price')::numeric,
+    (i.r->>'condition')::book_condition,
+    i.r->>'description',
+    CASE WHEN i.r->>'type' = 'rent' THEN (i.r->>'rent_duration_value')::integer END,
+    CASE WHEN i.r->>'type' = 'rent' THEN i.r->>'rent_duration_unit' END,
+    'active'
+  FROM import_rows i;
+
+  INSERT INTO listing_images (listing_id, image_url, created_at)
+  SELECT i.listing_id, img.url, now() + img.ord * interval '1 microsecond'
+  FROM import_rows i,
+       jsonb_array_elements_text(coalesce(i.r->'images', '[]'::jsonb)) WITH ORDINALITY AS img(url, ord);
+
+  RETURN QUERY
+  SELECT i.ordinal, i.listing_id, i.book_id, i.book_created
+  FROM import_rows i
+  ORDER BY i.ordinal;
+END;
+$$;
+
+-- ============================================================================
+-- NOTES
+-- ============================================================================
+-- 1. The whole batch is one transaction: any failing row (e.g. an unknown
+--    book_id) rolls the batch back, and the API retries that batch row by row
+--    through create_listing_with_book() to report the failing rows. A batch
+--    that times out is not retried: it may have committed server-side.
+-- 2. Books are written before the listings that reference them, so the
+--    foreign keys hold at every step.
+-- ============================================================================
@@ -0,0 +1,118 @@
+-- ============================================================================
+-- TRANSACTIONAL LISTING CREATION
+-- ============================================================================
+-- create_listing_with_book() resolves or creates the book, inserts the
+-- listing and its images in one transaction, and returns the hydrated
+-- listing (plus book_created, for the bulk import report), so
+-- POST /api/listings costs a single round trip and a failure part-way
+-- through can no longer leave orphan books behind.
+-- Run this in your Supabase SQL Editor after SUPABASE_BOOK_CATALOG.sql.
+-- ============================================================================
+
+-- Same definition as in SUPABASE_SEARCH.sql and SUPABASE_BOOK_CATALOG.sql;
+-- repeated so this file runs standalone
+CREATE OR REPLACE FUNCTION public.normalize_isbn(p_isbn text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT CASE
+    WHEN s.v ~ '^[0-9]{9}[0-9X]$'
+     AND (SELECT sum((11 - i) * CASE WHEN substr(s.v, i, 1) = 'X' THEN 10 ELSE substr(s.v, i, 1)::int END)
+          FROM generate_series(1, 10) AS i) % 11 = 0
+    THEN '978' || left(s.v, 9) || (
+      (10 - (SELECT sum(CASE WHEN i % 2 = 1 THEN 1 ELSE 3 END * substr('978' || left(s.v, 9), i, 1)::int)
+             FROM generate_series(1, 12) AS i) % 10) % 10
+    )::text
+    ELSE s.v
+  END
+  FROM (SELECT NULLIF(regexp_replace(upper(coalesce(p_isbn, '')), '[^0-9X]', '', 'g'), '') AS v) AS s
+$$;
+
+CREATE OR REPLACE FUNCTION public.create_listing_with_book(
+  p_user_id uuid,
+  p_type listing_type,
+  p_price numeric,
+  p_condition book_condition,
+  p_book_id uuid DEFAULT NULL,
+  p_title text DEFAULT NULL,
+  p_author text DEFAULT NULL,
+  p_isbn text DEFAULT NULL,
+  p_description text DEFAULT NULL,
+  p_rent_duration_value integer DEFAULT NULL,
+  p_rent_duration_unit text DEFAULT NULL,
+  p_images text[] DEFAULT '{}'
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+DECLARE
+  v_book books%ROWTYPE;
+  v_book_created boolean := false;
+  v_upsert record;
+  v_listing listings%ROWTYPE;
+  v_display_name text;
+  v_images jsonb;
+BEGIN
+  -- 1. Resolve the book: explicit id, else an existing book with the same ISBN, else a new one
+  IF p_book_id IS NOT NULL THEN
+    SELECT * INTO v_book FROM books WHERE id = p_book_id;
+    IF NOT FOUND THEN
+      RAISE EXCEPTION 'Book % not found', p_book_id USING ERRCODE = 'foreign_key_violation';
+    END IF;
+  ELSE
+    -- upsert_book() is defined in SUPABASE_BOOK_CATALOG.sql
+    SELECT * INTO v_upsert FROM public.upsert_book(p_title, p_author, p_isbn);
+    v_book := v_upsert.book;
+    v_book_created := v_upsert.created;
+  END IF;
+
+  -- 2. Insert the listing (rental fields only apply to rentals)
+  INSERT INTO listings (
+    user_id, book_id, type, price, condition, description,
+    rent_duration_value, rent_duration_unit, status
+  )
+  VALUES (
+    p_user_id, v_book.id, p_type, p_price, p_condition, p_description,
+    CASE WHEN p_type = 'rent' THEN p_rent_duration_value END,
+    CASE WHEN p_type = 'rent' THEN p_rent_duration_unit END,
+    'active'
+  )
+  RETURNING * INTO v_listing;
+
+  -- 3. Insert the images, keeping their order through created_at
+  INSERT INTO listing_images (listing_id, image_url, created_at)
+  SELECT v_listing.id, t.url, now() + t.ord * interval '1 microsecond'
+  FROM unnest(coalesce(p_images, '{}')) WITH ORDINALITY AS t(url, ord);
+
+  -- The image inserts fire touch_listing_on_image_change
+  -- (SUPABASE_HTTP_CACHING.sql), which bumps updated_at: re-read the row so
+  -- the returned version (and the ETag derived from it) matches the table
+  IF cardinality(p_images) > 0 THEN
+    SELECT * INTO v_listing FROM listings WHERE id = v_listing.id;
+  END IF;
+
+  SELECT coalesce(jsonb_agg(t.url ORDER BY t.ord), '[]'::jsonb) INTO v_images
+  FROM unnest(coalesce(p_images, '{}')) WITH ORDINALITY AS t(url, ord);
+
+  SELECT display_name INTO v_display_name FROM profiles WHERE id = p_user_id;
+
+  -- 4. Return the listing hydrated the same way GET /api/listings/{id} does
+  RETURN to_jsonb(v_listing) || jsonb_build_object(
+    'book_title', v_book.title,
+    'book_author', v_book.author,
+    'book_isbn', v_book.isbn,
+    'user_display_name', v_display_name,
+    'images', v_images,
+    'book_created', v_book_created
+  );
+END;
+$$;
+
+-- Example:
+-- SELECT public.create_listing_with_book(
+--   p_user_id => auth.uid(), p_type => 'sale', p_price => 45, p_condition => 'good',
+--   p_title => 'Calculus', p_author => 'James Stewart', p_isbn => '978-1-285-74062-1',
+--   p_images => ARRAY['https://example.com/front.jpg']
+-- );
@@ -0,0 +1,38 @@
+-- ============================================================================
+-- INDEXED EMAIL LOOKUP FOR AUTH FLOWS
+-- ============================================================================
+-- Replaces admin list_users() scans in the backend auth routes
+-- (check-verification, signup timeout recovery) with a single indexed query.
+-- Run this in your Supabase SQL Editor.
+-- ============================================================================
+
+-- Looks up one auth user by email.
+-- GoTrue stores emails lowercased and keeps a unique partial index on
+-- auth.users(email) WHERE is_sso_user = false (users_email_partial_key),
+-- so this is an index lookup regardless of the number of users.
+CREATE OR REPLACE FUNCTION public.get_auth_user_by_email(p_email text)
+RETURNS TABLE (
+  id uuid,
+  email text,
+  email_confirmed_at timestamptz,
+  created_at timestamptz
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+  SELECT u.id, u.email::text, u.email_confirmed_at, u.created_at
+  FROM auth.users u
+  WHERE u.email = lower(p_email)
+    AND u.is_sso_user = false
+  LIMIT 1
+$$;
+
+-- Only the backend (service role) may look users up by email
+REVOKE ALL ON FUNCTION public.get_auth_user_by_email(text) FROM PUBLIC;
+REVOKE ALL ON FUNCTION public.get_auth_user_by_email(text) FROM anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_auth_user_by_email(text) TO service_role;
+
+-- Example:
+-- SELECT * FROM public.get_auth_user_by_email('user@gmu.edu');
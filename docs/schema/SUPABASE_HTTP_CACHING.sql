@@ -0,0 +1,34 @@
+-- ============================================================================
+-- LISTING VERSIONING FOR HTTP CACHING
+-- ============================================================================
+-- The API derives listing ETags from listings.updated_at. Images live in
+-- their own table, so adding or removing one has to bump the parent
+-- listing's updated_at for clients and CDNs to see the change.
+-- Run this in your Supabase SQL Editor.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION public.touch_listing_from_image()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  -- update_listings_updated_at sets updated_at = NOW() on any update
+  UPDATE listings
+  SET updated_at = NOW()
+  WHERE id = CASE WHEN TG_OP = 'DELETE' THEN OLD.listing_id ELSE NEW.listing_id END;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS touch_listing_on_image_change ON listing_images;
+CREATE TRIGGER touch_listing_on_image_change
+  AFTER INSERT OR UPDATE OR DELETE ON listing_images
+  FOR EACH ROW
+  EXECUTE FUNCTION public.touch_listing_from_image();
+
+-- ============================================================================
+-- NOTES
+-- ============================================================================
+-- 1. Book metadata and display names need no trigger: the API hashes the
+--    joined values into the ETag, so renaming either changes it directly.
+-- ============================================================================
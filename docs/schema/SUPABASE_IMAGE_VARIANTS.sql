@@ -0,0 +1,22 @@
+-- ============================================================================
+-- LISTING IMAGE VARIANTS
+-- ============================================================================
+-- Images uploaded through POST /api/listings/{id}/images/upload are stored
+-- under the SHA-256 of their content with a thumbnail and a display-size
+-- WebP variant. listing_images records the variant URLs; the listing feed
+-- returns thumbnail_url. Rows added by URL keep these columns NULL.
+-- Run this in your Supabase SQL Editor.
+-- ============================================================================
+
+ALTER TABLE listing_images ADD COLUMN IF NOT EXISTS thumbnail_url text;
+ALTER TABLE listing_images ADD COLUMN IF NOT EXISTS webp_url text;
+ALTER TABLE listing_images ADD COLUMN IF NOT EXISTS content_hash text;
+
+-- Finds every listing using an upload (e.g. before removing its files)
+CREATE INDEX IF NOT EXISTS idx_listing_images_content_hash
+  ON listing_images (content_hash) WHERE content_hash IS NOT NULL;
+
+-- Only needed with STORAGE_BACKEND=supabase: the public bucket the files go to
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('listing-images', 'listing-images', true)
+ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,191 @@
+-- ============================================================================
+-- REQUEST / LISTING MATCHING
+-- ============================================================================
+-- Connects open requests with active listings of the same book. Matches are
+-- computed incrementally: inserting a listing looks up the open requests it
+-- satisfies, inserting a request looks up the active listings that satisfy
+-- it. Both lookups go through indexes (normalized ISBN expression indexes
+-- and trigram GIN indexes), so their cost does not grow with table size.
+-- Served by GET /api/requests/{id}/matches and GET /api/listings/{id}/matches.
+-- Run this in your Supabase SQL Editor after SUPABASE_SEARCH.sql.
+-- ============================================================================
+
+-- ============================================================================
+-- 1. MATCHES TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS listing_request_matches (
+  listing_id uuid REFERENCES listings(id) ON DELETE CASCADE NOT NULL,
+  request_id uuid REFERENCES requests(id) ON DELETE CASCADE NOT NULL,
+  -- 'isbn' for a normalized ISBN match, 'title' for a fuzzy title/author match
+  match_type text NOT NULL CHECK (match_type IN ('isbn', 'title')),
+  score real NOT NULL,
+  created_at timestamptz DEFAULT now(),
+  PRIMARY KEY (request_id, listing_id)
+);
+
+-- The primary key serves lookups by request; this one serves lookups by listing
+CREATE INDEX IF NOT EXISTS idx_listing_request_matches_listing
+  ON listing_request_matches (listing_id, score DESC);
+
+ALTER TABLE listing_request_matches ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Matches are readable by logged-in users" ON listing_request_matches;
+CREATE POLICY "Matches are readable by logged-in users"
+ON listing_request_matches FOR SELECT
+USING (auth.role() = 'authenticated');
+
+-- Rows are only written by the SECURITY DEFINER functions below
+
+-- ============================================================================
+-- 2. MATCHING FUNCTIONS
+-- ============================================================================
+-- A listing satisfies a request when:
+--   * they belong to different users,
+--   * the listing's condition is at least the request's desired_condition
+--     (book_condition is declared best first, so "at least" is <=), and
+--   * their normalized ISBNs are equal (score 1), or, when either side has
+--     no ISBN, the titles are trigram-similar (score from title and author
+--     similarity, below 1). Different ISBNs are different editions.
+-- At most 50 matches are kept per new row, best first.
+
+CREATE OR REPLACE FUNCTION public.match_listing(p_listing_id uuid)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_count integer;
+BEGIN
+  INSERT INTO listing_request_matches (listing_id, request_id, match_type, score)
+  SELECT listing_id, request_id, match_type, score
+  FROM (
+    SELECT
+      l.id AS listing_id,
+      r.id AS request_id,
+      CASE WHEN normalize_isbn(r.isbn) = normalize_isbn(b.isbn) THEN 'isbn' ELSE 'title' END AS match_type,
+      CASE WHEN normalize_isbn(r.isbn) = normalize_isbn(b.isbn) THEN 1.0
+           ELSE 0.8 * similarity(r.book_title, b.title)
+              + 0.19 * coalesce(similarity(r.author, b.author), 0)
+      END::real AS score
+    FROM listings l
+    JOIN books b ON b.id = l.book_id
+    JOIN requests r ON (
+      normalize_isbn(r.isbn) = normalize_isbn(b.isbn)
+      OR (
+        r.book_title % b.title
+        AND (normalize_isbn(r.isbn) IS NULL OR normalize_isbn(b.isbn) IS NULL)
+      )
+    )
+    WHERE l.id = p_listing_id
+      AND l.status = 'active'
+      AND r.status = 'open'
+      AND r.user_id <> l.user_id
+      AND (r.desired_condition IS NULL OR l.condition <= r.desired_condition)
+    ORDER BY score DESC
+    LIMIT 50
+  ) candidates
+  ON CONFLICT (request_id, listing_id) DO UPDATE
+    SET match_type = EXCLUDED.match_type, score = EXCLUDED.score;
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.match_request(p_request_id uuid)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_count integer;
+BEGIN
+  INSERT INTO listing_request_matches (listing_id, request_id, match_type, score)
+  SELECT listing_id, request_id, match_type, score
+  FROM (
+    SELECT
+      l.id AS listing_id,
+      r.id AS request_id,
+      CASE WHEN normalize_isbn(r.isbn) = normalize_isbn(b.isbn) THEN 'isbn' ELSE 'title' END AS match_type,
+      CASE WHEN normalize_isbn(r.isbn) = normalize_isbn(b.isbn) THEN 1.0
+           ELSE 0.8 * similarity(r.book_title, b.title)
+              + 0.19 * coalesce(similarity(r.author, b.author), 0)
+      END::real AS score
+    FROM requests r
+    JOIN books b ON (
+      normalize_isbn(b.isbn) = normalize_isbn(r.isbn)
+      OR (
+        b.title % r.book_title
+        AND (normalize_isbn(r.isbn) IS NULL OR normalize_isbn(b.isbn) IS NULL)
+      )
+    )
+    JOIN listings l ON l.book_id = b.id
+    WHERE r.id = p_request_id
+      AND r.status = 'open'
+      AND l.status = 'active'
+      AND l.user_id <> r.user_id
+      AND (r.desired_condition IS NULL OR l.condition <= r.desired_condition)
+    ORDER BY score DESC
+    LIMIT 50
+  ) candidates
+  ON CONFLICT (request_id, listing_id) DO UPDATE
+    SET match_type = EXCLUDED.match_type, score = EXCLUDED.score;
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.match_listing(uuid) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.match_request(uuid) FROM PUBLIC, anon, authenticated;
+
+-- ============================================================================
+-- 3. TRIGGERS
+-- ============================================================================
+-- Every insert path (POST /api/listings, bulk import, POST /api/requests)
+-- computes its matches in the inserting transaction.
+
+CREATE OR REPLACE FUNCTION public.match_new_row()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_TABLE_NAME = 'listings' THEN
+    PERFORM match_listing(NEW.id);
+  ELSE
+    PERFORM match_request(NEW.id);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS match_new_listing ON listings;
+CREATE TRIGGER match_new_listing
+  AFTER INSERT ON listings
+  FOR EACH ROW
+  EXECUTE FUNCTION public.match_new_row();
+
+DROP TRIGGER IF EXISTS match_new_request ON requests;
+CREATE TRIGGER match_new_request
+  AFTER INSERT ON requests
+  FOR EACH ROW
+  EXECUTE FUNCTION public.match_new_row();
+
+-- ============================================================================
+-- 4. BACKFILL (run once)
+-- ============================================================================
+
+SELECT count(*) AS matches FROM (
+  SELECT public.match_request(id) FROM requests WHERE status = 'open'
+) backfill;
+
+-- ============================================================================
+-- NOTES
+-- ============================================================================
+-- 1. Matches are not deleted when a listing is sold or a request is closed;
+--    the API only returns matches whose listing is active and request open.
+-- 2. % uses pg_trgm.similarity_threshold (0.3 by default).
+-- ============================================================================
@@ -0,0 +1,161 @@
+-- ============================================================================
+-- MESSAGING
+-- ============================================================================
+-- Read tracking, a history index and the functions used by the
+-- /api/conversations routes. Run this in your Supabase SQL Editor.
+-- ============================================================================
+
+-- ============================================================================
+-- 1. READ TRACKING
+-- ============================================================================
+
+-- Messages newer than last_read_at (and not sent by the participant) are unread
+ALTER TABLE conversation_participants
+  ADD COLUMN IF NOT EXISTS last_read_at timestamptz DEFAULT now();
+
+-- ============================================================================
+-- 2. INDEXES
+-- ============================================================================
+
+-- History pages and unread counts read one conversation newest-first;
+-- idx_messages_created_at alone would have to filter the whole table
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_created
+  ON messages (conversation_id, created_at DESC, id DESC);
+
+-- ============================================================================
+-- 3. ONE CONVERSATION PER LISTING/REQUEST AND USER PAIR
+-- ============================================================================
+
+-- The two participants, smaller id first, so the pair can be unique
+ALTER TABLE conversations
+  ADD COLUMN IF NOT EXISTS participant_low uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  ADD COLUMN IF NOT EXISTS participant_high uuid REFERENCES profiles(id) ON DELETE CASCADE;
+
+-- Backfill two-participant conversations; of existing duplicates only the
+-- oldest gets the pair (rows with a NULL pair never conflict)
+WITH pairs AS (
+  SELECT
+    c.id,
+    (array_agg(p.user_id ORDER BY p.user_id))[1] AS low,
+    (array_agg(p.user_id ORDER BY p.user_id))[2] AS high,
+    coalesce(c.listing_id, c.request_id) AS context_id,
+    c.created_at
+  FROM conversations c
+  JOIN conversation_participants p ON p.conversation_id = c.id
+  WHERE c.participant_low IS NULL
+  GROUP BY c.id
+  HAVING count(*) = 2
+),
+ranked AS (
+  SELECT id, low, high, row_number() OVER (
+    PARTITION BY context_id, low, high ORDER BY created_at, id
+  ) AS rank
+  FROM pairs
+)
+UPDATE conversations c
+SET participant_low = r.low, participant_high = r.high
+FROM ranked r
+WHERE c.id = r.id AND r.rank = 1
+  AND NOT EXISTS (
+    SELECT 1 FROM conversations o
+    WHERE coalesce(o.listing_id, o.request_id) = coalesce(c.listing_id, c.request_id)
+      AND o.participant_low = r.low AND o.participant_high = r.high
+  );
+
+-- Listing and request ids are both uuids, so one index covers either context
+CREATE UNIQUE INDEX IF NOT EXISTS idx_conversations_context_pair
+  ON conversations ((coalesce(listing_id, request_id)), participant_low, participant_high);
+
+-- ============================================================================
+-- 4. FUNCTIONS (service role only: they trust their user id arguments)
+-- ============================================================================
+
+-- Find the user's conversation about a listing/request with its owner, or
+-- create it with both participants, and optionally post a first message,
+-- all in one transaction. Returns the conversation, its participant ids,
+-- the message (or null) and whether the conversation was created. Safe
+-- under concurrent calls: idx_conversations_context_pair makes a racing
+-- start of the same conversation fall back to reading the winner's row.
+CREATE OR REPLACE FUNCTION public.start_conversation(
+  p_user_id uuid,
+  p_owner_id uuid,
+  p_listing_id uuid DEFAULT NULL,
+  p_request_id uuid DEFAULT NULL,
+  p_body text DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_conversation conversations%ROWTYPE;
+  v_message jsonb;
+  v_created boolean;
+  v_low uuid := least(p_user_id, p_owner_id);
+  v_high uuid := greatest(p_user_id, p_owner_id);
+BEGIN
+  INSERT INTO conversations (listing_id, request_id, participant_low, participant_high)
+  VALUES (p_listing_id, p_request_id, v_low, v_high)
+  ON CONFLICT ((coalesce(listing_id, request_id)), participant_low, participant_high) DO NOTHING
+  RETURNING * INTO v_conversation;
+
+  v_created := FOUND;
+  IF v_created THEN
+    INSERT INTO conversation_participants (conversation_id, user_id)
+    VALUES (v_conversation.id, p_user_id), (v_conversation.id, p_owner_id);
+  ELSE
+    SELECT * INTO v_conversation
+    FROM conversations c
+    WHERE coalesce(c.listing_id, c.request_id) = coalesce(p_listing_id, p_request_id)
+      AND c.participant_low = v_low
+      AND c.participant_high = v_high;
+  END IF;
+
+  IF p_body IS NOT NULL THEN
+    INSERT INTO messages (conversation_id, sender_id, body)
+    VALUES (v_conversation.id, p_user_id, p_body)
+    RETURNING to_jsonb(messages.*) INTO v_message;
+  END IF;
+
+  RETURN jsonb_build_object(
+    'conversation', to_jsonb(v_conversation),
+    'participant_ids', (
+      SELECT jsonb_agg(user_id) FROM conversation_participants
+      WHERE conversation_id = v_conversation.id
+    ),
+    'message', v_message,
+    'created', v_created
+  );
+END;
+$$;
+
+-- Unread message counts for every conversation of a user, in one query
+CREATE OR REPLACE FUNCTION public.unread_counts(p_user_id uuid)
+RETURNS TABLE (conversation_id uuid, unread integer)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT p.conversation_id, count(m.id)::integer
+  FROM conversation_participants p
+  LEFT JOIN messages m
+    ON m.conversation_id = p.conversation_id
+   AND m.created_at > p.last_read_at
+   AND m.sender_id <> p_user_id
+  WHERE p.user_id = p_user_id
+  GROUP BY p.conversation_id;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.start_conversation(uuid, uuid, uuid, uuid, text) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.unread_counts(uuid) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.start_conversation(uuid, uuid, uuid, uuid, text) TO service_role;
+GRANT EXECUTE ON FUNCTION public.unread_counts(uuid) TO service_role;
+
+-- ============================================================================
+-- NOTES
+-- ============================================================================
+-- 1. New messages are pushed to connected clients by the API process
+--    (GET /api/conversations/stream); no database replication is required.
+-- ============================================================================
@@ -0,0 +1,169 @@
+-- ============================================================================
+-- FULL-TEXT AND FUZZY SEARCH FOR GMU BOOK TRADING CO
+-- ============================================================================
+-- Adds search vectors, trigram indexes and normalized ISBN indexes on books
+-- and requests, plus the search_catalog() function used by GET /api/search.
+-- Safe to run on an existing database. Run this in Supabase SQL Editor.
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ============================================================================
+-- 1. ISBN NORMALIZATION
+-- ============================================================================
+
+-- Strips separators and turns a valid ISBN-10 into its ISBN-13:
+-- '0-13-468599-7' and '978-0-13-468599-1' -> '9780134685991'
+CREATE OR REPLACE FUNCTION public.normalize_isbn(p_isbn text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT CASE
+    WHEN s.v ~ '^[0-9]{9}[0-9X]$'
+     AND (SELECT sum((11 - i) * CASE WHEN substr(s.v, i, 1) = 'X' THEN 10 ELSE substr(s.v, i, 1)::int END)
+          FROM generate_series(1, 10) AS i) % 11 = 0
+    THEN '978' || left(s.v, 9) || (
+      (10 - (SELECT sum(CASE WHEN i % 2 = 1 THEN 1 ELSE 3 END * substr('978' || left(s.v, 9), i, 1)::int)
+             FROM generate_series(1, 12) AS i) % 10) % 10
+    )::text
+    ELSE s.v
+  END
+  FROM (SELECT NULLIF(regexp_replace(upper(coalesce(p_isbn, '')), '[^0-9X]', '', 'g'), '') AS v) AS s
+$$;
+
+-- ============================================================================
+-- 2. SEARCH VECTORS
+-- ============================================================================
+
+ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english'::regconfig, coalesce(author, '')), 'B')
+  ) STORED;
+
+ALTER TABLE requests ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('english'::regconfig, coalesce(book_title, '')), 'A') ||
+    setweight(to_tsvector('english'::regconfig, coalesce(author, '')), 'B')
+  ) STORED;
+
+-- ============================================================================
+-- 3. INDEXES
+-- ============================================================================
+
+-- Books
+CREATE INDEX IF NOT EXISTS idx_books_search_vector ON books USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_books_title_trgm ON books USING GIN (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_books_author_trgm ON books USING GIN (author gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_books_isbn_normalized ON books (public.normalize_isbn(isbn));
+
+-- Requests
+CREATE INDEX IF NOT EXISTS idx_requests_search_vector ON requests USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_requests_book_title_trgm ON requests USING GIN (book_title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_requests_author_trgm ON requests USING GIN (author gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_requests_isbn_normalized ON requests (public.normalize_isbn(isbn));
+
+-- ============================================================================
+-- 4. SEARCH FUNCTION
+-- ============================================================================
+-- Ranks books, active listings (through their book) and open requests.
+-- score = 10 for an exact normalized ISBN match
+--       + 2 x full-text rank on title (A) / author (B)
+--       + best trigram similarity of title or author to the query
+-- p_kind limits results to 'book', 'listing' or 'request' (NULL = all).
+
+CREATE OR REPLACE FUNCTION public.search_catalog(
+  p_query text,
+  p_limit integer DEFAULT 20,
+  p_kind text DEFAULT NULL
+)
+RETURNS TABLE (
+  kind text,
+  id uuid,
+  book_id uuid,
+  title text,
+  author text,
+  isbn text,
+  score real
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH q AS (
+    SELECT
+      websearch_to_tsquery('english', p_query) AS ts,
+      CASE WHEN length(public.normalize_isbn(p_query)) IN (10, 13)
+           THEN public.normalize_isbn(p_query) END AS isbn,
+      p_query AS raw
+  ),
+  matched_books AS (
+    SELECT
+      b.id, b.title, b.author, b.isbn,
+      (
+        CASE WHEN public.normalize_isbn(b.isbn) = q.isbn THEN 10 ELSE 0 END
+        + 2 * ts_rank(b.search_vector, q.ts)
+        + greatest(similarity(b.title, q.raw), similarity(coalesce(b.author, ''), q.raw))
+      )::real AS score
+    FROM books b, q
+    WHERE public.normalize_isbn(b.isbn) = q.isbn
+       OR b.search_vector @@ q.ts
+       OR b.title % q.raw
+       OR b.author % q.raw
+  ),
+  book_hits AS (
+    SELECT
+      'book'::text AS kind, mb.id AS id, mb.id AS book_id,
+      mb.title AS title, mb.author AS author, mb.isbn AS isbn, mb.score AS score
+    FROM matched_books mb
+    WHERE p_kind IS NULL OR p_kind = 'book'
+    ORDER BY mb.score DESC
+    LIMIT p_limit
+  ),
+  listing_hits AS (
+    SELECT 'listing'::text, l.id, mb.id, mb.title, mb.author, mb.isbn, mb.score
+    FROM listings l
+    JOIN matched_books mb ON mb.id = l.book_id
+    WHERE l.status = 'active'
+      AND (p_kind IS NULL OR p_kind = 'listing')
+    ORDER BY mb.score DESC, l.created_at DESC
+    LIMIT p_limit
+  ),
+  request_hits AS (
+    SELECT
+      'request'::text, r.id, NULL::uuid, r.book_title, r.author, r.isbn,
+      (
+        CASE WHEN public.normalize_isbn(r.isbn) = q.isbn THEN 10 ELSE 0 END
+        + 2 * ts_rank(r.search_vector, q.ts)
+        + greatest(similarity(r.book_title, q.raw), similarity(coalesce(r.author, ''), q.raw))
+      )::real
+    FROM requests r, q
+    WHERE r.status = 'open'
+      AND (p_kind IS NULL OR p_kind = 'request')
+      AND (
+        public.normalize_isbn(r.isbn) = q.isbn
+        OR r.search_vector @@ q.ts
+        OR r.book_title % q.raw
+        OR r.author % q.raw
+      )
+    ORDER BY 7 DESC
+    LIMIT p_limit
+  )
+  SELECT * FROM (
+    SELECT * FROM book_hits
+    UNION ALL
+    SELECT * FROM listing_hits
+    UNION ALL
+    SELECT * FROM request_hits
+  ) hits
+  ORDER BY hits.score DESC
+  LIMIT p_limit;
+$$;
+
+-- ============================================================================
+-- NOTES
+-- ============================================================================
+-- 1. Run after SUPABASE_SETUP_COMPLETE.sql (or on an already migrated database)
+-- 2. Example: SELECT * FROM search_catalog('calculus stewart', 20);
+-- 3. Example: SELECT * FROM search_catalog('978-0-13-468599-1', 20, 'listing');
+-- ============================================================================